@@ -0,0 +1,60 @@
+'''
+Benchmark and parity check for the best subsets regression procedure in src/regression/pp_regression_fxn.py.  Runs subset_linear_regression on a processed dataset with each method, reports the run times, and checks that every method returns the same models as the formula fits, up to ties between models that fit equally well.
+
+The results table is written with the "thelogger" logger set up by setup_logging in src/main.py, so it goes to the console and to the log file given by --log-file (bench_best_subsets.log by default), together with the status messages of the regression procedure.
+
+Run it with:  python -m src.benchmarks.bench_best_subsets data/pp_data_2018_processed.csv score
+'''
+import argparse
+import logging
+import time
+import warnings
+import numpy as np
+import pandas as pd
+import src.regression.pp_regression_fxn as regr
+import src.main as pipeline
+
+
+def compare_models(expected, result, rtol=1e-9):
+    """Compares two best subsets results.  Returns "ok" if they select the same combinations in the same order, "ties" if they only differ where models have the same R-squared-adjusted value (for example when one predictor is the difference of two others), and "MISMATCH" otherwise."""
+    if list(expected.index) == list(result.index) and list(expected["predictors"]) == list(result["predictors"]):
+        return "ok"
+    same_sizes = list(expected["num_predictors"]) == list(result["num_predictors"])
+    if same_sizes and np.allclose(expected["rsquared_adj"].astype(float), result["rsquared_adj"].astype(float), rtol=rtol, atol=0):
+        return "ties"
+    return "MISMATCH"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Times the best subsets methods and checks them against the formula fits.")
+    parser.add_argument("file", help="path of a processed dataset")
+    parser.add_argument("y", help="column name of the dependent variable")
+    parser.add_argument("--exclude", default="", help="column names to exclude, separated by commas")
+    parser.add_argument("--methods", default="formula,gram", help="methods to run, separated by commas; the first one is the reference")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes used by the gram method")
+    parser.add_argument("--log-file", default="bench_best_subsets.log", help="log file that the results table is written to")
+    args = parser.parse_args(argv)
+    pipeline.setup_logging(args.log_file)
+    logger = logging.getLogger("thelogger")
+
+    df = pd.read_csv(args.file)
+    exclude = [col for col in args.exclude.split(",") if col]
+    methods = args.methods.split(",")
+    warnings.simplefilter("ignore", FutureWarning)
+
+    reference = None
+    logger.info("{:<12}{:>12}{:>10}".format("method", "seconds", "parity"))
+    for method in methods:
+        start = time.perf_counter()
+        result = regr.subset_linear_regression(args.y, df, exclude, method=method, workers=args.workers)
+        seconds = time.perf_counter() - start
+        if reference is None:
+            reference = result
+            parity = "reference"
+        else:
+            parity = compare_models(reference, result)
+        logger.info("{:<12}{:>12.3f}{:>10}".format(method, seconds, parity))
+
+
+if __name__ == "__main__":
+    main()
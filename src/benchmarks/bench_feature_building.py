@@ -0,0 +1,66 @@
+'''
+Micro-benchmark for the title parsing helpers in src/features/pp_feature_building.py.  Reports the average cost of each helper per title, in microseconds, on a repeated set of typical r/progresspics post titles.
+
+The results table is written with the "thelogger" logger set up by setup_logging in src/main.py, so it goes to the console and to the log file given by --log-file (bench_feature_building.log by default).
+
+Run it with:  python -m src.benchmarks.bench_feature_building
+'''
+import argparse
+import logging
+import timeit
+import src.features.pp_feature_building as feat
+import src.main as pipeline
+
+
+# Typical title formats, including ones that hit the fallback branches of the parsers
+SAMPLE_TITLES = [
+    "M/22/6'3\" [290lbs &gt; 185lbs = 105lbs] (2 years) Long time lurker, first post",
+    "F/27/5'10\" [355lbs &gt; 340lbs = 15lbs] (&gt;1 month) Only the beginning",
+    "F/23/5’0” [260 &gt; 218 = 42lbs] (12 months) Friend was getting married",
+    "F/24/5’3” (160 SW &gt; 135 CW &gt; 125 GW) 25lbs lost so far",
+    "F/48/5’6” [326 lbs &gt; 180lbs= 146 lbs lost] (101 months) NSFW",
+    "27/M/6’4” [292lbs-265lbs = 27lbs] (2 months) a little bit of progress",
+    "M/30/180cm [120kg &gt; 95kg = 25kg] 1.5 years",
+    "Just a picture of my progress!",
+]
+
+
+def bench(func, inputs, number, repeat):
+    """Returns the average time of func per input, in microseconds, from the fastest of the repeated runs."""
+    seconds = min(timeit.repeat(lambda: [func(s) for s in inputs], number=number, repeat=repeat))
+    return seconds / (number * len(inputs)) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Times the title parsing helpers per title.")
+    parser.add_argument("--number", type=int, default=1000, help="number of passes over the sample titles in each run")
+    parser.add_argument("--repeat", type=int, default=7, help="number of runs; the fastest one is reported")
+    parser.add_argument("--log-file", default="bench_feature_building.log", help="log file that the results table is written to")
+    args = parser.parse_args(argv)
+    pipeline.setup_logging(args.log_file)
+    logger = logging.getLogger("thelogger")
+
+    titles = SAMPLE_TITLES
+    raw_weights = [feat.get_stats_ver6(s)[3] for s in titles]
+    raw_heights = [feat.get_stats_ver6(s)[2] for s in titles]
+    num_heights = [feat.number_height(s) for s in raw_heights]
+    raw_sexes = [feat.get_stats_ver6(s)[0] for s in titles]
+
+    benchmarks = [
+        ("get_stats_ver6", feat.get_stats_ver6, titles),
+        ("get_weights_ver2", feat.get_weights_ver2, raw_weights),
+        ("clean_sex", feat.clean_sex, raw_sexes),
+        ("number_height", feat.number_height, raw_heights),
+        ("height_inches", feat.height_inches, num_heights),
+        ("nsfw", feat.nsfw, titles),
+        ("get_duration_weeks", feat.get_duration_weeks, titles),
+        ("get_duration_months", feat.get_duration_months, titles),
+        ("extract_title_features", feat.extract_title_features, titles),
+    ]
+    logger.info("{:<24}{:>14}".format("function", "us per title"))
+    for name, func, inputs in benchmarks:
+        logger.info("{:<24}{:>14.3f}".format(name, bench(func, inputs, args.number, args.repeat)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+'''
+Benchmark of the title parsers in src/features/pp_feature_building.py and of the cleaning stages of src/main.py on a synthetic raw export (see src/data/pp_synthetic_titles.py) or on a raw .csv file.  Reports the rows per second and the peak resident memory of each parsing function and each stage, and can append the results to a .csv file so that runs can be compared over time and batch jobs sized from them.
+
+The results table is written with the "thelogger" logger set up by setup_logging in src/main.py, so it goes to the console and to the log file given by --log-file (bench_pipeline.log by default), together with the status messages of the cleaning stages.
+
+Run it with:  python -m src.benchmarks.bench_pipeline --rows 100000 --chunksize 20000 --output bench_pipeline.csv
+'''
+import os
+import time
+import argparse
+import datetime
+import logging
+import resource
+import tempfile
+import threading
+from functools import partial
+import pandas as pd
+import src.features.pp_feature_building as feat
+import src.features.pp_data_cleaning as clean
+import src.features.pp_eda_stats as eda_stats
+import src.data.pp_dataset_io as dataset_io
+import src.data.pp_synthetic_titles as synthetic
+import src.main as pipeline
+
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss():
+    """Returns the resident memory of this process in bytes, read from /proc/self/statm.  Where /proc is not available, returns the peak resident memory of the process so far instead."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        return peak if peak > 1 << 32 else peak * 1024
+
+
+class PeakMemory:
+    """Context manager that samples the resident memory of the process in a background thread while its block runs, and records the memory at the start and the peak.
+
+    Arguments:
+    interval -- seconds between samples
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.start = self.peak = 0
+        self.stop = threading.Event()
+
+    def sample(self):
+        while not self.stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self.start = self.peak = current_rss()
+        self.stop.clear()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        self.thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def measure(name, function, rows):
+    """Runs function once and returns its result with a record of its run time, rows per second, peak resident memory, and the memory added over the memory at its start.  When rows is None, the number of rows of the result is used."""
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+    rows = len(result) if rows is None else rows
+    record = {
+        "name": name,
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds else float("inf"),
+        "peak_rss_mb": memory.peak / 2**20,
+        "added_rss_mb": (memory.peak - memory.start) / 2**20,
+    }
+    logger = logging.getLogger("thelogger")
+    logger.info("{name:<30}{rows:>10}{seconds:>10.3f}{rows_per_second:>14.0f}{peak_rss_mb:>12.1f}{added_rss_mb:>12.1f}".format(**record))
+    return result, record
+
+
+def bench_parsers(titles, workers=1):
+    """Times each title parsing function over a column of raw titles.  The per-title functions are applied to every title (or to the field of every title they take as input, as clean_data does), and the batch functions to the whole column.
+
+    Arguments:
+    titles -- Pandas series of raw post titles
+    workers -- number of processes used by extract_features_batch
+
+    Returns:
+    list of the benchmark records
+    """
+    values = titles.tolist()
+    fields = feat.extract_features_batch(titles)
+    raw_sexes = fields["raw_sex"].tolist()
+    raw_heights = fields["raw_height"].tolist()
+    raw_weights = fields["raw_weights"].tolist()
+    num_heights = [feat.number_height(s) for s in raw_heights]
+
+    benchmarks = [
+        ("get_stats_ver6", lambda: [feat.get_stats_ver6(s) for s in values], len(values)),
+        ("get_weights_ver2", lambda: [feat.get_weights_ver2(s) for s in raw_weights], len(raw_weights)),
+        ("clean_sex", lambda: [feat.clean_sex(s) for s in raw_sexes], len(raw_sexes)),
+        ("number_height", lambda: [feat.number_height(s) for s in raw_heights], len(raw_heights)),
+        ("height_inches", lambda: [feat.height_inches(s) for s in num_heights], len(num_heights)),
+        ("nsfw", lambda: [feat.nsfw(s) for s in values], len(values)),
+        ("get_duration_weeks", lambda: [feat.get_duration_weeks(s) for s in values], len(values)),
+        ("get_duration_months", lambda: [feat.get_duration_months(s) for s in values], len(values)),
+        ("extract_title_features", lambda: [feat.extract_title_features(s) for s in values], len(values)),
+        ("get_stats_batch", lambda: feat.get_stats_batch(titles.str.upper()), len(values)),
+        ("extract_features_batch", lambda: feat.extract_features_batch(titles, workers=workers), len(values)),
+    ]
+    return [measure(name, function, rows)[1] for name, function, rows in benchmarks]
+
+
+def bench_stages(file, tmp_dir, workers=1, chunksize=None):
+    """Times each stage of the in-memory cleaning pipeline of main.py on a raw .csv file, in the order main.py runs them, followed by the exploratory data analysis statistics and, when chunksize is given, the whole chunked cleaning.
+
+    Arguments:
+    file -- path of the raw .csv file
+    tmp_dir -- directory where the processed datasets are written
+    workers -- number of processes used to parse the titles
+    chunksize -- number of rows per chunk of clean_csv_chunked, or None to skip it
+
+    Returns:
+    list of the benchmark records
+    """
+    records = []
+
+    def run(name, function, rows):
+        result, record = measure(name, function, rows)
+        records.append(record)
+        return result
+
+    # The stages get their inputs bound with partial rather than through closures, so the dataframes can be deleted once
+    # the stages that use them have run
+    raw_data = run("read_csv", partial(pd.read_csv, file), None)
+    rows = raw_data.shape[0]
+    pp_data, features = run("clean_data", partial(clean.clean_data, raw_data, pause=0, workers=workers), rows)
+    del raw_data
+    author_counts = run("count_posts", partial(clean.count_posts, pp_data), pp_data.shape[0])
+    pp_data = run("add_num_posts", partial(clean.add_num_posts, pp_data, author_counts, pause=0), pp_data.shape[0])
+    pp_data_pro = run("format_processed", partial(clean.format_processed, pp_data, clean.PROCESSED_DATA_COLUMNS), pp_data.shape[0])
+    run("save_dataset", partial(dataset_io.save_dataset, pp_data_pro, os.path.join(tmp_dir, "pp_data.csv")), pp_data_pro.shape[0])
+    pp_duration = run("get_duration_data", partial(clean.get_duration_data, pp_data, features, pause=0), pp_data.shape[0])
+    pp_duration_pro = run("format_processed duration", partial(clean.format_processed, pp_duration, clean.PROCESSED_DURATION_COLUMNS), pp_duration.shape[0])
+    run("summarize_eda", partial(eda_stats.summarize_eda, pp_data_pro, pp_duration_pro), pp_data_pro.shape[0])
+    del pp_data, features, pp_data_pro, pp_duration, pp_duration_pro
+    if chunksize:
+        run("clean_csv_chunked", partial(clean.clean_csv_chunked, file, os.path.join(tmp_dir, "chunked_data.csv"), os.path.join(tmp_dir, "chunked_duration.csv"), chunksize=chunksize, workers=workers), rows)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reports rows per second and peak resident memory of the title parsers and the cleaning stages.")
+    parser.add_argument("--rows", type=int, default=100000, help="number of synthetic posts to generate")
+    parser.add_argument("--file", help="raw .csv file to use instead of a synthetic export")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic export")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes used to parse the titles")
+    parser.add_argument("--chunksize", type=int, help="also time the chunked cleaning with chunks of this many rows")
+    parser.add_argument("--skip", default="", help="groups to skip, separated by commas: parsers, stages")
+    parser.add_argument("--output", help=".csv file that the results are appended to")
+    parser.add_argument("--log-file", default="bench_pipeline.log", help="log file that the results table is written to")
+    args = parser.parse_args(argv)
+    pipeline.setup_logging(args.log_file)
+    logger = logging.getLogger("thelogger")
+    skip = [group for group in args.skip.split(",") if group]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file = args.file
+        if file is None:
+            file = os.path.join(tmp_dir, "raw.csv")
+            start = time.perf_counter()
+            synthetic.write_synthetic_csv(file, args.rows, seed=args.seed)
+            logger.info("Generated {} synthetic posts in {:.1f} seconds. \n".format(args.rows, time.perf_counter() - start))
+
+        logger.info("{:<30}{:>10}{:>10}{:>14}{:>12}{:>12}".format("function", "rows", "seconds", "rows/s", "peak MB", "added MB"))
+        records = []
+        if "parsers" not in skip:
+            records += bench_parsers(pd.read_csv(file, usecols=["title"])["title"], workers=args.workers)
+        if "stages" not in skip:
+            records += bench_stages(file, tmp_dir, workers=args.workers, chunksize=args.chunksize)
+
+    if args.output:
+        results = pd.DataFrame(records)
+        results.insert(0, "date", datetime.datetime.now().isoformat(timespec="seconds"))
+        results.insert(1, "input", args.file or "synthetic:{}:{}".format(args.rows, args.seed))
+        results.insert(2, "workers", args.workers)
+        results.to_csv(args.output, mode="a", header=not os.path.exists(args.output), index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import logging
+import sqlite3
+import pandas as pd
+import src.data.pp_dataset_io as dataset_io
+
+
+class AuthorCountStore:
+    """Persistent number of posts per author, kept in a SQLite file and updated as each new batch of posts (for example a monthly dump) is cleaned.  num_posts can then count the posts of every batch ingested so far with a lookup of the authors of the new batch, instead of a groupby over the whole history.  Each batch is recorded under an id, so adding the same batch again does not count its posts twice.
+
+    Arguments:
+    path -- path of the SQLite file; it is created if it does not exist
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS author_posts (author TEXT PRIMARY KEY, num_posts INTEGER NOT NULL)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS batches (batch TEXT PRIMARY KEY, num_rows INTEGER NOT NULL, num_authors INTEGER NOT NULL)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def has_batch(self, batch):
+        """Returns True if the batch with the provided id was already added."""
+        return self.connection.execute("SELECT 1 FROM batches WHERE batch = ?", (batch,)).fetchone() is not None
+
+    def add_counts(self, counts, batch):
+        """Adds the post counts of a new batch to the stored totals in one transaction, unless the batch was already added.
+
+        Arguments:
+        counts -- Pandas series of post counts indexed by author, such as pp_data_cleaning.count_posts returns
+        batch -- id of the batch, such as the hash returned by file_batch_id
+
+        Returns:
+        True if the counts were added, False if the batch was already in the store
+        """
+        logger = logging.getLogger("thelogger")
+        if self.has_batch(batch):
+            logger.info("Batch {} is already in the author store {}; its posts are not counted again. \n".format(batch, self.path))
+            return False
+        rows = [(str(author), int(count)) for author, count in counts.items()]
+        with self.connection:
+            self.connection.executemany("INSERT INTO author_posts (author, num_posts) VALUES (?, ?) ON CONFLICT(author) DO UPDATE SET num_posts = num_posts + excluded.num_posts", rows)
+            self.connection.execute("INSERT INTO batches (batch, num_rows, num_authors) VALUES (?, ?, ?)", (batch, sum(count for _, count in rows), len(rows)))
+        logger.info("Added the posts of {} authors to the author store {}. \n".format(len(rows), self.path))
+        return True
+
+    def lookup(self, authors):
+        """Returns the stored post counts of the provided authors.  Only the distinct authors are looked up, through a temporary table joined with the stored counts, so the cost depends on the number of authors in the new batch rather than in the store.
+
+        Arguments:
+        authors -- iterable of author names
+
+        Returns:
+        Pandas series of post counts indexed by author; authors that are not in the store are left out
+        """
+        with self.connection:
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_authors (author TEXT PRIMARY KEY)")
+            self.connection.execute("DELETE FROM lookup_authors")
+            self.connection.executemany("INSERT OR IGNORE INTO lookup_authors (author) VALUES (?)", ((str(author),) for author in authors))
+            rows = self.connection.execute("SELECT a.author, a.num_posts FROM author_posts AS a JOIN lookup_authors AS l ON a.author = l.author").fetchall()
+        return pd.Series(dict(rows), dtype="int64")
+
+    def batch_ids(self):
+        """Returns the sorted ids of the batches in the store, which identify the state of the stored counts."""
+        return [batch for batch, in self.connection.execute("SELECT batch FROM batches ORDER BY batch")]
+
+    def log_stats(self):
+        """Logs the number of batches and authors in the store."""
+        logger = logging.getLogger("thelogger")
+        batches, posts = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(num_rows), 0) FROM batches").fetchone()
+        authors = self.connection.execute("SELECT COUNT(*) FROM author_posts").fetchone()[0]
+        logger.info("Author store {0}: {1} batches, {2} posts, {3} authors.\n".format(self.path, batches, posts, authors))
+
+
+def file_batch_id(path):
+    """Returns the SHA-1 hash of the contents of a file, used as the batch id of a raw dump so that ingesting the same dump twice is detected whatever its file name."""
+    return dataset_io.file_digest(path)
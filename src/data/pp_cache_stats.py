@@ -0,0 +1,21 @@
+import logging
+
+
+class CacheStats:
+    """Hit and miss counters shared by the caches of the pipeline (ParseCache in pp_feature_building, ModelCache in pp_regression_fxn, and CheckpointStore in pp_checkpoints).  A class that uses it increments hits and misses and defines __len__ as the number of stored entries."""
+    CACHE_NAME = "Cache"
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def log_stats(self, name=None):
+        """Logs the number of cache hits and misses, the hit rate, and the number of stored entries.
+
+        Arguments:
+        name -- name of the cache in the message; defaults to CACHE_NAME
+        """
+        logger = logging.getLogger("thelogger")
+        total = self.hits + self.misses
+        hit_rate = round(self.hits / total * 100, 1) if total else 0
+        logger.info("{0} cache: {1} hits, {2} misses ({3}% hit rate), {4} entries stored.\n".format(name or self.CACHE_NAME, self.hits, self.misses, hit_rate, len(self)))
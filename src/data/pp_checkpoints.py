@@ -0,0 +1,142 @@
+import os
+import json
+import pickle
+import hashlib
+import logging
+import pandas as pd
+import src.data.pp_dataset_io as dataset_io
+import src.data.pp_cache_stats as cache_stats
+
+
+def value_digest(value):
+    """Returns a hash of the contents of a stage output that is the same for equal outputs.  Dataframes and series are hashed with pd.util.hash_pandas_object, together with their index and column names and their dtypes, because their pickled bytes can differ between equal frames.  Tuples and lists are hashed item by item, and other values by their pickled bytes.
+
+    Arguments:
+    value -- stage output
+
+    Returns:
+    hexadecimal hash string
+    """
+    digest = hashlib.sha1()
+    pending = [value]
+    while pending:
+        item = pending.pop(0)
+        if isinstance(item, (tuple, list)):
+            digest.update("sequence {}".format(len(item)).encode())
+            pending = list(item) + pending
+        elif isinstance(item, (pd.DataFrame, pd.Series)):
+            dtypes = item.dtypes if isinstance(item, pd.DataFrame) else {item.name: item.dtype}
+            digest.update(repr([type(item).__name__, item.index.dtype] + [(name, dtype) for name, dtype in dict(dtypes).items()]).encode())
+            digest.update(pd.util.hash_pandas_object(item, index=True).to_numpy().tobytes())
+        else:
+            digest.update(pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL))
+    return digest.hexdigest()
+
+
+class CheckpointStore(cache_stats.CacheStats):
+    """Directory of pickled stage outputs of the pipeline.  Each output is stored under a key that hashes the stage name, the source code of the modules that implement the stage, the stage parameters, and the content hashes of the stage inputs: the hash of an input file or the value_digest of the output of the stage that produced the input.  A rerun can therefore load the output of every stage whose inputs, parameters, and code have not changed instead of running it, and a stage whose code changed but whose output did not, does not make the stages after it run again.  A manifest file records the latest checkpoint of each stage, so other scripts can find them.  A stage loaded from its checkpoint counts as a cache hit and a stage that is run as a miss.
+
+    Arguments:
+    directory -- directory of the checkpoint files; it is created if it does not exist
+    """
+    MANIFEST = "manifest.json"
+    CACHE_NAME = "Checkpoint"
+
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.versions = {}
+
+    def __len__(self):
+        return len([name for name in os.listdir(self.directory) if name.endswith(".pkl")])
+
+    def code_version(self, modules):
+        """Returns a hash of the source files of the provided modules."""
+        digest = hashlib.sha1()
+        for module in modules:
+            if module.__name__ not in self.versions:
+                self.versions[module.__name__] = dataset_io.file_digest(module.__file__)
+            digest.update(self.versions[module.__name__].encode())
+        return digest.hexdigest()
+
+    def key(self, stage, inputs, params=None, modules=()):
+        """Returns the checkpoint key of a stage.
+
+        Arguments:
+        stage -- name of the stage
+        inputs -- list of the content hashes of the stage inputs
+        params -- dictionary of the parameters that change the stage output
+        modules -- modules whose source code implements the stage
+
+        Returns:
+        hexadecimal key string
+        """
+        description = json.dumps({"stage": stage, "inputs": list(inputs), "params": params or {}, "code": self.code_version(modules)}, sort_keys=True, default=str)
+        return hashlib.sha1(description.encode()).hexdigest()
+
+    def path(self, stage, key):
+        return os.path.join(self.directory, "{}-{}.pkl".format(stage, key[:16]))
+
+    def load(self, stage, key):
+        """Returns the checkpointed output of a stage and its value_digest, or (None, None) if there is no checkpoint with that key."""
+        path = self.path(stage, key)
+        if not os.path.exists(path):
+            return None, None
+        with open(path, "rb") as f:
+            value = pickle.load(f)
+        return value, value_digest(value)
+
+    def save(self, stage, key, value):
+        """Pickles the output of a stage atomically, records it as the latest checkpoint of the stage, and returns its value_digest."""
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        path = self.path(stage, key)
+        tmp_file = path + ".tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(data)
+        os.replace(tmp_file, path)
+        manifest = self.manifest()
+        manifest[stage] = os.path.basename(path)
+        tmp_file = os.path.join(self.directory, self.MANIFEST + ".tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_file, os.path.join(self.directory, self.MANIFEST))
+        return value_digest(value)
+
+    def manifest(self):
+        """Returns the dictionary of stage name: file name of its latest checkpoint."""
+        path = os.path.join(self.directory, self.MANIFEST)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def latest(self, stage):
+        """Returns the path of the latest checkpoint of a stage; raises a KeyError if the stage has none."""
+        return os.path.join(self.directory, self.manifest()[stage])
+
+    def run(self, stage, function, inputs, params=None, modules=()):
+        """Returns the output of a stage, loaded from its checkpoint if there is one, otherwise computed with function and checkpointed.
+
+        Arguments:
+        stage -- name of the stage
+        function -- function without arguments that runs the stage
+        inputs -- list of the content hashes of the stage inputs
+        params -- dictionary of the parameters that change the stage output
+        modules -- modules whose source code implements the stage
+
+        Returns:
+        value -- output of the stage
+        digest -- value_digest of the output, to pass as an input of the stages that use it
+        """
+        logger = logging.getLogger("thelogger")
+        key = self.key(stage, inputs, params, modules)
+        value, digest = self.load(stage, key)
+        if digest is not None:
+            self.hits += 1
+            logger.info("Stage '{}' is unchanged; loaded its output from {}. \n".format(stage, self.path(stage, key)))
+            return value, digest
+        self.misses += 1
+        value = function()
+        return value, self.save(stage, key, value)
+
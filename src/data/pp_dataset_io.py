@@ -0,0 +1,285 @@
+import os
+import json
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+
+
+# Declared column types of the processed datasets, used when they are saved in a binary format.  num_posts is missing
+# for posts without an author, so it has the nullable integer type.
+PROCESSED_SCHEMA = {
+    "age": "int16",
+    "sex": "int8",
+    "height_in": "float32",
+    "start_weight": "float32",
+    "end_weight": "float32",
+    "weight_diff": "float32",
+    "score": "int32",
+    "num_comments": "int32",
+    "month": "int8",
+    "dayofweek": "int8",
+    "NSFW": "int8",
+    "num_posts": "Int32",
+    "period_months": "float32",
+    "rate": "float32",
+    "norm_rate": "float32",
+}
+
+# Allowed values of the coded columns
+VALUE_RANGES = {"sex": (0, 1), "NSFW": (0, 1), "month": (1, 12), "dayofweek": (0, 6)}
+
+# Directory next to a dataset file that holds its memory-mapped cache
+MMAP_CACHE_DIR = ".mmap_cache"
+
+BINARY_FORMATS = {".parquet": "parquet", ".pq": "parquet", ".feather": "feather", ".arrow": "feather", ".pkl": "pickle"}
+
+
+def dataset_format(path):
+    """Returns the storage format of a dataset file based on its extension: "parquet", "feather", "pickle" (for example a pipeline checkpoint), or "csv"."""
+    return BINARY_FORMATS.get(os.path.splitext(path)[1].lower(), "csv")
+
+
+def file_digest(path, block_size=1 << 20):
+    """Returns the SHA-1 hash of the contents of a file, read in blocks."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def validate_schema(df):
+    """Checks the columns of a processed dataset against PROCESSED_SCHEMA and VALUE_RANGES.  Columns that are not in the schema are not checked, so datasets with extra columns can still be used.  Only columns with a nullable type may have missing values.
+
+    Arguments:
+    df -- Pandas dataframe of a processed dataset
+
+    Returns:
+    None; raises a ValueError that lists every problem found
+    """
+    problems = []
+    for col, dtype in PROCESSED_SCHEMA.items():
+        if col not in df.columns:
+            continue
+        values = df[col]
+        if not pd.api.types.is_numeric_dtype(values):
+            problems.append("'{}' is not numeric".format(col))
+            continue
+        declared = pd.api.types.pandas_dtype(dtype)
+        if pd.api.types.is_integer_dtype(declared):
+            nullable = isinstance(declared, pd.api.extensions.ExtensionDtype)
+            info = np.iinfo(declared.numpy_dtype if nullable else declared)
+            present = values.dropna().astype(np.float64)
+            if values.isna().any() and not nullable:
+                problems.append("'{}' has {} missing values".format(col, values.isna().sum()))
+            elif (present != np.floor(present)).any():
+                problems.append("'{}' contains values that are not whole numbers".format(col))
+            elif len(present) and (present.min() < info.min or present.max() > info.max):
+                problems.append("'{}' has values outside the {} range".format(col, dtype.lower()))
+        if col in VALUE_RANGES:
+            low, high = VALUE_RANGES[col]
+            if ((values < low) | (values > high)).any():
+                problems.append("'{}' has values outside {} to {}".format(col, low, high))
+    if problems:
+        raise ValueError("The dataset does not match the processed dataset schema: " + "; ".join(problems))
+
+
+def apply_schema(df):
+    """Validates a processed dataset and converts its columns to the types declared in PROCESSED_SCHEMA.
+
+    Arguments:
+    df -- Pandas dataframe of a processed dataset
+
+    Returns:
+    Pandas dataframe with small integer types for the coded and count columns and float32 for the measurements
+    """
+    validate_schema(df)
+    return df.astype({col: dtype for col, dtype in PROCESSED_SCHEMA.items() if col in df.columns})
+
+
+def write_dataset(chunks, path):
+    """Writes a processed dataset, given as one or more dataframes, to a .csv, Parquet, Feather, or pickle file chosen by the file extension.  Parquet and Feather are written with the declared schema, one row group or record batch per dataframe, so a large dataset never has to be held in memory at once; they need the pyarrow package.  A pickle file is written in one piece.
+
+    Arguments:
+    chunks -- iterable of Pandas dataframes with the same columns
+    path -- path of the file to write; an existing file is replaced
+
+    Returns:
+    None
+    """
+    fmt = dataset_format(path)
+    if fmt == "csv":
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+        return
+    if fmt == "pickle":
+        pd.concat(chunks, ignore_index=True).to_pickle(path)
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(apply_schema(chunk), preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema) if fmt == "parquet" else pa.ipc.new_file(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def save_dataset(df, path):
+    """Saves a processed dataset to a .csv, Parquet, or Feather file chosen by the file extension.  See write_dataset."""
+    write_dataset([df], path)
+
+
+def load_dataset(path, validate=False):
+    """Loads a dataset from a .csv, Parquet, Feather, or pickle file chosen by the file extension.  Any dataset can be loaded; the processed datasets written by main.py can also be checked against the declared schema.
+
+    Arguments:
+    path -- path of the dataset file
+    validate -- True raises a ValueError if the dataset does not match the processed dataset schema (see validate_schema)
+
+    Returns:
+    Pandas dataframe of the dataset
+    """
+    fmt = dataset_format(path)
+    if fmt == "parquet":
+        df = pd.read_parquet(path)
+    elif fmt == "feather":
+        df = pd.read_feather(path)
+    elif fmt == "pickle":
+        df = pd.read_pickle(path)
+    else:
+        df = pd.read_csv(path)
+        if df.empty:
+            # A file with only a header has no values to infer the column types from, so the declared types are used
+            df = df.astype({col: dtype for col, dtype in PROCESSED_SCHEMA.items() if col in df.columns})
+    if validate:
+        validate_schema(df)
+    return df
+
+
+def mmap_cache_paths(path):
+    """Returns the paths of the .npy array and the .json metadata file that make up the memory-mapped cache of a dataset file.  They are kept in a .mmap_cache directory next to the file."""
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), MMAP_CACHE_DIR)
+    npy_file = os.path.join(cache_dir, os.path.basename(path) + ".npy")
+    return npy_file, npy_file + ".json"
+
+
+def build_mmap_cache(path, chunksize=100000):
+    """Stores the columns of a dataset as one float64 .npy array in its cache directory, in column-major order so every column is contiguous on disk.  The dataset is read twice with iter_dataset, once to count the rows and check the column types and once to copy each chunk into the memory-mapped array, so only one chunk is ever held in memory.  The metadata file records the column names, the size and modification time of the source file, so that a changed source file makes the cache stale, and a SHA-1 digest of the values, so the contents can be identified without reading them again.
+
+    Arguments:
+    path -- path of a .csv, Parquet, or Feather dataset file with only numeric columns
+    chunksize -- number of rows to read at a time
+
+    Returns:
+    None; raises a ValueError if the dataset has non-numeric columns
+    """
+    columns = None
+    rows = 0
+    for chunk in iter_dataset(path, chunksize):
+        if columns is None:
+            columns = list(chunk.columns)
+        non_numeric = [col for col in chunk.columns if not pd.api.types.is_numeric_dtype(chunk[col])]
+        if non_numeric:
+            raise ValueError("Only numeric datasets can be memory-mapped; these columns are not numeric: {}".format(non_numeric))
+        rows += chunk.shape[0]
+    if columns is None:
+        # A .csv file with only a header has no chunks
+        columns = list(load_dataset(path).columns)
+
+    npy_file, meta_file = mmap_cache_paths(path)
+    os.makedirs(os.path.dirname(npy_file), exist_ok=True)
+    stat = os.stat(path)
+    tmp_file = npy_file + ".tmp"
+    values = np.lib.format.open_memmap(tmp_file, mode="w+", dtype=np.float64, shape=(rows, len(columns)), fortran_order=True)
+    digest = hashlib.sha1(repr(columns).encode())
+    start = 0
+    for chunk in iter_dataset(path, chunksize) if rows else []:
+        block = chunk.to_numpy(dtype=np.float64, na_value=np.nan)
+        values[start:start + block.shape[0]] = block
+        digest.update(np.ascontiguousarray(block).tobytes())
+        start += block.shape[0]
+    values.flush()
+    del values
+    os.replace(tmp_file, npy_file)
+    with open(meta_file, "w") as f:
+        json.dump({"columns": columns, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "digest": digest.hexdigest()}, f)
+
+
+def read_mmap_meta(path):
+    """Returns the metadata of the memory-mapped cache of a dataset file, or None if there is no cache or the source file has changed since it was built."""
+    npy_file, meta_file = mmap_cache_paths(path)
+    if not (os.path.exists(npy_file) and os.path.exists(meta_file)):
+        return None
+    with open(meta_file) as f:
+        meta = json.load(f)
+    stat = os.stat(path)
+    if meta["size"] != stat.st_size or meta["mtime_ns"] != stat.st_mtime_ns or "digest" not in meta:
+        return None
+    return meta
+
+
+def mmap_digest(path):
+    """Returns the SHA-1 digest of the values and column names of a dataset recorded in its memory-mapped cache, or None if the cache is missing or stale."""
+    meta = read_mmap_meta(path)
+    return meta["digest"] if meta is not None else None
+
+
+def load_dataset_mmap(path):
+    """Loads a dataset as a dataframe backed by a read-only memory-mapped .npy array.  The array is built from the dataset file on the first call (see build_mmap_cache) and reused while the file is unchanged, so several regression runs on the same dataset share the operating system's page cache instead of each parsing and copying the file.  All columns are float64.
+
+    Arguments:
+    path -- path of a .csv, Parquet, or Feather dataset file with only numeric columns
+
+    Returns:
+    Pandas dataframe whose values are a view of the memory-mapped array
+    """
+    logger = logging.getLogger("thelogger")
+    meta = read_mmap_meta(path)
+    npy_file, _ = mmap_cache_paths(path)
+    if meta is None:
+        logger.info("Building the memory-mapped copy of {} in {}. \n".format(path, npy_file))
+        build_mmap_cache(path)
+        meta = read_mmap_meta(path)
+
+    values = np.load(npy_file, mmap_mode="r")
+    # A 2D array of one dtype becomes a single block without being copied
+    return pd.DataFrame(values, columns=meta["columns"], copy=False)
+
+
+def iter_dataset(path, chunksize=100000):
+    """Reads a .csv, Parquet, Feather, or pickle dataset file in chunks, so that datasets larger than memory can be processed one chunk at a time.  Parquet and Feather need the pyarrow package.
+
+    Arguments:
+    path -- path of the dataset file
+    chunksize -- number of rows per chunk; Feather files are read one record batch at a time instead, and pickle files are loaded whole, then split
+
+    Returns:
+    iterator of Pandas dataframes
+    """
+    fmt = dataset_format(path)
+    if fmt == "csv":
+        yield from pd.read_csv(path, chunksize=chunksize)
+        return
+    if fmt == "pickle":
+        df = pd.read_pickle(path)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    if fmt == "parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i).to_pandas()
@@ -0,0 +1,102 @@
+import os
+import logging
+import hashlib
+import numpy as np
+import pandas as pd
+
+
+# Longest base-36 id that fits in an int64 (36**12 < 2**63)
+MAX_ID_LENGTH = 12
+
+# Value of each byte as a base-36 digit; -1 for characters that are not digits
+DIGIT_VALUES = np.full(256, -1, dtype=np.int64)
+DIGIT_VALUES[np.frombuffer(b"0123456789", dtype=np.uint8)] = np.arange(10)
+DIGIT_VALUES[np.frombuffer(b"abcdefghijklmnopqrstuvwxyz", dtype=np.uint8)] = np.arange(10, 36)
+DIGIT_VALUES[np.frombuffer(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ", dtype=np.uint8)] = np.arange(10, 36)
+
+
+def decode_ids(ids):
+    """Decodes base-36 Reddit post ids (for example '7n2k3f', optionally with the 't3_' type prefix) into integers, all at once with NumPy instead of calling int(id, 36) per row.
+
+    Arguments:
+    ids -- Pandas series of id strings
+
+    Returns:
+    NumPy int64 array with one value per id; -1 for missing ids and ids that are not valid base-36 numbers of at most MAX_ID_LENGTH digits
+    """
+    text = ids.fillna("").astype(str).str.strip().str.replace(r"^t3_", "", regex=True)
+    valid = text.str.fullmatch("[0-9A-Za-z]{{1,{}}}".format(MAX_ID_LENGTH)).to_numpy(dtype=bool)
+    chars = np.frombuffer(text.where(valid, "").to_numpy(dtype="S{}".format(MAX_ID_LENGTH)).tobytes(), dtype=np.uint8).reshape(len(text), MAX_ID_LENGTH)
+    values = np.zeros(len(text), dtype=np.int64)
+    for i in range(MAX_ID_LENGTH):
+        # Shorter ids are padded with null bytes, which end the number
+        column = chars[:, i]
+        values = np.where(column != 0, values * 36 + DIGIT_VALUES[column], values)
+    return np.where(valid, values, -1)
+
+
+class SeenIdIndex:
+    """Exact index of the decoded ids of the posts that were already ingested, stored as a sorted int64 array in a .npy file (8 bytes per post).  Posts that are in the index, or that repeat an earlier row of the same run, are dropped before the titles are parsed, so repeated and overlapping exports only cost their new rows.  The ids of a run are kept apart in a few sorted arrays that are merged as they accumulate, and are only added to the file by save, so a run that fails does not mark its posts as ingested.
+
+    Arguments:
+    path -- path of the .npy file; it is created by save if it does not exist
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.ids = np.load(path) if os.path.exists(path) else np.empty(0, dtype=np.int64)
+        self.pending = []
+
+    def __len__(self):
+        return len(self.ids) + sum(len(ids) for ids in self.pending)
+
+    def digest(self):
+        """Returns a hash of the ids in the index, which identifies its state."""
+        digest = hashlib.sha1(self.ids.tobytes())
+        for ids in self.pending:
+            digest.update(ids.tobytes())
+        return digest.hexdigest()
+
+    def contains(self, ids):
+        """Returns a boolean array that is True for the ids that are in the index."""
+        found = np.zeros(len(ids), dtype=bool)
+        for sorted_ids in [self.ids] + self.pending:
+            if len(sorted_ids):
+                positions = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+                found |= sorted_ids[positions] == ids
+        return found
+
+    def add(self, ids):
+        """Adds decoded ids to the index of this run; invalid (-1) ids are ignored."""
+        ids = np.unique(ids[ids >= 0])
+        if len(ids):
+            self.pending.append(ids)
+        if len(self.pending) > 8:
+            self.pending = [np.unique(np.concatenate(self.pending))]
+
+    def filter_new(self, df):
+        """Drops the rows of a raw dataframe whose post id is in the index or appears in an earlier row, and adds the ids of the remaining rows to the index of this run.  Rows without a valid id are kept.
+
+        Arguments:
+        df -- Pandas dataframe of raw posts with an 'id' column
+
+        Returns:
+        Pandas dataframe of the new rows
+        """
+        logger = logging.getLogger("thelogger")
+        ids = decode_ids(df["id"])
+        seen = self.contains(ids) | (pd.Series(ids).duplicated().to_numpy() & (ids >= 0))
+        self.add(ids[~seen])
+        logger.info("Dropped {} posts that were already ingested or repeated; {} new rows remain. \n".format(int(seen.sum()), int((~seen).sum())))
+        return df[~seen]
+
+    def save(self):
+        """Merges the ids of this run into the sorted array and writes it to the .npy file atomically."""
+        logger = logging.getLogger("thelogger")
+        self.ids = np.unique(np.concatenate([self.ids] + self.pending))
+        self.pending = []
+        tmp_file = self.path + ".tmp"
+        with open(tmp_file, "wb") as f:
+            np.save(f, self.ids)
+        os.replace(tmp_file, self.path)
+        logger.info("Saved {} ingested post ids to {}. \n".format(len(self.ids), self.path))
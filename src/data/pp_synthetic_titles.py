@@ -0,0 +1,200 @@
+'''
+Generates synthetic raw r/progresspics exports with the columns of the BigQuery export (see RAW_COLUMNS), so that the cleaning pipeline and its parsers can be run and benchmarked at any scale without the 2018 raw data.  The titles mix the formats found in real posts: straight and curly feet/inches, centimeters, pounds and kilograms, with or without the total, durations in days to years, NSFW tags, swapped fields, and a share of titles that the parsers reject.
+
+Write a file with, for example:  python -m src.data.pp_synthetic_titles 1000000 raw_1m.csv --seed 0
+'''
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+
+
+# Columns of the raw export, in the order of the BigQuery download
+RAW_COLUMNS = ["title", "score", "timestamp", "id", "num_comments", "created_utc", "author", "permalink"]
+
+# Posts are dated within 2018, like the included data
+START_UTC = 1514764800
+SECONDS_PER_YEAR = 365 * 24 * 3600
+
+# Ids are the base-36 numbers from FIRST_ID on, so they have 6 digits like the 2018 post ids and never repeat for different row numbers
+FIRST_ID = 36 ** 5
+ID_DIGITS = np.array(list("0123456789abcdefghijklmnopqrstuvwxyz"), dtype=object)
+
+SEX_SPELLINGS = {"M": ["M", "m", "Male", "M "], "F": ["F", "f", "Female", "F "]}
+UNKNOWN_SEXES = ["X", "NB", "?", ""]
+HEIGHT_FORMATS = ["{ft}'{inch}\"", "{ft}’{inch}”", "{cm}cm", "{ft}'{inch}", "{ft}'{inch}.5", "{ft}ft", "{cm} cm", "malformed"]
+HEIGHT_SHARES = [0.5, 0.13, 0.08, 0.14, 0.03, 0.02, 0.03, 0.07]
+MALFORMED_HEIGHTS = ["", "tall", "5'11\"\"\"", "3'2", "5 foot 6", "6'0''"]
+WEIGHT_FORMATS = ["[{a}{u} &gt; {b}{u} = {d}{u}]", "[{a} &gt; {b} = {d}{u}]", "({a} &gt; {b} = {d}{u})", "[{a}{u} &gt; {b}{u}]", "[{a}-{b}]", "[{a}{u} &gt; {b}{u} &gt; {g}{u}]", "malformed"]
+WEIGHT_SHARES = [0.45, 0.15, 0.12, 0.1, 0.06, 0.05, 0.07]
+MALFORMED_WEIGHTS = ["[no weights yet]", "", "[300 &gt; 2.5]", "((200 &gt; 150))", "[SW &gt; CW]"]
+POUND_UNITS = ["lbs", "lb", "", " lbs", "LBS"]
+KILOGRAM_UNITS = ["kg", "kgs", " kg", "KG"]
+DURATION_UNITS = ["days", "day", "weeks", "week", "months", "month", "years", "year", "Months", "YEARS", "mos"]
+DURATION_SHARES = [0.1, 0.02, 0.12, 0.03, 0.36, 0.05, 0.12, 0.12, 0.03, 0.02, 0.03]
+# Largest whole number of each duration unit
+DURATION_MAXIMUMS = [365, 365, 104, 104, 60, 60, 8, 8, 60, 8, 60]
+DURATION_FORMATS = [" ({n} {unit})", " {n} {unit}", " ( {n} {unit} )", " in {n} {unit}!", " ({n}{unit})"]
+CAPTIONS = ["", "", " Long time lurker, first post", " Only the beginning", " Still a long way to go", " Keto and running", " Never thought I'd get here", " CICO works"]
+MALFORMED_TITLES = ["Just a picture of my progress!", "M/22", "Progress! NSFW", "F 24 5'5 200&gt;150", "One year of lifting", "[M/30/5'9] before and after"]
+
+
+def format_rows(template, **columns):
+    """Fills a str.format template row by row from arrays of values, one per template field."""
+    return np.array([template.format(**dict(zip(columns, values))) for values in zip(*columns.values())], dtype=object)
+
+
+def pick_formats(rng, n, shares):
+    """Returns the index of a randomly chosen format for each of n rows, drawn with the provided shares."""
+    return rng.choice(len(shares), size=n, p=np.asarray(shares) / np.sum(shares))
+
+
+def synthetic_titles(n, rng):
+    """Generates n r/progresspics post titles.  Heights and weights are drawn from distributions that depend on the sex, the weight change is mostly a loss, and about a fifth of the weights are written in kilograms.  Each part of the title is written in one of several formats, and some rows swap the fields or are malformed, so every branch of the parsers is exercised.
+
+    Arguments:
+    n -- number of titles
+    rng -- NumPy random Generator
+
+    Returns:
+    NumPy object array of title strings
+    """
+    female = rng.random(n) < 0.55
+    sex = np.where(female, "F", "M")
+    sex_text = np.array([SEX_SPELLINGS[s][k] for s, k in zip(sex, rng.choice(4, size=n, p=[0.8, 0.1, 0.05, 0.05]))], dtype=object)
+    unknown = np.flatnonzero(rng.random(n) < 0.015)
+    sex_text[unknown] = rng.choice(UNKNOWN_SEXES, size=len(unknown))
+    age = np.clip(rng.normal(29, 8, n), 14, 75).astype(int).astype(str).astype(object)
+
+    # Heights
+    inches = np.clip(np.where(female, rng.normal(64.5, 2.8, n), rng.normal(70, 3, n)), 54, 84)
+    height_format = pick_formats(rng, n, HEIGHT_SHARES)
+    height = np.empty(n, dtype=object)
+    for k, template in enumerate(HEIGHT_FORMATS):
+        rows = np.flatnonzero(height_format == k)
+        if template == "malformed":
+            height[rows] = rng.choice(MALFORMED_HEIGHTS, size=len(rows))
+        elif len(rows):
+            ft, inch = np.divmod(np.round(inches[rows]).astype(int), 12)
+            height[rows] = format_rows(template, ft=ft, inch=inch, cm=np.round(inches[rows] * 2.54).astype(int))
+
+    # Weights, in pounds then converted for the titles written in kilograms
+    start = np.clip(np.where(female, rng.normal(215, 55, n), rng.normal(255, 60, n)), 95, 700)
+    change = rng.choice(3, size=n, p=[0.82, 0.14, 0.04])
+    loss = np.minimum(rng.gamma(2, 28, n) + 1, start - 90)
+    end = np.where(change == 0, start - loss, np.where(change == 1, start + rng.gamma(1.5, 12, n) + 1, start))
+    goal = end - rng.gamma(2, 10, n)
+    kilograms = rng.random(n) < 0.2
+    scale = np.where(kilograms, 0.4536, 1.0)
+    a, b, g = (np.round(w * scale).astype(int) for w in (start, end, goal))
+    unit = np.where(kilograms, rng.choice(KILOGRAM_UNITS, size=n), rng.choice(POUND_UNITS, size=n))
+    weight_format = pick_formats(rng, n, WEIGHT_SHARES)
+    weights = np.empty(n, dtype=object)
+    for k, template in enumerate(WEIGHT_FORMATS):
+        rows = np.flatnonzero(weight_format == k)
+        if template == "malformed":
+            weights[rows] = rng.choice(MALFORMED_WEIGHTS, size=len(rows))
+        elif len(rows):
+            weights[rows] = format_rows(template, a=a[rows], b=b[rows], d=a[rows] - b[rows], g=g[rows], u=unit[rows])
+
+    # Durations: none for a third of the titles, otherwise mostly months
+    duration = np.full(n, "", dtype=object)
+    rows = np.flatnonzero(rng.random(n) >= 0.33)
+    unit_index = pick_formats(rng, len(rows), DURATION_SHARES)
+    whole = np.ceil(rng.random(len(rows)) * np.take(DURATION_MAXIMUMS, unit_index)).astype(int).astype(str)
+    amount = np.where(rng.random(len(rows)) < 0.1, rng.choice(["0.5", "1.5", "2.5"], size=len(rows)), whole)
+    templates = rng.choice(DURATION_FORMATS, size=len(rows))
+    duration[rows] = [template.format(n=amount_text, unit=DURATION_UNITS[k]) for template, amount_text, k in zip(templates, amount, unit_index)]
+
+    # Field order: mostly sex/age/height, sometimes age/sex or height and age swapped
+    order = rng.choice(3, size=n, p=[0.88, 0.08, 0.04])
+    first = np.where(order == 1, age, sex_text)
+    second = np.where(order == 1, sex_text, np.where(order == 2, height, age))
+    third = np.where(order == 2, age, height)
+    titles = first + "/" + second + "/" + third + " " + weights + duration + rng.choice(CAPTIONS, size=n).astype(object)
+
+    tags = rng.random(n)
+    titles = np.where(tags < 0.04, titles + " NSFW", np.where(tags < 0.06, titles + " nsfw (face)", titles))
+    lower = rng.random(n) < 0.05
+    titles[lower] = [title.lower() for title in titles[lower]]
+    malformed = np.flatnonzero(rng.random(n) < 0.03)
+    titles[malformed] = rng.choice(MALFORMED_TITLES, size=len(malformed))
+    return titles
+
+
+def encode_ids(numbers):
+    """Returns the base-36 strings of an array of non-negative integers, the way Reddit writes post ids."""
+    numbers = np.asarray(numbers, dtype=np.int64)
+    numbers, digits = np.divmod(numbers, 36)
+    ids = ID_DIGITS[digits]
+    while numbers.any():
+        left = numbers > 0
+        numbers, digits = np.divmod(numbers, 36)
+        ids = np.where(left, ID_DIGITS[digits] + ids, ids)
+    return ids
+
+
+def synthetic_posts(n, seed=0, start=0, num_authors=None):
+    """Generates a raw export of n r/progresspics posts with the RAW_COLUMNS of the BigQuery download.  Row i gets the post id of number start + i, so exports generated with overlapping ranges share the posts of the overlap (with the same ids, but titles drawn from their own seed).  Most authors have a few posts, and a small share of the posts come from a heavy-tailed set of frequent posters.
+
+    Arguments:
+    n -- number of posts
+    seed -- seed of the random generator; the same seed and start give the same posts
+    start -- number of the first post, for generating an export in several pieces
+    num_authors -- number of distinct authors to draw from; defaults to a third of n
+
+    Returns:
+    Pandas dataframe of raw posts
+    """
+    rng = np.random.default_rng([seed, start])
+    num_authors = num_authors or max(1, n // 3)
+    created_utc = START_UTC + np.sort(rng.integers(0, SECONDS_PER_YEAR, n))
+    ids = encode_ids(FIRST_ID + start + np.arange(n))
+    author_numbers = np.where(rng.random(n) < 0.05, (rng.zipf(1.6, n) - 1) % num_authors, rng.integers(0, num_authors, n))
+    authors = "user_" + author_numbers.astype(str).astype(object)
+    authors[rng.random(n) < 0.03] = "[deleted]"
+    score = np.minimum(rng.lognormal(3.5, 1.8, n), 80000).astype(int)
+    return pd.DataFrame({
+        "title": synthetic_titles(n, rng),
+        "score": score,
+        "timestamp": pd.to_datetime(created_utc, unit="s"),
+        "id": ids,
+        "num_comments": rng.poisson(2 + np.sqrt(score)),
+        "created_utc": created_utc,
+        "author": authors,
+        "permalink": "/r/progresspics/comments/" + ids + "/",
+    }, columns=RAW_COLUMNS)
+
+
+def write_synthetic_csv(path, n, seed=0, chunksize=1000000):
+    """Writes a synthetic raw export of n posts to a .csv file, generating it chunksize rows at a time so that memory use does not depend on n.
+
+    Arguments:
+    path -- path of the .csv file to write
+    n -- number of posts
+    seed -- seed of the random generator
+    chunksize -- number of posts generated and written at a time
+
+    Returns:
+    None
+    """
+    logger = logging.getLogger("thelogger")
+    for start in range(0, n, chunksize):
+        chunk = synthetic_posts(min(chunksize, n - start), seed=seed, start=start, num_authors=max(1, n // 3))
+        chunk.to_csv(path, mode="w" if start == 0 else "a", header=(start == 0), index=False)
+        logger.info("Wrote {} of {} synthetic posts to {}. \n".format(start + chunk.shape[0], n, path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Writes a synthetic raw r/progresspics export for testing and benchmarking the cleaning pipeline.")
+    parser.add_argument("rows", type=int, help="number of posts")
+    parser.add_argument("file", help="path of the .csv file to write")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random generator")
+    parser.add_argument("--chunksize", type=int, default=1000000, help="number of posts generated and written at a time")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    write_synthetic_csv(args.file, args.rows, seed=args.seed, chunksize=args.chunksize)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+import os
+import tempfile
+import time
+import logging
+import numpy as np
+import pandas as pd
+import src.features.pp_feature_building as feat
+import src.data.pp_dataset_io as dataset_io
+
+
+# Columns kept in the two processed datasets written by main.py
+PROCESSED_DATA_COLUMNS = ['age', 'sex', 'height_in', 'start_weight', 'end_weight','weight_diff', 'score', 'num_comments', 'month', 'dayofweek', 'NSFW', "num_posts"]
+PROCESSED_DURATION_COLUMNS = ['age', 'sex', 'height_in', 'start_weight', 'end_weight', 'weight_diff', 'score', 'num_comments', 'month', 'dayofweek', 'NSFW', "num_posts", "period_months", 'rate', 'norm_rate']
+
+
+def clean_data(pp_data, pause=5, workers=1, cache=None, height_cache=None):
+    """Extracts and cleans the sex, age, height, weight, date time, and NSFW features from a dataframe of raw r/progresspics posts.  Every step only looks at one row at a time, so the function can be run on the whole dataset or on one chunk of it.
+
+    Arguments:
+    pp_data -- Pandas dataframe with the 'title', 'score', 'num_comments', 'author', and 'timestamp' columns of the BigQuery export
+    pause -- number of seconds to wait after each step so the status updates can be read; provide 0 to skip the waits
+    workers -- number of processes used to parse the titles
+    cache -- optional ParseCache in front of extract_title_features
+    height_cache -- optional ParseCache in front of height_inches
+
+    Returns:
+    pp_data -- Pandas dataframe containing the rows that could be cleaned, with the renamed feature columns
+    features -- Pandas dataframe returned by extract_features_batch for the imported rows; needed by get_duration_data
+    """
+    logger = logging.getLogger("thelogger")
+
+    # Extracting the raw sex, age, height, and weights from the title column
+    logger.info("Adding and populating the 'raw_sex', 'raw_age', 'raw_height', and 'raw_weights' columns.\n")
+
+    pp_data = pp_data.reindex(columns=['title', 'raw_sex', 'raw_age', 'raw_height', 'raw_weights', 'score', 'timestamp','id', 'num_comments', 'created_utc', 'author', 'permalink'])
+
+    features = feat.extract_features_batch(pp_data["title"], workers=workers, cache=cache)
+    pp_data[["raw_sex", "raw_age", "raw_height", "raw_weights"]] = features[["raw_sex", "raw_age", "raw_height", "raw_weights"]]
+
+    pp_data = pp_data[pp_data["raw_height"] != 'unknown']
+    pp_data = pp_data[pp_data["raw_height"].str.len() <= 6]
+
+    logger.info("After removing rows with incorrectly formatted titles, {} rows remain. \n".format(pp_data.shape[0]))
+    time.sleep(pause)
+
+    # Extracting the raw starting weights and ending weights from the raw_weight column
+    logger.info("Adding and populating the start_weight and end_weight columns. \n")
+
+    pp_data = pp_data.reindex(columns=['title', 'raw_sex', 'raw_age', 'raw_height', 'raw_weights', 'start_weight', 'end_weight','score','timestamp', 'id', 'num_comments', 'created_utc', 'author','permalink'])
+
+    pp_data[["start_weight", "end_weight"]] = features.loc[pp_data.index, ["start_weight", "end_weight"]]
+
+    pp_data = pp_data[pp_data['start_weight'] != 'unknown']
+
+    logger.info("After removing rows with incorrectly formatted weights, {} rows remain. \n".format(pp_data.shape[0]))
+    time.sleep(pause)
+
+    # Cleaning the raw_sex column
+    logger.info("Cleaning the raw_sex column then adding the results to the new sex column. 0 is male and 1 is female. \n")
+
+    pp_data = pp_data.reindex(columns=['title', 'raw_sex', 'sex', 'raw_age', 'raw_height', 'raw_weights', 'start_weight', 'end_weight','score','timestamp', 'id', 'num_comments', 'created_utc', 'author','permalink'])
+
+    pp_data["sex"] = pp_data["raw_sex"].apply(feat.clean_sex)
+
+    sex_unknown = pp_data[pp_data["sex"] == 'unknown'].copy()
+    sex_unknown.columns = ['title', 'raw_age', 'sex', 'raw_sex', 'raw_height', 'raw_weights', 'start_weight', 'end_weight', 'score', 'timestamp', 'id', 'num_comments', 'created_utc', 'author', 'permalink']
+    sex_unknown.loc[:, "sex"] = sex_unknown.loc[:, "raw_sex"].apply(feat.clean_sex)
+    sex_unknown = sex_unknown.reindex(columns=['title', 'raw_sex', 'sex', 'raw_age', 'raw_height', 'raw_weights', 'start_weight', 'end_weight', 'score', 'timestamp', 'id', 'num_comments', 'created_utc', 'author', 'permalink'])
+    pp_data.update(sex_unknown)
+    pp_data = pp_data[(pp_data["sex"] == "M")|(pp_data["sex"] == "F")]
+
+    pp_data["sex"] = pp_data['sex'].apply(lambda s: 1 if s == "F" else 0)
+
+    logger.info("After removing rows where the sex could not be determined, {} rows remain. \n".format(pp_data.shape[0]))
+    time.sleep(pause)
+
+    # Cleaning the raw_age column
+    logger.info("Cleaning the raw_age column.\n")
+
+    pattern = r"([0-9]{2})"
+    age_info = pp_data[(pp_data["raw_height"].str.match(pattern))&(pp_data["raw_height"].str.len() == 2)]
+
+    logger.info("Identified {} rows where the age is in the height column and vice versa. Fix by switching column names.\n".format(age_info.shape[0]))
+
+    age_info.columns = ['title', 'raw_height', 'raw_sex', 'sex', 'raw_age', 'raw_weights', 'start_weight', 'end_weight', 'score', 'timestamp', 'id', 'num_comments', 'created_utc', 'author', 'permalink']
+    pp_data.update(age_info)
+
+    pp_data = pp_data[pp_data["raw_age"].str.len() == 2]
+    pattern = r"(^[0-9]{2}?)"
+    pp_data = pp_data[pp_data["raw_age"].str.match(pattern)]
+    pp_data["raw_age"] = pd.to_numeric(pp_data["raw_age"], errors='coerce')
+
+    logger.info("After removing rows where raw_age did not contain a 2-digit integer, {} rows remain.\n".format(pp_data.shape[0]))
+    time.sleep(pause)
+
+    # Cleaning the raw_height column
+    logger.info("Cleaning the raw_height column and storing height in inches in the new height_in column.\n")
+
+    pp_data["num_height"] = pp_data["raw_height"].apply(feat.number_height)
+    if height_cache is not None:
+        pp_data["height_in"] = pd.Series(height_cache.map(pp_data["num_height"].tolist()), index=pp_data.index, dtype=object)
+    else:
+        pp_data["height_in"] = pp_data["num_height"].apply(feat.height_inches)
+
+    pp_data = normalize_units(pp_data, features, pause=pause)
+
+    # Adding date time columns
+    logger.info("After converting the timestamp to the datetime format, populate the following new columns:  month, year, day, dayofweek, date, time. \n")
+
+    pp_data["timestamp"] = pd.to_datetime(pp_data["timestamp"])
+
+    pp_data["month"] = pp_data["timestamp"].dt.month
+    pp_data["year"] = pp_data["timestamp"].dt.year
+    pp_data["day"] = pp_data["timestamp"].dt.day
+    pp_data["dayofweek"] = pp_data["timestamp"].dt.dayofweek
+    pp_data["date"] = pp_data["timestamp"].dt.date
+    pp_data["time"] = pp_data["timestamp"].dt.time
+
+    pp_data = pp_data.reindex(columns=['title', 'raw_age', 'sex', 'height_in', 'new_start_weight', 'new_end_weight', 'weight_diff', 'NSFW', 'num_posts', 'score', 'num_comments', 'timestamp', 'id', 'created_utc', 'author', 'permalink', 'month', 'year', 'day', 'dayofweek', 'date', 'time', 'raw_sex', 'raw_height', 'num_height', 'raw_weights', 'start_weight', 'end_weight'])
+
+    pp_data.columns = (['title', 'age', 'sex', 'height_in', 'start_weight', 'end_weight', 'weight_diff', 'NSFW', 'num_posts', 'score', 'num_comments', 'timestamp', 'id', 'created_utc', 'author', 'permalink', 'month', 'year', 'day', 'dayofweek', 'date', 'time', 'raw_sex', 'raw_height', 'num_height', 'raw_weights', 'raw_start_weight', 'raw_end_weight'])
+
+    logger.info("Reorder and rename some columns so that the names of the columns are easier to use. New column names and order: 'title', 'age', 'sex', 'height_in', 'start_weight', 'end_weight', 'weight_diff', 'score', 'timestamp', 'id', 'num_comments', 'created_utc', 'author', 'permalink', 'month', 'year', 'day', 'dayofweek', 'date', 'time', 'raw_sex', 'raw_height', 'num_height', 'raw_weights', 'raw_start_weight', 'raw_end_weight'\n")
+
+    time.sleep(pause)
+
+    # Extract a (NSFW) not safe for work feature
+    logger.info("Extracting an NSFW feature.  A 1 in this column indicates that the title of the post contains the NSFW (not safe for work) acronym, while a 0 indicates that it did not. \n")
+
+    pp_data["NSFW"] = features.loc[pp_data.index, "NSFW"]
+
+    time.sleep(pause)
+
+    return pp_data, features
+
+
+def normalize_units(pp_data, features, pause=5):
+    """Converts the heights to numbers and the weights to pounds, calculates weight_diff, and removes the rows with a height, weight, or weight_diff outside the plausible range.  Each mask is computed once and all of the range filters are applied together, while the number of rows left after each filter is still logged.
+
+    Weights are assumed to be in kilograms when the title gives a total in kilograms (e.g. "= 20 kg"), or when the title contains "kg" and the starting weight is under 130.
+
+    Arguments:
+    pp_data -- Pandas dataframe with the height_in, start_weight, and end_weight columns
+    features -- Pandas dataframe returned by extract_features_batch; provides the kg_total and kg flags
+    pause -- number of seconds to wait after each step so the status updates can be read; provide 0 to skip the waits
+
+    Returns:
+    pp_data -- Pandas dataframe containing the rows within range, with numeric height_in, start_weight, and end_weight columns and the new new_start_weight, new_end_weight, and weight_diff columns
+    """
+    logger = logging.getLogger("thelogger")
+
+    height_in = pd.to_numeric(pp_data["height_in"], errors='coerce').to_numpy(dtype=float)
+    keep = (height_in > 54) & (height_in < 85)
+
+    logger.info("After removing rows with incorrectly formatted height_in entries, {} rows remain.\n".format(keep.sum()))
+    time.sleep(pause)
+
+    # Cleaning the weight columns
+    logger.info("Cleaning the start_weight and end_weight columns and storing the weights in pounds in the new_start_weight and new_end_weight columns.\n")
+
+    start_weight = pd.to_numeric(pp_data["start_weight"], errors='coerce').to_numpy(dtype=float)
+    end_weight = pd.to_numeric(pp_data["end_weight"], errors='coerce').to_numpy(dtype=float)
+    kg_total = features.loc[pp_data.index, "kg_total"].to_numpy(dtype=bool)
+    kg = features.loc[pp_data.index, "kg"].to_numpy(dtype=bool)
+    in_kg = kg_total | (kg & (start_weight < 130))
+    new_start_weight = np.where(in_kg, start_weight * 2.20462, start_weight)
+    new_end_weight = np.where(in_kg, end_weight * 2.20462, end_weight)
+    keep &= (new_start_weight <= 1000) & (new_end_weight >= 70) & (new_end_weight < 1000)
+
+    logger.info("After removing rows with incorrectly formatted start_weight or end_weight entries, {} rows remain.\n".format(keep.sum()))
+    time.sleep(pause)
+
+    # Calculating the amount of weight gained or lost
+    logger.info("Calculating the amount of weight gained or lost and storing the results in the new weight_diff column. \n")
+
+    weight_diff = new_start_weight - new_end_weight
+    keep &= (weight_diff >= -90) & (weight_diff < 599)
+
+    logger.info("After removing outlier weight_diff entries caused by r/progresspics user entry error, {} rows remain.\n".format(keep.sum()))
+    time.sleep(pause)
+
+    return pp_data[keep].assign(height_in=height_in[keep], start_weight=start_weight[keep], end_weight=end_weight[keep], new_start_weight=new_start_weight[keep], new_end_weight=new_end_weight[keep], weight_diff=weight_diff[keep])
+
+
+def count_posts(pp_data):
+    """Counts the number of rows per author in a cleaned dataframe.  The counts from several chunks can be added together and passed to add_num_posts.
+
+    Arguments:
+    pp_data -- Pandas dataframe returned by clean_data
+
+    Returns:
+    Pandas series of post counts indexed by author
+    """
+    return pp_data.groupby(['author'])['sex'].count()
+
+
+def update_author_counts(author_counts, author_store, batch):
+    """Adds the post counts of a new batch to a persistent AuthorCountStore and returns the stored totals of its authors, which include the posts of every batch ingested so far.
+
+    Arguments:
+    author_counts -- Pandas series of post counts of the new batch indexed by author, from count_posts
+    author_store -- AuthorCountStore to update
+    batch -- id of the new batch; a batch that is already in the store is not counted again
+
+    Returns:
+    Pandas series of the total post counts of the authors of the batch, to pass to add_num_posts
+    """
+    author_store.add_counts(author_counts, batch)
+    return author_store.lookup(author_counts.index)
+
+
+def add_num_posts(pp_data, author_counts=None, pause=5):
+    """Adds the num_posts column, the number of times the author posted to r/progresspics.  Rows with the author given as '[deleted]' are set to 1.
+
+    Arguments:
+    pp_data -- Pandas dataframe returned by clean_data
+    author_counts -- Pandas series of post counts indexed by author, used when pp_data is only one chunk of the dataset; if None, the counts are taken from pp_data itself
+    pause -- number of seconds to wait after the step so the status updates can be read; provide 0 to skip the wait
+
+    Returns:
+    pp_data -- Pandas dataframe with the num_posts column populated
+    """
+    logger = logging.getLogger("thelogger")
+
+    # Extract a multiple postings feature
+    logger.info("Extract a num_posts feature.  For each row, determine how many times the author posted to r/progresspics in 2018 and put that number to the num_posts column.\n")
+
+    if author_counts is None:
+        pp_data["num_posts"] = pp_data.groupby(['author'])['sex'].transform('count')
+    else:
+        pp_data["num_posts"] = pp_data["author"].map(author_counts)
+
+    deleted = pp_data["author"] == "[deleted]"
+    pp_data.loc[deleted, "num_posts"] = 1
+
+    logger.info("{} rows have the author given as '[deleted]'. For those rows, set num_posts equal to 1.\n".format(deleted.sum()))
+    time.sleep(pause)
+
+    return pp_data
+
+
+def get_duration_data(pp_data, features, pause=5):
+    """Builds the smaller dataset of posts whose titles give the time over which the weight change took place, and calculates the rate and normalized rate of weight change.
+
+    Arguments:
+    pp_data -- Pandas dataframe returned by clean_data
+    features -- Pandas dataframe returned by clean_data alongside pp_data
+    pause -- number of seconds to wait after each step so the status updates can be read; provide 0 to skip the waits
+
+    Returns:
+    pp_duration -- Pandas dataframe containing the rows with a usable duration and the period_weeks, period_months, rate, and norm_rate columns
+    """
+    logger = logging.getLogger("thelogger")
+
+    # Extract time frame of weight change in weeks and months
+    logger.info("Extract the amount of time over which the weight change took place.  Many r/progresspics users failed to include this information in their post titles so this will be a smaller dataset compared to the one that was just saved.\n")
+
+    logger.info("Save duration of weight loss in two new columns, period_weeks and period_months.\n")
+
+    duration = features.loc[pp_data.index, "has_duration"]
+    pp_duration = pp_data[duration]
+
+    pp_duration = pp_duration.reindex(columns=['title', 'age', 'sex', 'height_in', 'start_weight', 'end_weight', 'weight_diff', 'period_weeks', 'period_months','NSFW', 'num_posts', 'score', 'num_comments', 'timestamp', 'id',' created_utc', 'author', 'permalink', 'month', 'year', 'day', 'dayofweek', 'date', 'time', 'raw_sex', 'raw_height', 'num_height', 'raw_weights', 'raw_start_weight', 'raw_end_weight'])
+
+    duration_features = features.loc[pp_duration.index]
+    pp_duration['period_weeks'] = feat.duration_in_weeks_batch(duration_features["duration"], duration_features["duration_unit"])
+    pp_duration['period_months'] = feat.duration_in_months_batch(duration_features["duration"], duration_features["duration_unit"])
+
+    pp_duration = pp_duration[pp_duration["period_weeks"].notna()]
+    pp_duration = pp_duration[pp_duration["period_weeks"] >= 1]
+    pp_duration = pp_duration[pp_duration["period_weeks"] <= 850]
+
+    logger.info("After processing, {} rows remain. \n".format(pp_duration.shape[0]))
+
+    time.sleep(pause)
+
+    # Calculate rate of weight loss
+    logger.info("Calculate the rate of weight loss and the normalized rate of weight loss. Store the values in the new rate and norm_rate columns.\n")
+
+    pp_duration["rate"] = pp_duration['weight_diff']/pp_duration["period_months"]
+    pp_duration['norm_rate'] = pp_duration["weight_diff"]/pp_duration["start_weight"]/pp_duration["period_months"]
+
+    pp_duration = pp_duration[(pp_duration["rate"] < 30) & (pp_duration["rate"] > -30)]
+
+    logger.info("After trimming rows with extreme rates caused by user entry error, {} rows remain. \n".format(pp_duration.shape[0]))
+
+    return pp_duration
+
+
+def format_processed(pp_data, columns):
+    """Keeps only the processed feature columns and gives them the types used in the processed .csv files: an integer sex column and float columns for everything else.
+
+    Arguments:
+    pp_data -- Pandas dataframe with the processed feature columns
+    columns -- names of the columns to keep; provide PROCESSED_DATA_COLUMNS or PROCESSED_DURATION_COLUMNS
+
+    Returns:
+    Pandas dataframe with only the given columns
+    """
+    pp_pro = pp_data.reindex(columns=columns)
+    return pp_pro.astype({col: (int if col == "sex" else float) for col in columns})
+
+
+def clean_csv_chunked(file, file_name, file_name2, chunksize=100000, workers=1, cache=None, author_store=None, batch=None, seen_ids=None, height_cache=None):
+    """Cleans a raw .csv file of r/progresspics posts in chunks and appends the results to the two processed dataset files, so that memory use depends on the chunk size rather than the size of the dataset.  The first pass cleans each chunk, counts the posts per author, and stores the cleaned chunks in a temporary directory.  The second pass adds num_posts from the author totals and writes the processed datasets.
+
+    Arguments:
+    file -- path of the raw .csv file
+    file_name -- path of the processed dataset to write; a .parquet or .feather extension writes that format instead of .csv
+    file_name2 -- path of the processed duration dataset to write, in the same way
+    chunksize -- number of raw rows to read and clean at a time
+    workers -- number of processes used to parse the titles of each chunk
+    cache -- optional ParseCache in front of extract_title_features, shared by all the chunks
+    author_store -- optional AuthorCountStore; the counts of this file are added to it and num_posts counts the posts of every batch in it
+    batch -- id of this file in the author store
+    seen_ids -- optional SeenIdIndex; the rows of posts that are in it, or that repeat an earlier row, are dropped before their titles are parsed
+    height_cache -- optional ParseCache in front of height_inches, shared by all the chunks
+
+    Returns:
+    True if the processed datasets were written, False if the file has no new rows; a dataset without rows, such as the duration dataset of a file whose titles give no durations, is written with only its header
+    """
+    logger = logging.getLogger("thelogger")
+    author_counts = pd.Series(dtype=float)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_data = os.path.join(tmp_dir, "pp_data.csv")
+        tmp_duration = os.path.join(tmp_dir, "pp_duration.csv")
+        for i, chunk in enumerate(pd.read_csv(file, chunksize=chunksize, dtype={'author': str})):
+            logger.info("Cleaning chunk {} ({} rows). \n".format(i + 1, chunk.shape[0]))
+            if seen_ids is not None:
+                chunk = seen_ids.filter_new(chunk)
+                if chunk.empty:
+                    continue
+            pp_data, features = clean_data(chunk, pause=0, workers=workers, cache=cache, height_cache=height_cache)
+            author_counts = author_counts.add(count_posts(pp_data), fill_value=0)
+            pp_duration = get_duration_data(pp_data, features, pause=0)
+            pp_data.reindex(columns=PROCESSED_DATA_COLUMNS + ['author']).to_csv(tmp_data, mode='a', header=not os.path.exists(tmp_data), index=False)
+            pp_duration.reindex(columns=PROCESSED_DURATION_COLUMNS + ['author']).to_csv(tmp_duration, mode='a', header=not os.path.exists(tmp_duration), index=False)
+
+        if not os.path.exists(tmp_data):
+            return False
+        if author_store is not None:
+            author_counts = update_author_counts(author_counts, author_store, batch)
+        logger.info("Adding num_posts for {} authors and saving the processed datasets to {} and {}. \n".format(author_counts.shape[0], file_name, file_name2))
+        for tmp_file, out_file, columns in [(tmp_data, file_name, PROCESSED_DATA_COLUMNS), (tmp_duration, file_name2, PROCESSED_DURATION_COLUMNS)]:
+            if os.path.exists(out_file):
+                os.remove(out_file)
+            if not os.path.exists(tmp_file):
+                logger.info("No rows for {}; writing it with only the header. \n".format(out_file))
+                dataset_io.save_dataset(format_processed(pd.DataFrame(columns=columns), columns), out_file)
+                continue
+            chunks = pd.read_csv(tmp_file, chunksize=chunksize, dtype={'author': str}, float_precision='round_trip')
+            dataset_io.write_dataset((format_processed(add_num_posts(chunk, author_counts, pause=0), columns) for chunk in chunks), out_file)
+    return True
@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+
+
+# Labels of the sex codes of the processed datasets; the columns of the summary table are "all" followed by these
+SEX_LABELS = ["male", "female"]
+
+# Codes of the direction of the weight change of a post
+LOST, GAINED, SAME, MISSING = 0, 1, 2, 3
+
+# Bin edges of the histograms in the summary
+HISTOGRAM_BINS = {
+    "age": np.arange(0, 80, 5),
+    "height_in": np.arange(50, 80, 1),
+    "start_weight": np.arange(50, 1000, 10),
+    "end_weight": np.arange(50, 1000, 10),
+    "weight_lost": np.arange(0, 300, 10),
+    "weight_gained": np.arange(0, 300, 10),
+    "period_months": np.arange(0, 70, 3),
+    "rate": np.arange(0, 30, 1),
+}
+
+# Lower bounds of the age brackets; ages are whole years
+AGE_EDGES = [18, 20, 30, 50, 65]
+
+
+def group_codes(df):
+    """Returns the sex code (0 male, 1 female, 2 missing) and the weight change direction code (LOST, GAINED, SAME, or MISSING) of each row of a processed dataset."""
+    sex = df["sex"].to_numpy(dtype=np.float64)
+    weight_diff = df["weight_diff"].to_numpy(dtype=np.float64)
+    sex_codes = np.where(np.isnan(sex), 2, sex).astype(np.int64)
+    directions = np.select([weight_diff > 0, weight_diff < 0, weight_diff == 0], [LOST, GAINED, SAME], MISSING)
+    return sex_codes, directions
+
+
+def grouped_histogram(values, groups, ngroups, bins):
+    """Counts the values of each group that fall in each bin with a single np.bincount, binning the same way as np.histogram (the last bin includes its right edge).  The bins must be evenly spaced, so the bin of a value is computed from its distance to the first edge instead of searched for; values that land on the wrong side of an edge through rounding are then moved to the right bin.
+
+    Arguments:
+    values -- NumPy array of numbers; missing values are ignored
+    groups -- NumPy array with the group code of each value; negative codes are ignored
+    ngroups -- number of groups
+    bins -- evenly spaced edges of the bins; provide an array
+
+    Returns:
+    NumPy array of shape (ngroups, len(bins) - 1) with the counts
+    """
+    nbins = len(bins) - 1
+    bins = np.asarray(bins, dtype=np.float64)
+    valid = (values >= bins[0]) & (values <= bins[-1]) & (groups >= 0)
+    values = values[valid]
+    index = ((values - bins[0]) / (bins[1] - bins[0])).astype(np.int64)
+    np.minimum(index, nbins - 1, out=index)
+    index -= values < bins[index]
+    index += (values >= bins[index + 1]) & (index < nbins - 1)
+    counts = np.bincount(groups[valid] * nbins + index, minlength=ngroups * nbins)
+    return counts.reshape(ngroups, nbins)
+
+
+class GroupTotals:
+    """Aggregates of the columns of a dataframe per (sex, weight change direction) group, computed in one groupby pass, that can be added up over any set of groups.
+
+    Arguments:
+    df -- Pandas dataframe
+    statistics -- dictionary of column name: list of the groupby aggregations ("count", "sum", "min", "max") that are needed
+    sex_codes -- NumPy array of the sex codes of the rows, from group_codes
+    directions -- NumPy array of the weight change direction codes of the rows, from group_codes
+    """
+
+    def __init__(self, df, statistics, sex_codes, directions):
+        self.table = df.groupby(sex_codes * 4 + directions).agg(statistics)
+
+    def select(self, column, statistic, sexes, directions):
+        keys = [sex * 4 + direction for sex in sexes for direction in directions]
+        return self.table.loc[self.table.index.intersection(keys), (column, statistic)]
+
+    def count(self, column, sexes=(0, 1, 2), directions=(LOST, GAINED, SAME, MISSING)):
+        return int(self.select(column, "count", sexes, directions).sum())
+
+    def mean(self, column, sexes=(0, 1, 2), directions=(LOST, GAINED, SAME, MISSING)):
+        count = self.count(column, sexes, directions)
+        return self.select(column, "sum", sexes, directions).sum() / count if count else np.nan
+
+    def min(self, column, sexes=(0, 1, 2), directions=(LOST, GAINED, SAME, MISSING)):
+        return self.select(column, "min", sexes, directions).min()
+
+    def max(self, column, sexes=(0, 1, 2), directions=(LOST, GAINED, SAME, MISSING)):
+        return self.select(column, "max", sexes, directions).max()
+
+
+def by_sex(function, *args, **kwargs):
+    """Returns [all, male, female] values of a GroupTotals statistic."""
+    return [function(*args, **kwargs)] + [function(*args, sexes=(code,), **kwargs) for code in range(len(SEX_LABELS))]
+
+
+def summarize_eda(pp_data, pp_duration):
+    """Computes every statistic reported by the exploratory data analysis of main.py in one pass over each dataset: a groupby on the sex and the direction of the weight change, plus one np.bincount per histogram and for the age brackets.  No filtered copies of the datasets are made.
+
+    Arguments:
+    pp_data -- Pandas dataframe of the larger processed dataset
+    pp_duration -- Pandas dataframe of the dataset that includes the weight change duration features
+
+    Returns:
+    summary -- Pandas dataframe indexed by statistic with the columns "all", "male", and "female"; statistics that are not computed for a group are missing.  Counts are integers, shares are fractions between 0 and 1, and the weight gains are positive.
+    histograms -- dictionary of histogram name: dictionary of "male"/"female" (or "all" for period_months): bin counts, with the bin edges in HISTOGRAM_BINS
+    """
+    rows = {}
+    histograms = {}
+    sex_codes, directions = group_codes(pp_data)
+    totals = GroupTotals(pp_data, {
+        "sex": ["count"],
+        "age": ["count", "sum", "min", "max"],
+        "height_in": ["count", "sum"],
+        "start_weight": ["count", "sum"],
+        "end_weight": ["count", "sum"],
+        "weight_diff": ["count", "sum", "max"],
+    }, sex_codes, directions)
+
+    # Sex split
+    rows["rows"] = [pp_data.shape[0], None, None]
+    sex_counts = by_sex(totals.count, "sex")
+    rows["sex_count"] = sex_counts
+    rows["sex_share"] = [None] + [count / sex_counts[0] for count in sex_counts[1:]]
+
+    # Ages and age brackets
+    rows["age_mean"] = by_sex(totals.mean, "age")
+    rows["age_min"] = [totals.min("age"), None, None]
+    rows["age_max"] = [totals.max("age"), None, None]
+    age = pp_data["age"].to_numpy(dtype=np.float64)
+    brackets = np.bincount(np.where(np.isnan(age), len(AGE_EDGES) + 1, np.digitize(age, AGE_EDGES)), minlength=len(AGE_EDGES) + 2)
+    adults = brackets[1:len(AGE_EDGES) + 1].sum()
+    rows["age_20s_share"] = [brackets[2] / pp_data.shape[0], None, None]
+    rows["adults_count"] = [adults, None, None]
+    rows["adults_18_29_share"] = [(brackets[1] + brackets[2]) / adults, None, None]
+    rows["adults_30_49_share"] = [brackets[3] / adults, None, None]
+    rows["adults_50_64_share"] = [brackets[4] / adults, None, None]
+    rows["adults_65_plus_share"] = [brackets[5] / adults, None, None]
+
+    # Heights and weights
+    for column in ["height_in", "start_weight", "end_weight"]:
+        rows[column + "_mean"] = by_sex(totals.mean, column)
+    sex_groups = np.where(sex_codes < len(SEX_LABELS), sex_codes, -1)
+    for column in ["age", "height_in", "start_weight", "end_weight"]:
+        counts = grouped_histogram(pp_data[column].to_numpy(dtype=np.float64), sex_groups, len(SEX_LABELS), HISTOGRAM_BINS[column])
+        histograms[column] = dict(zip(SEX_LABELS, counts))
+
+    # Weight loss and gain
+    total_entries = totals.count("weight_diff")
+    rows["weight_diff_count"] = [total_entries, None, None]
+    for name, direction in [("lost", LOST), ("gained", GAINED), ("same", SAME)]:
+        rows[name + "_count"] = by_sex(totals.count, "weight_diff", directions=(direction,))
+        rows[name + "_share"] = [rows[name + "_count"][0] / total_entries, None, None]
+    rows["lost_mean"] = by_sex(totals.mean, "weight_diff", directions=(LOST,))
+    rows["gained_mean"] = [-mean for mean in by_sex(totals.mean, "weight_diff", directions=(GAINED,))]
+    rows["lost_max"] = by_sex(totals.max, "weight_diff", directions=(LOST,))
+    weight_diff = pp_data["weight_diff"].to_numpy(dtype=np.float64)
+    histograms["weight_lost"] = dict(zip(SEX_LABELS, grouped_histogram(weight_diff, np.where(directions == LOST, sex_groups, -1), len(SEX_LABELS), HISTOGRAM_BINS["weight_lost"])))
+    histograms["weight_gained"] = dict(zip(SEX_LABELS, grouped_histogram(-weight_diff, np.where(directions == GAINED, sex_groups, -1), len(SEX_LABELS), HISTOGRAM_BINS["weight_gained"])))
+
+    # Duration and rate of the weight loss
+    sex_codes, directions = group_codes(pp_duration)
+    totals = GroupTotals(pp_duration, {"weight_diff": ["count"], "period_months": ["max"], "rate": ["count", "sum"]}, sex_codes, directions)
+    period = pp_duration["period_months"].to_numpy(dtype=np.float64)
+    lost = directions == LOST
+    lost_rows = np.count_nonzero(lost)
+    rows["duration_rows"] = [pp_duration.shape[0], None, None]
+    rows["duration_lost_count"] = by_sex(totals.count, "weight_diff", directions=(LOST,))
+    rows["duration_max"] = [totals.max("period_months", directions=(LOST,)), None, None]
+    rows["duration_72_share"] = [np.count_nonzero(lost & (period <= 72)) / lost_rows, None, None]
+    rows["duration_12_share"] = [np.count_nonzero(lost & (period <= 12)) / lost_rows, None, None]
+    rows["rate_mean"] = by_sex(totals.mean, "rate", directions=(LOST,))
+    sex_groups = np.where((sex_codes < len(SEX_LABELS)) & lost, sex_codes, -1)
+    counts = grouped_histogram(period, np.where(lost, 0, -1), 1, HISTOGRAM_BINS["period_months"])
+    histograms["period_months"] = {"all": counts[0]}
+    histograms["rate"] = dict(zip(SEX_LABELS, grouped_histogram(pp_duration["rate"].to_numpy(dtype=np.float64), sex_groups, len(SEX_LABELS), HISTOGRAM_BINS["rate"])))
+
+    summary = pd.DataFrame.from_dict(rows, orient="index", columns=["all"] + SEX_LABELS, dtype=object)
+    return summary, histograms
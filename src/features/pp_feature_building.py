@@ -1,14 +1,50 @@
 import pandas as pd
-import datetime as dt
 import re
-import matplotlib.pyplot as plt
+import os
+import pickle
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import src.data.pp_cache_stats as cache_stats
 
 
-def get_stats_ver6(s):
+# Patterns and word list used by the parsing functions; compiled once here rather than on every call
+WEIGHTS_REGEX = re.compile(r"^(?:\D*?)(\d+)(?:\D*?)(\d+)")
+KG_TOTAL_REGEX = re.compile(r"=\s*\d+\s*KG", re.IGNORECASE)
+KG_REGEX = re.compile(r"kg", re.IGNORECASE)
+DURATION_REGEX = re.compile(r"(\d+)(day|week|month|year)")
+DECIMAL_DURATION_REGEX = re.compile(r"(\d\.\d+)(day|week|month|year)")
+UNITS_OF_MEASURE = ['days', 'day', 'weeks', 'week', 'months', 'months', 'year', 'years']
+# Patterns used by extract_features_vectorized to split titles the same way get_stats_ver6 does
+SLASH_PARTS_REGEX = re.compile(r"^([^/]*)/([^/]*)/([^/]*)(?:/([^/]*))?")
+BRACKET_REGEX = re.compile(r"^([^\[]*)(?:\[([^\[]*))?")
+PAREN_REGEX = re.compile(r"^([^(]*)(?:\(([^(]*))?")
+HAS_DURATION_REGEX = re.compile(r"day|week|months|year")
+FT_DIGITS = ("4", "5", "6", "7")
+
+
+class DigitFilter(dict):
+    """Translation table for str.translate that keeps the characters for which str.isdigit is True and deletes all others.  Each character is only checked the first time it is seen."""
+
+    def __missing__(self, char):
+        kept = char if chr(char).isdigit() else None
+        self[char] = kept
+        return kept
+
+
+DIGIT_FILTER = DigitFilter()
+
+# Conversions used by duration_in_weeks and duration_in_months, keyed on the first letter of the unit
+WEEKS_PER_UNIT = {"d": lambda period: period / 7, "w": lambda period: period, "m": lambda period: period * 4, "y": lambda period: period * 52}
+MONTHS_PER_UNIT = {"d": lambda period: period / 30, "w": lambda period: period * 4, "m": lambda period: period, "y": lambda period: period * 12}
+TITLE_FEATURES = ["raw_sex", "raw_age", "raw_height", "raw_weights", "start_weight", "end_weight", "kg_total", "kg", "NSFW", "has_duration", "duration", "duration_unit"]
+
+
+def get_stats_ver6(s, normalized=False):
     """Processes an r/progresspics post title and extracts the sex, age, height, and weights.  Returns "unknown" if the title is formatted incorrectly and the infomation cannot be extracted.
 
     Arguments:
     s -- r/procresspics post tittle; provide a string
+    normalized -- True if s has already been converted to upper case
 
     Returns:
     sex -- sex of r/progresspics post author
@@ -16,47 +52,183 @@ def get_stats_ver6(s):
     height -- height of r/progresspics post author
     weights -- starting and ending weight of r/progresspics post author
     """
-    clean_s = s.upper()
-    #print(clean_s)
+    clean_s = s if normalized else s.upper()
     clean_list = clean_s.split("/")
     if len(clean_list) < 3:
         return "unknown", "unknown", "unknown", "unknown"
     sex = clean_list[0].replace(' ', '')
     age = clean_list[1].replace(' ', '')
     weight_list = clean_list[2].split("[")
-    height = weight_list[0].replace(' ', '')
-    try:
+    if len(weight_list) > 1:
+        height = weight_list[0].replace(' ', '')
         weights = weight_list[1]
-    except:
+    else:
         weight_list2 = weight_list[0].split("(")
         height = weight_list2[0].replace(' ', '')
-        try:
-            weights = weight_list2[1]
-        except:
-            weights = "unknown"
+        weights = weight_list2[1] if len(weight_list2) > 1 else "unknown"
     if weights == "unknown":
-        try:
-            weights = clean_list[3]
-        except:
-            weights = "unknown"
+        weights = clean_list[3] if len(clean_list) > 3 else "unknown"
     return sex, age, height, weights
 
 
-def get_weights_ver2(s):
+def extract_title_features(s):
+    """Walks an r/progresspics post title once and extracts every title-derived field used by main.py.  Each field matches what the separate functions return for the same title: get_stats_ver6, get_weights_ver2, nsfw, and the duration search shared by get_duration_weeks and get_duration_months.
+
+    Arguments:
+    s -- r/procresspics post tittle; provide a string
+
+    Returns:
+    tuple with one entry per name in TITLE_FEATURES:
+    raw_sex, raw_age, raw_height, raw_weights -- as returned by get_stats_ver6
+    start_weight, end_weight -- as returned by get_weights_ver2 on raw_weights
+    kg_total -- True if the title contains a total given in kilograms (e.g. "= 20 kg")
+    kg -- True if the title contains "kg" anywhere
+    NSFW -- 1 if "NSFW" is present, 0 if not
+    has_duration -- True if the title contains one of the UNITS_OF_MEASURE (each plural contains its singular, so only "day", "week", "months", and "year" are checked)
+    duration -- the number of time units as a float, or "unknown"
+    duration_unit -- "day", "week", "month", "year", or "unknown"
+    """
+    clean_s = s.upper()
+    sex, age, height, weights = get_stats_ver6(clean_s, normalized=True)
+    start_weight, end_weight = get_weights_ver2(weights.lstrip().replace(' ', ''), normalized=True)
+    lower_s = s.lower()
+    # "kg" in the lower case title matches exactly the titles KG_REGEX matches, and kg_total can only match those
+    kg = "kg" in lower_s
+    kg_total = kg and KG_TOTAL_REGEX.search(s) is not None
+    NSFW = nsfw(clean_s, normalized=True)
+    has_duration = "day" in s or "week" in s or "months" in s or "year" in s
+    result = find_duration(lower_s.replace(' ', ''))
+    if result:
+        duration, duration_unit = float(result.group(1)), result.group(2)
+    else:
+        duration, duration_unit = "unknown", "unknown"
+    return sex, age, height, weights, start_weight, end_weight, kg_total, kg, NSFW, has_duration, duration, duration_unit
+
+
+def get_stats_batch(clean_s):
+    """Vectorized version of get_stats_ver6.  Splits a whole column of upper case r/progresspics post titles with compiled regular expressions and extracts the sex, age, height, and weights.  Returns "unknown" wherever get_stats_ver6 would.
+
+    Arguments:
+    clean_s -- r/progresspics post titles converted to upper case; provide a Pandas series of strings
+
+    Returns:
+    stats -- Pandas dataframe with the raw_sex, raw_age, raw_height, and raw_weights columns, indexed like clean_s
+    """
+    parts = clean_s.str.extract(SLASH_PARTS_REGEX)
+    found = parts[0].notna()
+    stats = pd.DataFrame("unknown", index=clean_s.index, columns=["raw_sex", "raw_age", "raw_height", "raw_weights"])
+    stats.loc[found, "raw_sex"] = parts.loc[found, 0].str.replace(' ', '', regex=False)
+    stats.loc[found, "raw_age"] = parts.loc[found, 1].str.replace(' ', '', regex=False)
+
+    # The weights follow the first "[" in the third part, or the first "(" if there is no "[", or else sit in the fourth part
+    bracket = parts.loc[found, 2].str.extract(BRACKET_REGEX)
+    paren = bracket[0].str.extract(PAREN_REGEX)
+    has_bracket = bracket[1].notna()
+    height = bracket[0].where(has_bracket, paren[0])
+    weights = bracket[1].where(has_bracket, paren[1])
+    weights = weights.fillna(parts.loc[found, 3]).fillna("unknown")
+    stats.loc[found, "raw_height"] = height.str.replace(' ', '', regex=False)
+    stats.loc[found, "raw_weights"] = weights
+    return stats
+
+
+def extract_features_vectorized(titles):
+    """Vectorized version of extract_title_features.  Extracts every title-derived field for a whole column of r/progresspics post titles with Pandas string methods and compiled regular expressions, without a Python call per title.  Each field matches what extract_title_features returns for the same title.
+
+    Arguments:
+    titles -- r/progresspics post titles; provide a Pandas series of strings
+
+    Returns:
+    features -- Pandas dataframe in the format of extract_features_batch
+    """
+    clean_s = titles.str.upper()
+    lower_s = titles.str.lower()
+    features = get_stats_batch(clean_s)
+    weights = features["raw_weights"].str.lstrip().str.replace(' ', '', regex=False).str.extract(WEIGHTS_REGEX)
+    features["start_weight"] = weights[0].fillna("unknown")
+    features["end_weight"] = weights[1].fillna("unknown")
+    features["kg"] = lower_s.str.contains("kg", regex=False)
+    features["kg_total"] = features["kg"] & titles.str.contains(KG_TOTAL_REGEX)
+    features["NSFW"] = clean_s.str.contains("NSFW", regex=False).astype(int)
+    features["has_duration"] = titles.str.contains(HAS_DURATION_REGEX)
+    # As in find_duration, a decimal duration anywhere in the title is preferred over a whole number
+    no_spaces = lower_s.str.replace(' ', '', regex=False)
+    duration = no_spaces.str.extract(DECIMAL_DURATION_REGEX)
+    whole = no_spaces.str.extract(DURATION_REGEX)
+    has_decimal = duration[0].notna()
+    features["duration"] = pd.to_numeric(duration[0].where(has_decimal, whole[0]))
+    features["duration_unit"] = duration[1].where(has_decimal, whole[1]).fillna("unknown")
+    return features[TITLE_FEATURES]
+
+
+def extract_partition(titles):
+    """Applies extract_title_features to a list of r/progresspics post titles.  Used as the unit of work when the titles are parsed in several processes.
+
+    Arguments:
+    titles -- list of strings
+
+    Returns:
+    list with one tuple of extracted fields per title
+    """
+    return [extract_title_features(s) for s in titles]
+
+
+def parse_titles(titles, workers=1):
+    """Applies extract_title_features to a list of r/progresspics post titles.  With more than one worker, the titles are split into partitions that are parsed in separate processes and then put back together in their original order, giving the same result as the serial run.
+
+    Arguments:
+    titles -- list of strings
+    workers -- number of processes used to parse the titles; provide 1 to parse them in the current process
+
+    Returns:
+    list with one tuple of extracted fields per title
+    """
+    if workers > 1 and len(titles) > workers:
+        size = -(-len(titles) // (workers * 4))
+        partitions = [titles[i:i + size] for i in range(0, len(titles), size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return [record for partition in executor.map(extract_partition, partitions) for record in partition]
+    return extract_partition(titles)
+
+
+def extract_features_batch(titles, workers=1, cache=None):
+    """Extracts every title-derived field from a whole column of r/progresspics post titles with extract_features_vectorized, so that each title is only scanned once and without a Python call per title.  With more than one worker, the column is split into partitions that are parsed in separate processes and put back together in their original order.  With a cache, only the titles that are not already in it are parsed, with extract_title_features, since the cache keeps one result per title.
+
+    Arguments:
+    titles -- r/progresspics post titles; provide a Pandas series of strings
+    workers -- number of processes used to parse the titles; provide 1 to parse them in the current process
+    cache -- optional ParseCache in front of extract_title_features; only titles that are not already in it are parsed
+
+    Returns:
+    features -- Pandas dataframe with one column per name in TITLE_FEATURES, indexed like titles.  The duration column is a float with NaN where the duration is unknown.
+    """
+    if cache is None:
+        if workers > 1 and len(titles) > workers:
+            size = -(-len(titles) // (workers * 4))
+            partitions = [titles.iloc[i:i + size] for i in range(0, len(titles), size)]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return pd.concat(list(executor.map(extract_features_vectorized, partitions)))
+        return extract_features_vectorized(titles)
+    records = cache.map(titles.tolist(), lambda missing: parse_titles(missing, workers))
+    features = pd.DataFrame.from_records(records, columns=TITLE_FEATURES, index=titles.index)
+    features["duration"] = pd.to_numeric(features["duration"], errors='coerce')
+    return features
+
+
+def get_weights_ver2(s, normalized=False):
     """Extracts the starting and ending weights from a string containing both weights. If the weights cannot be identified, returns "unknown".
 
     Arguments:
     s -- string containing both starting and ending weights
+    normalized -- True if s has already been converted to upper case with the leading whitespace and all spaces removed
 
     Returns:
     starting weight -- starting weight of r/progresspics post author
     ending weight -- ending weight of r/progresspics post author
     """
-    clean_s = s.upper().lstrip().replace(' ', '')
-    regex = re.compile(r"^(?:\D*?)(\d+)(?:\D*?)(\d+)")
-    result = regex.search(clean_s)
+    clean_s = s if normalized else s.upper().lstrip().replace(' ', '')
+    result = WEIGHTS_REGEX.search(clean_s)
     if result:
-        #print((result.groups()))
         return result.group(1), result.group(2)
     else:
         return "unknown", "unknown"
@@ -73,13 +245,12 @@ def clean_sex(s):
     """
     if s.isdigit():
         return "unknown"
-    try:
-        if s[0] == "M" or s[0] == "F":
-            return s[0]
-    except IndexError:
+    if not s:
         return "error"
-    else:
-        return s[-1]
+    first = s[0]
+    if first == "M" or first == "F":
+        return first
+    return s[-1]
 
 
 def number_height(s):
@@ -91,10 +262,7 @@ def number_height(s):
     Returns:
     number_s -- string containing only the digits found in the original string
     """
-    chars = list(s)
-    digit_chars = [c for c in chars if c.isdigit()]
-    number_s = "".join(digit_chars)
-    return number_s
+    return s.translate(DIGIT_FILTER)
 
 
 def height_inches(s):
@@ -106,12 +274,12 @@ def height_inches(s):
     Returns:
     integer representing a height in inches
     """
-    ft_list = ["4", "5", "6", "7"]
     if s == '':
         return "unknown"
-    elif s[0] == "1":
+    first = s[0]
+    if first == "1":
         return int(s) * 0.39370079
-    elif s[0] in ft_list:
+    elif first in FT_DIGITS:
         if len(s) == 1:
             return int(s) *12
         elif len(s) == 3 and s[2] == "5":
@@ -122,49 +290,51 @@ def height_inches(s):
         return "unknown"
 
 
-def nsfw(s):
+def nsfw(s, normalized=False):
     """Recognizes the string "NSFW" within a larger string and returns 1 if it is present and 0 if it is not.
 
     Arguments:
     s -- string
+    normalized -- True if s has already been converted to upper case
 
     Returns:
     0 if "NSFW" is not present or 1 if "NSFW" is present.
     """
-    upper_s = s.upper()
+    upper_s = s if normalized else s.upper()
     if "NSFW" in upper_s:
         return 1
     else:
         return 0
 
 
-def get_duration_weeks(s):
+def find_duration(clean_s):
+    """Searches a lower case string with the spaces removed for a number immediately followed by "day", "week", "month", or "year".  A decimal number anywhere in the string is preferred over a whole number.
+
+    Arguments:
+    clean_s -- lower case string without spaces
+
+    Returns:
+    regular expression match whose groups are the number and the unit, or None if there is no match
+    """
+    result = DECIMAL_DURATION_REGEX.search(clean_s) if "." in clean_s else None
+    return result or DURATION_REGEX.search(clean_s)
+
+
+def get_duration_weeks(s, normalized=False):
     """Recognizes the key words "day", "week", "month", or "year" within an input string and looks for a digit immediately proceeding the key word.  Applies the function duration_in_weeks to convert the identified period of time to the number of weeks it represents.  If no key words or preceding digit can be found, returns "unknown".
 
     Arguments:
     s -- string
+    normalized -- True if s has already been converted to lower case with all spaces removed
 
     Returns:
     a float representing a number of weeks
     """
-    clean_s = s.lower().replace(' ', '')
-    #print(clean_s)
-    regex1 = re.compile(r"(\d+)(day|week|month|year)")
-    regex2 = re.compile(r"(\d\.\d+)(day|week|month|year)")
-    result2 = regex2.search(clean_s)
-    try:
-        duration2 = result2.group(1)
-    except:
-        result = regex1.search(clean_s)
-        try:
-            duration = result.group(1)
-        except:
-            return "unknown"
-        unit = result.group(2)
-        return duration_in_weeks(duration, unit)
-
-    unit2 = result2.group(2)
-    return duration_in_weeks(duration2, unit2)
+    clean_s = s if normalized else s.lower().replace(' ', '')
+    result = find_duration(clean_s)
+    if result is None:
+        return "unknown"
+    return duration_in_weeks(result.group(1), result.group(2))
 
 
 def duration_in_weeks(period, unit):
@@ -177,45 +347,41 @@ def duration_in_weeks(period, unit):
     Returns:
     a float representing a number of weeks
     """
-    if unit.lower()[0] == 'd':
-        return float(period)/7
-    elif unit.lower()[0] == 'w':
-        return float(period)
-    elif unit.lower()[0] == "m":
-        return float(period) * 4
-    elif unit.lower()[0] == 'y':
-        return float(period) * 52
-    else:
+    convert = WEEKS_PER_UNIT.get(unit.lower()[0])
+    if convert is None:
         return "unknown"
+    return convert(float(period))
 
 
-def get_duration_months(s):
+def duration_in_weeks_batch(duration, unit):
+    """Vectorized version of duration_in_weeks.  Converts columns of time durations and units to the equivalent number of weeks.
+
+    Arguments:
+    duration -- Pandas series of floats
+    unit -- Pandas series containing "day", "week", "month", or "year"
+
+    Returns:
+    Pandas series of floats representing a number of weeks; NaN where the unit is unknown
+    """
+    weeks = duration * unit.map({"week": 1, "month": 4, "year": 52})
+    return weeks.where(unit != "day", duration / 7)
+
+
+def get_duration_months(s, normalized=False):
     """Recognizes the key words "day", "week", "month", or "year" within an input string and looks for a digit immediately proceeding the key word.  Applies the function duration_in_months to convert the identified period of time to the number of months it represents.  If no key words or preceding digit can be found, returns "unknown".
 
     Arguments:
     s -- string
+    normalized -- True if s has already been converted to lower case with all spaces removed
 
     Returns:
     a float representing a number of months
     """
-    clean_s = s.lower().replace(' ', '')
-    #print(clean_s)
-    regex1 = re.compile(r"(\d+)(day|week|month|year)")
-    regex2 = re.compile(r"(\d\.\d+)(day|week|month|year)")
-    result2 = regex2.search(clean_s)
-    try:
-        duration2 = result2.group(1)
-    except:
-        result = regex1.search(clean_s)
-        try:
-            duration = result.group(1)
-        except:
-            return "unknown"
-        unit = result.group(2)
-        return duration_in_months(duration, unit)
-
-    unit2 = result2.group(2)
-    return duration_in_months(duration2, unit2)
+    clean_s = s if normalized else s.lower().replace(' ', '')
+    result = find_duration(clean_s)
+    if result is None:
+        return "unknown"
+    return duration_in_months(result.group(1), result.group(2))
 
 
 def duration_in_months(period, unit):
@@ -228,13 +394,117 @@ def duration_in_months(period, unit):
     Returns:
     a float representing a number of months
     """
-    if unit.lower()[0] == "d":
-        return float(period)/30
-    elif unit.lower()[0] == 'w':
-        return float(period) * 4
-    elif unit.lower()[0] == "m":
-        return float(period)
-    elif unit.lower()[0] == 'y':
-        return float(period) * 12
-    else:
+    convert = MONTHS_PER_UNIT.get(unit.lower()[0])
+    if convert is None:
         return "unknown"
+    return convert(float(period))
+
+
+def duration_in_months_batch(duration, unit):
+    """Vectorized version of duration_in_months.  Converts columns of time durations and units to the equivalent number of months.
+
+    Arguments:
+    duration -- Pandas series of floats
+    unit -- Pandas series containing "day", "week", "month", or "year"
+
+    Returns:
+    Pandas series of floats representing a number of months; NaN where the unit is unknown
+    """
+    months = duration * unit.map({"week": 4, "month": 1, "year": 12})
+    return months.where(unit != "day", duration / 30)
+
+
+class ParseCache(cache_stats.CacheStats):
+    """Memo layer in front of one of the title parsing functions.  Results are keyed on the normalized input, so inputs that only differ in ways the function ignores (for example letter case for get_stats_ver6) share one entry.  When maxsize is given, the least recently used entries are dropped once the cache is full.  The results can be saved to disk and loaded again, so reruns over overlapping datasets skip the inputs that were already parsed.
+
+    Arguments:
+    func -- parsing function that takes a single string
+    normalize -- function applied to the input to build the key; it must not change the result of func.  If None, the input itself is the key.
+    maxsize -- maximum number of entries to keep, or None for no limit
+    """
+
+    def __init__(self, func, normalize=None, maxsize=None):
+        super().__init__()
+        self.func = func
+        self.normalize = normalize
+        self.maxsize = maxsize
+        self.results = OrderedDict()
+
+    def __len__(self):
+        return len(self.results)
+
+    def key(self, s):
+        return self.normalize(s) if self.normalize is not None else s
+
+    def store(self, key, result):
+        self.results[key] = result
+        if self.maxsize is not None and len(self.results) > self.maxsize:
+            self.results.popitem(last=False)
+
+    def __call__(self, s):
+        key = self.key(s)
+        if key in self.results:
+            self.hits += 1
+            self.results.move_to_end(key)
+            return self.results[key]
+        self.misses += 1
+        result = self.func(s)
+        self.store(key, result)
+        return result
+
+    def map(self, values, parse=None):
+        """Looks up a list of inputs, parsing each distinct uncached key only once.
+
+        Arguments:
+        values -- list of strings
+        parse -- optional function that takes the list of uncached inputs and returns their results in the same order, e.g. to parse them in several processes; by default func is applied to each one
+
+        Returns:
+        list with one result per value
+        """
+        results = [None] * len(values)
+        missing = OrderedDict()
+        for i, s in enumerate(values):
+            key = self.key(s)
+            if key in self.results:
+                self.results.move_to_end(key)
+                results[i] = self.results[key]
+            elif key in missing:
+                missing[key][1].append(i)
+            else:
+                missing[key] = (s, [i])
+        if missing:
+            inputs = [s for s, _ in missing.values()]
+            parsed = parse(inputs) if parse is not None else [self.func(s) for s in inputs]
+            for (key, (_, positions)), result in zip(missing.items(), parsed):
+                for i in positions:
+                    results[i] = result
+                self.store(key, result)
+        self.misses += len(missing)
+        self.hits += len(values) - len(missing)
+        return results
+
+    def save(self, path):
+        """Saves the cached results to a pickle file so they can be loaded by a later run."""
+        with open(path, "wb") as f:
+            pickle.dump({"version": PARSE_CACHE_VERSION, "func": self.func.__name__, "results": dict(self.results)}, f)
+
+    def load(self, path):
+        """Loads results saved by an earlier run.  Files written for another function or by an older version of this module are ignored.
+
+        Returns:
+        number of entries loaded
+        """
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as f:
+            saved = pickle.load(f)
+        if saved.get("version") != PARSE_CACHE_VERSION or saved.get("func") != self.func.__name__:
+            return 0
+        for key, result in saved["results"].items():
+            self.store(key, result)
+        return len(saved["results"])
+
+
+# Bump whenever a change to the parsing functions changes their results, so that saved caches are not reused
+PARSE_CACHE_VERSION = 1
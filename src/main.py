@@ -1,526 +1,508 @@
 '''
 This script processes and extracts relavent features from r/progresspics post
 titles then generates summary visualizations. A default dataset is included, though users can provide their own .cvs file. To run correctly, the .cvs file must include the following columns which are all available to download from Google's BigQuery:  'title', 'score', 'num_comments', 'author', 'timestamp'
+
+Run it from the command line, for example:  python -m src.main 2018 --output pp_data_processed.csv --duration-output pp_duration_processed.csv --pause 0
+The same pipeline can be run from other code with run_pipeline(config).
 '''
 import os
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
+import src.features.pp_data_cleaning as clean
 import src.features.pp_feature_building as feat
-import numpy as np
+import src.features.pp_eda_stats as eda_stats
+import src.data.pp_dataset_io as dataset_io
+import src.data.pp_author_store as author_store
+import src.data.pp_checkpoints as checkpoints
+import src.data.pp_seen_ids as seen_id_index
+import src.visualization.pp_eda_plots as eda_plots
 import time
 import logging
 
 
-# Set up logging
-# Create custom logger
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-
-# Create handlers
-ch = logging.StreamHandler()
-fh = logging.FileHandler('progresspics analysis.log', mode='w')
-ch.setLevel(logging.INFO)
-fh.setLevel(logging.INFO)
-
-# Create formatters and add to handlers
-c_format = logging.Formatter('%(message)s')
-f_format = logging.Formatter('%(message)s')
-ch.setFormatter(c_format)
-fh.setFormatter(f_format)
-
-logger.addHandler(ch)
-logger.addHandler(fh)
-
-logger.info("As this script runs, it will print status updates and key analysis points to the console as well as save them in a log file called progresspics_analysis.log for future reference. \n")
-
-# Importing data from .csv file
-logger.info("This script processes and extracts features from r/progresspics post titles, then generates summary visualizations. \n ")
-
-file = input(str("Type a file path for .csv file you wish to process.  If '2018' is entered, the program will run using the included 2018 r/progresspics data.  "))
-
-logger.info("Importing raw data. \n")
-if file == "2018":
-    pp_data = pd.read_csv("data/pp_data_2018_raw.csv")
-else:
-    pp_data = pd.read_csv(file)
-
-logger.info("{} rows, {} columns imported. \n".format(pp_data.shape[0], pp_data.shape[1]))
-
-# Extracting the raw sex, age, height, and weights from the title column
-logger.info("Adding and populating the 'raw_sex', 'raw_age', 'raw_height', and 'raw_weights' columns.\n")
-
-pp_data = pp_data.reindex(columns=['title', 'raw_sex', 'raw_age', 'raw_height', 'raw_weights', 'score', 'timestamp','id', 'num_comments', 'created_utc', 'author', 'permalink'])
-
-pp_data[["raw_sex", "raw_age", "raw_height", "raw_weights"]] = pp_data.apply(lambda row: feat.get_stats_ver6(row["title"]), axis=1, result_type="expand")
-
-pp_data = pp_data[pp_data["raw_height"] != 'unknown']
-pp_data = pp_data[pp_data["raw_height"].str.len() <= 6]
-
-logger.info("After removing rows with incorrectly formatted titles, {} rows remain. \n".format(pp_data.shape[0]))
-time.sleep(5)
-
-# Extracting the raw starting weights and ending weights from the raw_weight column
-logger.info("Adding and populating the start_weight and end_weight columns. \n")
-
-pp_data = pp_data.reindex(columns=['title', 'raw_sex', 'raw_age', 'raw_height', 'raw_weights', 'start_weight', 'end_weight','score','timestamp', 'id', 'num_comments', 'created_utc', 'author','permalink'])
-
-pp_data[["start_weight", "end_weight"]] = pp_data.apply(lambda row: feat.get_weights_ver2(row["raw_weights"]), axis=1, result_type="expand")
-
-pp_data = pp_data[pp_data['start_weight'] != 'unknown']
-
-logger.info("After removing rows with incorrectly formatted weights, {} rows remain. \n".format(pp_data.shape[0]))
-time.sleep(5)
-
-# Cleaning the raw_sex column
-logger.info("Cleaning the raw_sex column then adding the results to the new sex column. 0 is male and 1 is female. \n")
-
-pp_data = pp_data.reindex(columns=['title', 'raw_sex', 'sex', 'raw_age', 'raw_height', 'raw_weights', 'start_weight', 'end_weight','score','timestamp', 'id', 'num_comments', 'created_utc', 'author','permalink'])
-
-pp_data["sex"] = pp_data["raw_sex"].apply(feat.clean_sex)
-
-sex_unknown = pp_data[pp_data["sex"] == 'unknown']
-sex_unknown.columns = ['title', 'raw_age', 'sex', 'raw_sex', 'raw_height', 'raw_weights', 'start_weight', 'end_weight', 'score', 'timestamp', 'id', 'num_comments', 'created_utc', 'author', 'permalink']
-sex_unknown.loc[:, "sex"] = sex_unknown.loc[:, "raw_sex"].apply(feat.clean_sex)
-sex_unknown = sex_unknown.reindex(columns=['title', 'raw_sex', 'sex', 'raw_age', 'raw_height', 'raw_weights', 'start_weight', 'end_weight', 'score', 'timestamp', 'id', 'num_comments', 'created_utc', 'author', 'permalink'])
-pp_data.update(sex_unknown)
-pp_data = pp_data[(pp_data["sex"] == "M")|(pp_data["sex"] == "F")]
-
-pp_data["sex"] = pp_data['sex'].apply(lambda s: 1 if s == "F" else 0)
-
-logger.info("After removing rows where the sex could not be determined, {} rows remain. \n".format(pp_data.shape[0]))
-time.sleep(5)
-
-# Cleaning the raw_age column
-logger.info("Cleaning the raw_age column.\n")
-
-pattern = r"([0-9]{2})"
-age_info = pp_data[(pp_data["raw_height"].str.match(pattern))&(pp_data["raw_height"].str.len() == 2)]
-
-logger.info("Identified {} rows where the age is in the height column and vice versa. Fix by switching column names.\n".format(age_info.shape[0]))
-
-age_info.columns = ['title', 'raw_height', 'raw_sex', 'sex', 'raw_age', 'raw_weights', 'start_weight', 'end_weight', 'score', 'timestamp', 'id', 'num_comments', 'created_utc', 'author', 'permalink']
-pp_data.update(age_info)
-
-pp_data = pp_data[pp_data["raw_age"].str.len() == 2]
-pattern = r"(^[0-9]{2}?)"
-pp_data = pp_data[pp_data["raw_age"].str.match(pattern)]
-pp_data["raw_age"] = pd.to_numeric(pp_data["raw_age"], errors='coerce')
-
-logger.info("After removing rows where raw_age did not contain a 2-digit integer, {} rows remain.\n".format(pp_data.shape[0]))
-time.sleep(5)
-
-# Cleaning the raw_height column
-logger.info("Cleaning the raw_height column and storing height in inches in the new height_in column.\n")
-
-pp_data["num_height"] = pp_data["raw_height"].apply(feat.number_height)
-pp_data["height_in"] = pp_data["num_height"].apply(feat.height_inches)
-pp_data.loc[:,"height_in"] = pd.to_numeric(pp_data["height_in"], errors='coerce')
-pp_data = pp_data[(pp_data["height_in"] > 54) & (pp_data["height_in"] < 85)]
-
-logger.info("After removing rows with incorrectly formatted height_in entries, {} rows remain.\n".format(pp_data.shape[0]))
-time.sleep(5)
-
-# Cleaning the weight columns
-logger.info("Cleaning the start_weight and end_weight columns and storing the weights in pounds in the new_start_weight and new_end_weight columns.\n")
-
-pp_data = pp_data.reindex(columns=['title', 'raw_age', 'raw_sex', 'sex', 'raw_height', 'num_height', 'height_in', 'raw_weights','start_weight', 'new_start_weight', 'end_weight', 'new_end_weight', 'score', 'timestamp', 'id',
-'num_comments', 'created_utc', 'author', 'permalink', ], fill_value=0)
-
-pp_data.shape
-pp_data.loc[:,"start_weight"] = pd.to_numeric(pp_data["start_weight"], errors='coerce')
-pp_data.loc[:,"end_weight"] = pd.to_numeric(pp_data["end_weight"], errors='coerce')
-
-pattern = r"=\s*\d+\s*KG"
-pp_data.loc[pp_data.title.str.contains(pattern, case=False), "new_start_weight"] = pp_data.loc[pp_data.title.str.contains(pattern, case=False), "start_weight"] * 2.20462
-pp_data.loc[pp_data.title.str.contains(pattern, case=False), "new_end_weight"] = pp_data.loc[pp_data.title.str.contains(pattern, case=False), "end_weight"] * 2.20462
-
-pp_data.loc[(pp_data.start_weight < 130) & pp_data.title.str.contains("kg", case=False) & (pp_data.new_start_weight == 0), "new_start_weight"] = pp_data.loc[(pp_data.start_weight < 130) & pp_data.title.str.contains("kg", case=False) & (pp_data.new_start_weight == 0), "start_weight"] * 2.20462
-pp_data.loc[(pp_data.start_weight < 130) & pp_data.title.str.contains("kg", case=False) & (pp_data.new_end_weight == 0), "new_end_weight"] = pp_data.loc[(pp_data.start_weight < 130) & pp_data.title.str.contains("kg", case=False) & (pp_data.new_end_weight == 0), "end_weight"] * 2.20462
-
-pp_data.loc[(pp_data.new_start_weight == 0), "new_start_weight"] = pp_data.loc[(pp_data.new_start_weight == 0), "start_weight"]
-pp_data.loc[(pp_data.new_end_weight == 0), "new_end_weight"] = pp_data.loc[(pp_data.new_end_weight == 0), "end_weight"]
-
-pp_data = pp_data[pp_data["new_start_weight"] <= 1000]
-pp_data = pp_data[pp_data['new_end_weight'] >= 70]
-pp_data = pp_data[pp_data['new_end_weight'] < 1000]
-
-logger.info("After removing rows with incorrectly formatted start_weight or end_weight entries, {} rows remain.\n".format(pp_data.shape[0]))
-time.sleep(5)
-
-# Calculating the amount of weight gained or lost
-logger.info("Calculating the amount of weight gained or lost and storing the results in the new weight_diff column. \n")
-
-pp_data["weight_diff"] = pp_data["new_start_weight"] - pp_data["new_end_weight"]
-
-pp_data = pp_data.reindex(columns=['title', 'raw_age', 'raw_sex', 'sex', 'raw_height', 'num_height', 'height_in', 'raw_weights', 'start_weight', 'new_start_weight', 'end_weight', 'new_end_weight', 'weight_diff', 'score', 'timestamp', 'id', 'num_comments', 'created_utc', 'author', 'permalink'])
-
-pp_data = pp_data[pp_data['weight_diff'] >= -90]
-pp_data = pp_data[pp_data['weight_diff'] < 599]
-
-logger.info("After removing outlier weight_diff entries caused by r/progresspics user entry error, {} rows remain.\n".format(pp_data.shape[0]))
-time.sleep(5)
-
-# Adding date time columns
-logger.info("After converting the timestamp to the datetime format, populate the following new columns:  month, year, day, dayofweek, date, time. \n")
-
-pp_data["timestamp"] = pd.to_datetime(pp_data["timestamp"])
-
-pp_data["month"] = pp_data["timestamp"].dt.month
-pp_data["year"] = pp_data["timestamp"].dt.year
-pp_data["day"] = pp_data["timestamp"].dt.day
-pp_data["dayofweek"] = pp_data["timestamp"].dt.dayofweek
-pp_data["date"] = pp_data["timestamp"].dt.date
-pp_data["time"] = pp_data["timestamp"].dt.time
-
-pp_data = pp_data.reindex(columns=['title', 'raw_age', 'sex', 'height_in', 'new_start_weight', 'new_end_weight', 'weight_diff', 'NSFW', 'num_posts', 'score', 'num_comments', 'timestamp', 'id', 'created_utc', 'author', 'permalink', 'month', 'year', 'day', 'dayofweek', 'date', 'time', 'raw_sex', 'raw_height', 'num_height', 'raw_weights', 'start_weight', 'end_weight'])
-
-pp_data.columns = (['title', 'age', 'sex', 'height_in', 'start_weight', 'end_weight', 'weight_diff', 'NSFW', 'num_posts', 'score', 'num_comments', 'timestamp', 'id', 'created_utc', 'author', 'permalink', 'month', 'year', 'day', 'dayofweek', 'date', 'time', 'raw_sex', 'raw_height', 'num_height', 'raw_weights', 'raw_start_weight', 'raw_end_weight'])
-
-logger.info("Reorder and rename some columns so that the names of the columns are easier to use. New column names and order: 'title', 'age', 'sex', 'height_in', 'start_weight', 'end_weight', 'weight_diff', 'score', 'timestamp', 'id', 'num_comments', 'created_utc', 'author', 'permalink', 'month', 'year', 'day', 'dayofweek', 'date', 'time', 'raw_sex', 'raw_height', 'num_height', 'raw_weights', 'raw_start_weight', 'raw_end_weight'\n")
-
-pp_data.columns
-
-time.sleep(5)
-
-# Extract a (NSFW) not safe for work feature
-logger.info("Extracting an NSFW feature.  A 1 in this column indicates that the title of the post contains the NSFW (not safe for work) acronym, while a 0 indicates that it did not. \n")
-
-NSFW2 = pp_data[pp_data.title.str.contains("NSFW", case=False)]
-pp_data["NSFW"] = pp_data["title"].apply(feat.nsfw)
-
-time.sleep(5)
-
-# Extract a multiple postings feature
-logger.info("Extract a num_posts feature.  For each row, determine how many times the author posted to r/progresspics in 2018 and put that number to the num_posts column.\n")
-
-pp_data["num_posts"] = pp_data.groupby(['author'])['sex'].transform('count')
-
-author = pp_data[pp_data["author"] == "[deleted]"]
-author.loc[:, "num_posts"] = 1
-pp_data.update(author)
-
-logger.info("{} rows have the author given as '[deleted]'. For those rows, set num_posts equal to 1.\n".format(author.shape[0]))
-time.sleep(5)
-
-logger.info("Currently, the dataset has {} rows. \n".format(pp_data.shape[0]))
-
-logger.info("Removing all starting and intermediate columns so that only processed features remain. \n")
-
-pp_data_pro = pp_data.reindex(columns=['age', 'sex', 'height_in', 'start_weight', 'end_weight','weight_diff', 'score', 'num_comments', 'month', 'dayofweek', 'NSFW', "num_posts"])
-
-#Save processed dataframe to cvs file
-file_name = input("What you would like to call that file that contains your processed dataset?  Make sure to include the file extenstion .csv \n")
-
-pp_data_pro.to_csv(file_name, index=False)
-
-logger.info("Saving dataframe to {} file.\n".format(file_name))
-
-time.sleep(5)
-
-# Extract time frame of weight change in weeks and months
-logger.info("Extract the amount of time over which the weight change took place.  Many r/progresspics users failed to include this information in their post titles so this will be a smaller dataset compared to the one that was just saved.\n")
-
-logger.info("Save duration of weight loss in two new columns, period_weeks and period_months.\n")
-
-units_of_measure = ['days', 'day', 'weeks', 'week', 'months', 'months', 'year', 'years']
-duration = pp_data["title"].apply(lambda sentence: any(word in sentence for word in units_of_measure))
-pp_duration = pp_data[duration]
-
-pp_duration = pp_duration.reindex(columns=['title', 'age', 'sex', 'height_in', 'start_weight', 'end_weight', 'weight_diff', 'period_weeks', 'period_months','NSFW', 'num_posts', 'score', 'num_comments', 'timestamp', 'id',' created_utc', 'author', 'permalink', 'month', 'year', 'day', 'dayofweek', 'date', 'time', 'raw_sex', 'raw_height', 'num_height', 'raw_weights', 'raw_start_weight', 'raw_end_weight'])
-
-pp_duration['period_weeks'] = pp_duration["title"].apply(lambda s: feat.get_duration_weeks(s))
-pp_duration['period_months'] = pp_duration["title"].apply(lambda s: feat.get_duration_months(s))
-
-pp_duration = pp_duration[pp_duration["period_weeks"] != "unknown"]
-pp_duration = pp_duration[pp_duration["period_weeks"] >= 1]
-pp_duration = pp_duration[pp_duration["period_weeks"] <= 850]
-
-logger.info("After processing, {} rows remain. \n".format(pp_duration.shape[0]))
-
-time.sleep(5)
-
-# Calculate rate of weight loss
-logger.info("Calculate the rate of weight loss and the normalized rate of weight loss. Store the values in the new rate and norm_rate columns.\n")
-
-pp_duration["rate"] = pp_duration['weight_diff']/pp_duration["period_months"]
-pp_duration['norm_rate'] = pp_duration["weight_diff"]/pp_duration["start_weight"]/pp_duration["period_months"]
-
-pp_duration = pp_duration[(pp_duration["rate"] < 30) & (pp_duration["rate"] > -30)]
-
-logger.info("After trimming rows with extreme rates caused by user entry error, {} rows remain. \n".format(pp_duration.shape[0]))
-
-logger.info("Removing all starting and intermediate columns so that only processed features remain. \n")
-
-pp_duration_pro = pp_duration.reindex(columns=['age', 'sex', 'height_in', 'start_weight', 'end_weight', 'weight_diff', 'score', 'num_comments', 'month', 'dayofweek', 'NSFW', "num_posts", "period_months", 'rate', 'norm_rate'])
-
-file_name2 = input("What you would like to call that file that contains your second processed dataset?  Make sure to include the file extenstion .csv  \n")
-
-pp_duration_pro.to_csv(file_name2, index=False)
-
-logger.info("Saving dataframe to {} file.\n".format(file_name2))
-time.sleep(5)
-
-
-'''
-~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-The remainder of the code calculates summary statistics for the extracted features and generates data visualizations.
-~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-'''
-
-logger.info("Moving onto an exploration of the data. \n")
 
-logger.info("Creating a directory called 'plots' in the current directory to store the visualizations that will be generated during this analysis. \n")
+# Options used by run_pipeline when they are missing from the provided config
+DEFAULT_CONFIG = {
+    "file": "2018",
+    "file_name": "pp_data_processed.csv",
+    "file_name2": "pp_duration_processed.csv",
+    "chunksize": None,
+    "workers": 1,
+    "pause": 5,
+    "plots_dir": "plots",
+    "plot_workers": 1,
+    "eda": True,
+    "cache": False,
+    "cache_file": None,
+    "cache_size": 1000000,
+    "author_store": None,
+    "batch_id": None,
+    "checkpoint_dir": None,
+    "seen_ids": None,
+}
+
+
+def setup_logging(log_file='progresspics analysis.log'):
+    """Sends the status updates and key analysis points to the console and to a log file.
+
+    Arguments:
+    log_file -- path of the log file; it is overwritten on each run
+
+    Returns:
+    None
+    """
+    # Create custom logger
+    logger.setLevel(logging.INFO)
+
+    # Create handlers
+    ch = logging.StreamHandler()
+    fh = logging.FileHandler(log_file, mode='w')
+    ch.setLevel(logging.INFO)
+    fh.setLevel(logging.INFO)
+
+    # Create formatters and add to handlers
+    c_format = logging.Formatter('%(message)s')
+    f_format = logging.Formatter('%(message)s')
+    ch.setFormatter(c_format)
+    fh.setFormatter(f_format)
+
+    logger.addHandler(ch)
+    logger.addHandler(fh)
+
+
+def save_cache(cache, height_cache, config):
+    """Logs the hit and miss counts of the parse caches and saves the title cache if a cache file was given."""
+    if cache is None:
+        return
+    cache.log_stats("Title")
+    height_cache.log_stats("Height")
+    if config["cache_file"]:
+        cache.save(config["cache_file"])
+        logger.info("Saved {} parsed titles to {}. \n".format(len(cache.results), config["cache_file"]))
+
+
+def run_stage(checkpoint_store, stage, function, inputs, params=None, modules=()):
+    """Runs one stage of the cleaning pipeline through a CheckpointStore, so that it is skipped when its inputs and code are unchanged, or directly when checkpoints are turned off.
+
+    Arguments:
+    checkpoint_store -- CheckpointStore, or None to run the stage without checkpoints
+    stage -- name of the stage
+    function -- function without arguments that runs the stage
+    inputs -- list of the content hashes of the stage inputs
+    params -- dictionary of the parameters that change the stage output
+    modules -- modules whose source code implements the stage
+
+    Returns:
+    value -- output of the stage
+    digest -- content hash of the output, or None when checkpoints are turned off
+    """
+    if checkpoint_store is None:
+        return function(), None
+    return checkpoint_store.run(stage, function, inputs, params, modules)
+
+
+def no_new_posts():
+    """Returns the empty processed datasets of a run in which every post was already ingested."""
+    return pd.DataFrame(columns=clean.PROCESSED_DATA_COLUMNS), pd.DataFrame(columns=clean.PROCESSED_DURATION_COLUMNS)
+
+
+def run_cleaning(config):
+    """Imports the raw r/progresspics posts, extracts and cleans the features, and saves the two processed datasets.  When a checkpoint directory is given, the stages (clean, num_posts, processed_data, duration, processed_duration) are run through a CheckpointStore.  When a seen-ids file is given, only the posts that were not ingested by an earlier run are cleaned and saved, and their ids are added to the file once the datasets are written.
+
+    Arguments:
+    config -- dictionary of options with the same keys as DEFAULT_CONFIG
+
+    Returns:
+    pp_data -- Pandas dataframe of the larger processed dataset
+    pp_duration -- Pandas dataframe of the smaller dataset that includes the weight change duration features; both are empty when there are no new posts
+    """
+    file = config["file"]
+    file_name = config["file_name"]
+    file_name2 = config["file_name2"]
+    pause = config["pause"]
+
+    if file == "2018":
+        file = "data/pp_data_2018_raw.csv"
+
+    cache = None
+    height_cache = None
+    if config["cache"] or config["cache_file"]:
+        cache = feat.ParseCache(feat.extract_title_features, maxsize=config["cache_size"])
+        height_cache = feat.ParseCache(feat.height_inches, maxsize=config["cache_size"])
+        if config["cache_file"]:
+            logger.info("Loaded {} parsed titles from {}. \n".format(cache.load(config["cache_file"]), config["cache_file"]))
+
+    store = None
+    batch = None
+    if config["author_store"]:
+        store = author_store.AuthorCountStore(config["author_store"])
+        batch = config["batch_id"] or author_store.file_batch_id(file)
+
+    seen_ids = None
+    if config["seen_ids"]:
+        seen_ids = seen_id_index.SeenIdIndex(config["seen_ids"])
+        logger.info("Loaded {} ingested post ids from {}. \n".format(len(seen_ids), config["seen_ids"]))
+
+    if config["chunksize"]:
+        logger.info("Importing and cleaning raw data in chunks of {} rows. \n".format(config["chunksize"]))
+        written = clean.clean_csv_chunked(file, file_name, file_name2, chunksize=config["chunksize"], workers=config["workers"], cache=cache, author_store=store, batch=batch, seen_ids=seen_ids, height_cache=height_cache)
+
+        save_cache(cache, height_cache, config)
+        if store is not None:
+            store.log_stats()
+            store.close()
+        if not written:
+            logger.info("No new posts in {}; the processed datasets were not written. \n".format(file))
+            return no_new_posts()
+
+        logger.info("Saved dataframes to {} and {} files.\n".format(file_name, file_name2))
+        if seen_ids is not None:
+            seen_ids.save()
 
-os.mkdir("plots")
+        pp_data = dataset_io.load_dataset(file_name, validate=True)
+        pp_duration = dataset_io.load_dataset(file_name2, validate=True)
+        return pp_data, pp_duration
 
-logger.info("Exploratory data analysis will first be performed on the larger dataset without the features related to weight change duration. \n")
-time.sleep(5)
+    checkpoint_store = checkpoints.CheckpointStore(config["checkpoint_dir"]) if config["checkpoint_dir"] else None
+    raw_key = dataset_io.file_digest(file) if checkpoint_store is not None else None
 
-plt.style.use('ggplot')
-plt.rcParams['figure.figsize'] = (10, 5)
+    def import_raw():
+        logger.info("Importing raw data. \n")
+        raw_data = pd.read_csv(file)
 
-# sex analysis
+        logger.info("{} rows, {} columns imported. \n".format(raw_data.shape[0], raw_data.shape[1]))
 
-logger.info("Analyzing the number of male and female users. \n")
-sex_counts = pp_data["sex"].value_counts()
-males = sex_counts[0]/pp_data["sex"].count()
-females = sex_counts[1]/pp_data["sex"].count()
+        if seen_ids is not None:
+            raw_data = seen_ids.filter_new(raw_data)
+        return raw_data
 
-logger.info("The dataset contains {0} males ({1}%) and {2} females ({3}%).\n".format(sex_counts[0], (round(males, 3)*100), sex_counts[1], (round (females, 3)*100)))
+    raw_data = None
+    clean_params = {}
+    if seen_ids is not None:
+        # The new rows are read before the clean stage, so that a run without new posts stops here and the ids are recorded even when the stage is loaded from a checkpoint
+        clean_params = {"seen_ids": seen_ids.digest()}
+        raw_data = import_raw()
+        if raw_data.empty:
+            logger.info("No new posts in {}; the processed datasets were not written. \n".format(file))
+            if store is not None:
+                store.close()
+            return no_new_posts()
 
-logger.info("Generating a plot that compares the number of male and female r/progresspics users to the number of males and females in the general Reddit user population and the US adult population.")
-logger.info("Saving plot as pp_sex_compare.png \n")
+    def clean_raw():
+        return clean.clean_data(raw_data if raw_data is not None else import_raw(), pause=pause, workers=config["workers"], cache=cache, height_cache=height_cache)
 
-US_sex_dict = {"male":  0.49, "female": 0.51}
-reddit_sex_dict = {"male":  0.67, "female": 0.33}
-pp_sex_dict = {"male":  males, "female": females}
+    (pp_data, features), clean_key = run_stage(checkpoint_store, "clean", clean_raw, [raw_key], clean_params, modules=[clean, feat])
+    save_cache(cache, height_cache, config)
+    author_counts = None
+    params = {}
+    if store is not None:
+        author_counts = clean.update_author_counts(clean.count_posts(pp_data), store, batch)
+        params = {"author_store_batches": store.batch_ids()}
+        store.log_stats()
+        store.close()
+    pp_data, data_key = run_stage(checkpoint_store, "num_posts", lambda: clean.add_num_posts(pp_data, author_counts, pause=pause), [clean_key], params, modules=[clean])
 
-ind = np.arange(2)
-width = 0.30
+    logger.info("Currently, the dataset has {} rows. \n".format(pp_data.shape[0]))
 
-fig, ax = plt.subplots()
-ax.bar(ind, list(US_sex_dict.values()), width, align="center", label = "US adult population")
-ax.bar(ind + width, list(reddit_sex_dict.values()), width, align="center", label = "Reddit population")
-ax.bar(ind + 2*width, list(pp_sex_dict.values()), width, align="center", label = "r/progress_pics population")
-ax.set_xticks(ind + width)
-ax.set_xticklabels(list(US_sex_dict.keys()))
-ax.set_ylim(0, 1)
-ax.legend()
-ax.set(title="Frequency of males and females in various populations", ylabel="frequency")
+    logger.info("Removing all starting and intermediate columns so that only processed features remain. \n")
 
-fig.savefig("plots/pp_sex_compare.png")
-time.sleep(5)
+    pp_data_pro, _ = run_stage(checkpoint_store, "processed_data", lambda: clean.format_processed(pp_data, clean.PROCESSED_DATA_COLUMNS), [data_key], modules=[clean])
 
-#age analysis
-logger.info("Analyzing the ages \n")
+    #Save processed dataframe to a .csv, .parquet, or .feather file
+    dataset_io.save_dataset(pp_data_pro, file_name)
 
-pp_males = pp_data[pp_data["sex"] == 0]
-pp_females = pp_data[pp_data["sex"] == 1]
+    logger.info("Saving dataframe to {} file.\n".format(file_name))
 
-age_mean = pp_data['age'].mean()
-mean_male_age = pp_males["age"].mean()
-mean_female_age = pp_females["age"].mean()
-age_min = pp_data['age'].min()
-age_max = pp_data['age'].max()
-twenties = pp_data[(pp_data["age"] >= 20) & (pp_data["age"] < 30)].shape[0]/pp_data.shape[0]
+    time.sleep(pause)
 
-logger.info("The average age of the r/progresspics users is {0} years, while the average male age is {1} years and the average female age is {2} years.".format(round(age_mean, 1), round(mean_male_age, 1), round(mean_female_age, 1)))
+    pp_duration, duration_key = run_stage(checkpoint_store, "duration", lambda: clean.get_duration_data(pp_data, features, pause=pause), [data_key, clean_key], modules=[clean, feat])
 
-logger.info("The oldest user is {0} years old and the youngest is {1} years old. A majority ({2}%) are in their 20s. \n".format(round(age_max, 0), round(age_min, 0), round(twenties * 100, 1)))
+    logger.info("Removing all starting and intermediate columns so that only processed features remain. \n")
 
-logger.info("Generating a plot that compares the age distributions of males and females.")
-logger.info("Saving plot as pp_m_f_age_comparision.png \n")
+    pp_duration_pro, _ = run_stage(checkpoint_store, "processed_duration", lambda: clean.format_processed(pp_duration, clean.PROCESSED_DURATION_COLUMNS), [duration_key], modules=[clean])
 
-fig, ax = plt.subplots()
-ax.hist([pp_females["age"], pp_males["age"],], label=["female", "male"], bins=np.arange(0, 80, 5))
-ax.set(xlabel="age (years)", ylabel="number of users", title="Distribution of male and female r/progresspics users' ages")
-ax.legend()
+    dataset_io.save_dataset(pp_duration_pro, file_name2)
 
-fig.savefig("plots/pp_m_f_age_comparision.png")
+    logger.info("Saving dataframe to {} file.\n".format(file_name2))
+    if seen_ids is not None:
+        seen_ids.save()
+    if checkpoint_store is not None:
+        checkpoint_store.log_stats()
+    time.sleep(pause)
 
-logger.info("Generating a plot that compares the age distributions of r/progresspics users to that of the general Reddit user population and the US adult population.")
-logger.info("Saving plot as pp_age_comparison.png \n")
+    return pp_data, pp_duration
 
-pp_adults = pp_data[pp_data["age"] >=18]
-adults18_29 = pp_adults[(pp_adults["age"] >=18)&(pp_adults["age"] <=29)].shape[0]/pp_adults.shape[0]
-adults30_49 = pp_adults[(pp_adults["age"] >=30)&(pp_adults["age"] <=49)].shape[0]/pp_adults.shape[0]
-adults50_64 = pp_adults[(pp_adults["age"] >=50)&(pp_adults["age"] <=64)].shape[0]/pp_adults.shape[0]
-adults65 = pp_adults[(pp_adults["age"] >=65)].shape[0]/pp_adults.shape[0]
 
-# Adult demographic info from 2016:  https://www.techjunkie.com/demographics-reddit/
-US_age_dict = {"18-29":  0.22, "30-49": 0.34, "50-64": 0.25, "65+": 0.19}
-reddit_age_dict = {"18-29":  0.64, "30-49": 0.29, "50-64": 0.06, "65+": 0.01}
-pp_age_dict = {"18-29":  adults18_29, "30-49": adults30_49, "50-64": adults50_64, "65+": adults65}
+def explore_data(pp_data, pp_duration, plots_dir="plots", pause=5, workers=1):
+    """Calculates summary statistics for the extracted features and saves the data visualizations.  The plots are drawn from bin counts and frequencies once all the statistics are computed, without a display and in parallel when workers > 1.
 
-ind = np.arange(4)
-width = 0.30
+    Arguments:
+    pp_data -- Pandas dataframe of the larger processed dataset
+    pp_duration -- Pandas dataframe of the dataset that includes the weight change duration features
+    plots_dir -- directory where the plots are saved; it is created if it does not exist
+    pause -- number of seconds to wait after each step so the status updates can be read; provide 0 to skip the waits
+    workers -- number of processes used to draw the plots
 
-fig, ax = plt.subplots()
-ax.bar(ind, list(US_age_dict.values()), width, align="center", label = "US adult population")
-ax.bar(ind + width, list(reddit_age_dict.values()), width, align="center", label = "Reddit population")
-ax.bar(ind + 2*width, list(pp_age_dict.values()), width, align="center", label = "r/progress_pics population")
-ax.set_xticks(ind + width)
-ax.set_xticklabels(list(US_age_dict.keys()))
-ax.set_ylim(0, 1)
-ax.legend()
-ax.set(title="Frequency of adults in various population age ranges", xlabel="age range (years)", ylabel="frequency")
+    Returns:
+    None
+    """
+    logger.info("Moving onto an exploration of the data. \n")
 
-fig.savefig("plots/pp_age_comparison.png")
-time.sleep(5)
+    logger.info("Creating a directory called '{}' to store the visualizations that will be generated during this analysis. \n".format(plots_dir))
 
-# Height analysis
-logger.info("Analyzing the heights \n")
+    os.makedirs(plots_dir, exist_ok=True)
 
-mean_height_male = round(pp_males["height_in"].mean(), 1)
-mean_height_female = round(pp_females["height_in"].mean(), 1)
+    logger.info("Exploratory data analysis will first be performed on the larger dataset without the features related to weight change duration. \n")
+    time.sleep(pause)
 
-logger.info("The mean female height is {0} inches while the mean male height is {1} inches. \n".format(mean_height_female, mean_height_male))
+    # Every statistic and histogram is computed up front in one pass over each dataset
+    summary, histograms = eda_stats.summarize_eda(pp_data, pp_duration)
+    bins = eda_stats.HISTOGRAM_BINS
 
-logger.info("Generating a plot that shows the height distributions of male and female users.")
-logger.info("Saving plot as pp_height_range.png \n")
+    # (path, plot function, aggregates) tuples that are rendered at the end
+    plots = []
 
-fig, ax = plt.subplots()
-ax.hist(pp_females["height_in"], label=["female"], bins=np.arange(50, 80, 1), alpha=0.5)
-ax.hist(pp_males["height_in"], label=["male"], bins=np.arange(50, 80, 1), alpha=0.5)
-ax.set(xlabel="height (inches)", ylabel="number of users", title="Distribution of female and male r/progresspics users' heights")
-ax.legend()
+    # sex analysis
 
-fig.savefig("plots/pp_height_range.png")
-time.sleep(5)
+    logger.info("Analyzing the number of male and female users. \n")
+    male_count, female_count = summary.loc["sex_count", "male"], summary.loc["sex_count", "female"]
+    males, females = summary.loc["sex_share", "male"], summary.loc["sex_share", "female"]
 
-#Starting and ending weight analysis
-logger.info("Analyzing starting and ending weights \n")
+    logger.info("The dataset contains {0} males ({1}%) and {2} females ({3}%).\n".format(male_count, (round(males, 3)*100), female_count, (round (females, 3)*100)))
 
-mean_start_male = round(pp_males["start_weight"].mean(), 1)
-mean_start_female = round(pp_females["start_weight"].mean(), 1)
+    logger.info("Generating a plot that compares the number of male and female r/progresspics users to the number of males and females in the general Reddit user population and the US adult population.")
+    logger.info("Saving plot as pp_sex_compare.png \n")
 
-logger.info("The mean female starting weight is {0} lbs while the mean male starting weight is {1} lbs. \n".format(mean_start_female, mean_start_male))
+    US_sex_dict = {"male":  0.49, "female": 0.51}
+    reddit_sex_dict = {"male":  0.67, "female": 0.33}
+    pp_sex_dict = {"male":  males, "female": females}
 
-logger.info("Generating a plot that shows the starting weight distributions of the male and female users.")
-logger.info("Saving plot as pp_starting_weight.png \n")
-
-fig, ax = plt.subplots()
-ax.hist(pp_females["start_weight"], label=["female"], bins = np.arange(50, 1000, 10), alpha=0.5)
-ax.hist(pp_males["start_weight"], label=["male"], bins=np.arange(50, 1000, 10), alpha=0.5)
-ax.set(xlabel="starting weight (pounds)", ylabel="number of users", title="Distribution of female and male r/progresspics users' starting weights")
-ax.legend()
+    plots.append((os.path.join(plots_dir, "pp_sex_compare.png"), eda_plots.plot_population_comparison, {
+        "categories": list(US_sex_dict.keys()),
+        "populations": {"US adult population": list(US_sex_dict.values()), "Reddit population": list(reddit_sex_dict.values()), "r/progress_pics population": list(pp_sex_dict.values())},
+        "title": "Frequency of males and females in various populations"}))
+    time.sleep(pause)
 
-fig.savefig("plots/pp_starting_weight.png")
+    #age analysis
+    logger.info("Analyzing the ages \n")
 
-mean_end_male = round(pp_males["end_weight"].mean(), 1)
-mean_end_female = round(pp_females["end_weight"].mean(), 1)
+    age_mean, mean_male_age, mean_female_age = summary.loc["age_mean"]
+    age_min = summary.loc["age_min", "all"]
+    age_max = summary.loc["age_max", "all"]
+    twenties = summary.loc["age_20s_share", "all"]
 
-logger.info("The mean female ending weight is {0} lbs while the mean male ending weight is {1} lbs. \n".format(mean_end_female, mean_end_male))
+    logger.info("The average age of the r/progresspics users is {0} years, while the average male age is {1} years and the average female age is {2} years.".format(round(age_mean, 1), round(mean_male_age, 1), round(mean_female_age, 1)))
 
-logger.info("Generating a plot that shows the ending weight distributions of the male and females users.")
-logger.info("Saving plot as pp_starting_weight.png \n")
+    logger.info("The oldest user is {0} years old and the youngest is {1} years old. A majority ({2}%) are in their 20s. \n".format(round(age_max, 0), round(age_min, 0), round(twenties * 100, 1)))
 
-fig, ax = plt.subplots()
-ax.hist(pp_females["end_weight"], label=["female"], bins = np.arange(50, 1000, 10), alpha=0.5)
-ax.hist(pp_males["end_weight"], label=["male"], bins=np.arange(50, 1000, 10), alpha=0.5)
-ax.set(xlabel="ending weight (pounds)", ylabel="number of users", title="Distribution of female and male r/progresspics users' ending weights")
-ax.legend()
+    logger.info("Generating a plot that compares the age distributions of males and females.")
+    logger.info("Saving plot as pp_m_f_age_comparision.png \n")
 
-fig.savefig("plots/pp_ending_weight.png")
-time.sleep(5)
+    plots.append((os.path.join(plots_dir, "pp_m_f_age_comparision.png"), eda_plots.plot_histograms, {
+        "bins": bins["age"], "counts": {"female": histograms["age"]["female"], "male": histograms["age"]["male"]},
+        "overlay": False, "xlabel": "age (years)", "title": "Distribution of male and female r/progresspics users' ages"}))
 
-# Analysis of weight loss and weight gain
-logger.info("Analyzing changes in weight for r/progresspics users \n")
+    logger.info("Generating a plot that compares the age distributions of r/progresspics users to that of the general Reddit user population and the US adult population.")
+    logger.info("Saving plot as pp_age_comparison.png \n")
 
-total_entries = pp_data['weight_diff'].count()
-lost_weight = pp_data[pp_data["weight_diff"] > 0]["weight_diff"].count()
-per_lost = round(lost_weight/total_entries * 100, 1)
-gain_weight = pp_data[pp_data["weight_diff"] < 0]["weight_diff"].count()
-per_gain = round(gain_weight/total_entries * 100, 1)
-same_weight = pp_data[pp_data["weight_diff"] == 0]["weight_diff"].count()
-per_same = round(same_weight/total_entries * 100, 1)
+    # Adult demographic info from 2016:  https://www.techjunkie.com/demographics-reddit/
+    US_age_dict = {"18-29":  0.22, "30-49": 0.34, "50-64": 0.25, "65+": 0.19}
+    reddit_age_dict = {"18-29":  0.64, "30-49": 0.29, "50-64": 0.06, "65+": 0.01}
+    pp_age_dict = {"18-29":  summary.loc["adults_18_29_share", "all"], "30-49": summary.loc["adults_30_49_share", "all"], "50-64": summary.loc["adults_50_64_share", "all"], "65+": summary.loc["adults_65_plus_share", "all"]}
 
-logger.info("Of {0} users, {1} lost weight ({2}%), {3} gained weight ({4}%), and {5} stayed the same ({6}%). \n".format(total_entries, lost_weight, per_lost, gain_weight, per_gain, same_weight, per_same))
+    plots.append((os.path.join(plots_dir, "pp_age_comparison.png"), eda_plots.plot_population_comparison, {
+        "categories": list(US_age_dict.keys()),
+        "populations": {"US adult population": list(US_age_dict.values()), "Reddit population": list(reddit_age_dict.values()), "r/progress_pics population": list(pp_age_dict.values())},
+        "title": "Frequency of adults in various population age ranges", "xlabel": "age range (years)"}))
+    time.sleep(pause)
 
-pp_lost = pp_data[pp_data["weight_diff"] > 0]
-pp_gain = pp_data[pp_data["weight_diff"] < 0]
-pp_male_lost = pp_lost[pp_lost['sex'] == 0]
-pp_female_lost = pp_lost[pp_lost['sex'] == 1]
-pp_male_gain = pp_gain[pp_gain['sex'] == 0]
-pp_female_gain = pp_gain[pp_gain['sex'] == 1]
+    # Height analysis
+    logger.info("Analyzing the heights \n")
 
-pp_male_gain.loc[:, "weight_diff"] = pp_male_gain.loc[:, "weight_diff"] * -1
-pp_female_gain.loc[:, "weight_diff"] = pp_female_gain.loc[:, "weight_diff"] * -1
+    mean_height_male = round(summary.loc["height_in_mean", "male"], 1)
+    mean_height_female = round(summary.loc["height_in_mean", "female"], 1)
 
-mean_loss_male = pp_male_lost['weight_diff'].mean()
-mean_loss_female = pp_female_lost['weight_diff'].mean()
-mean_gain_male = pp_male_gain['weight_diff'].mean()
-mean_gain_female = pp_female_gain['weight_diff'].mean()
-max_male_loss = pp_male_lost["weight_diff"].max()
-max_female_loss = pp_female_lost["weight_diff"].max()
+    logger.info("The mean female height is {0} inches while the mean male height is {1} inches. \n".format(mean_height_female, mean_height_male))
 
-logger.info('The mean female weight loss was {0} lbs while the mean male weight loss was {1} lbs.'.format(round(mean_loss_female, 1), round(mean_loss_male, 1)))
-logger.info('The mean female weight gain was {0} lbs while the mean male weight gain was {1} lbs.'.format(round(mean_gain_female, 1), round(mean_gain_male, 1)))
-logger.info('The largest amount of weight loss by a female and male respectively was {0} lbs {1} lbs. \n '.format(round(max_female_loss, 1), round(max_male_loss, 1)))
+    logger.info("Generating a plot that shows the height distributions of male and female users.")
+    logger.info("Saving plot as pp_height_range.png \n")
 
-logger.info("Generating a plot that shows the distributions of weight loss and weight gain by male and females users.")
-logger.info("Saving plot as pp_histogram_weight_diff.png \n")
+    plots.append((os.path.join(plots_dir, "pp_height_range.png"), eda_plots.plot_histograms, {
+        "bins": bins["height_in"], "counts": {"female": histograms["height_in"]["female"], "male": histograms["height_in"]["male"]},
+        "xlabel": "height (inches)", "title": "Distribution of female and male r/progresspics users' heights"}))
+    time.sleep(pause)
 
-fig, [ax1, ax2] = plt.subplots(1, 2, sharey=True)
-ax1.hist(pp_female_lost["weight_diff"], bins = np.arange(0, 300, 10), label="females", alpha=0.5)
-ax1.hist(pp_male_lost["weight_diff"], bins = np.arange(0, 300, 10), label="males", alpha=0.5)
-ax1.set(xlabel="pounds lost", ylabel="number of users")
-ax2.hist(pp_female_gain["weight_diff"], bins = np.arange(0, 300, 10), label='females', alpha=0.5)
-ax2.hist(pp_male_gain["weight_diff"], bins = np.arange(0, 300, 10), label='males', alpha=0.5)
-ax2.set(xlabel="pounds gained")
-fig.suptitle("Distributions of weight change by r/progresspics users")
-ax2.legend()
+    #Starting and ending weight analysis
+    logger.info("Analyzing starting and ending weights \n")
 
-fig.savefig("plots/pp_histogram_weight_diff.png")
-time.sleep(5)
+    mean_start_male = round(summary.loc["start_weight_mean", "male"], 1)
+    mean_start_female = round(summary.loc["start_weight_mean", "female"], 1)
 
-# Analysis of the duration of weight loss
-logger.info("Analyzing the duration of weight loss using the smaller dataset ({} rows) which contains the users for which a weight change period could be determined. \n".format(pp_duration.shape[0]))
+    logger.info("The mean female starting weight is {0} lbs while the mean male starting weight is {1} lbs. \n".format(mean_start_female, mean_start_male))
 
+    logger.info("Generating a plot that shows the starting weight distributions of the male and female users.")
+    logger.info("Saving plot as pp_starting_weight.png \n")
 
-dur_loss = pp_duration[pp_duration["weight_diff"] > 0]
-dur_male_loss = dur_loss[dur_loss['sex'] == 0]
-dur_female_loss = dur_loss[dur_loss['sex'] == 1]
-dur_loss_lt72 = dur_loss[dur_loss["period_months"]<=72]
+    plots.append((os.path.join(plots_dir, "pp_starting_weight.png"), eda_plots.plot_histograms, {
+        "bins": bins["start_weight"], "counts": {"female": histograms["start_weight"]["female"], "male": histograms["start_weight"]["male"]},
+        "xlabel": "starting weight (pounds)", "title": "Distribution of female and male r/progresspics users' starting weights"}))
 
-max_duration = dur_loss["period_months"].max()
-years_lt6 = dur_loss[dur_loss['period_months'] <= 72].shape[0]
-per_years_lt6 = round(years_lt6/dur_loss.shape[0] * 100, 1)
-years_lt1 = dur_loss[dur_loss['period_months'] <= 12].shape[0]
-per_years_lt1 = round(years_lt1/dur_loss.shape[0] *100, 1)
+    mean_end_male = round(summary.loc["end_weight_mean", "male"], 1)
+    mean_end_female = round(summary.loc["end_weight_mean", "female"], 1)
 
-logger.info("The longest period of weight loss reported was {} years. \n".format(max_duration))
-logger.info("The percentage of users whose weight loss took 6 or fewer years was {0}%, while the percentage who reported weight loss over one year or less was {1}%.\n".format(per_years_lt6, per_years_lt1))
+    logger.info("The mean female ending weight is {0} lbs while the mean male ending weight is {1} lbs. \n".format(mean_end_female, mean_end_male))
 
-logger.info("Generating a plot that shows a histogram of the duration of weight loss for all users.")
-logger.info("Saving plot as pp_weight_loss_duration.png \n")
+    logger.info("Generating a plot that shows the ending weight distributions of the male and females users.")
+    logger.info("Saving plot as pp_starting_weight.png \n")
 
-fig, ax = plt.subplots()
-ax.hist(dur_loss_lt72["period_months"], bins = np.arange(0, 70, 3))
-ax.xaxis.set_major_locator(plt.MultipleLocator(3))
-ax.set(xlabel="months", ylabel="number of users", title="Duration of the weight loss")
+    plots.append((os.path.join(plots_dir, "pp_ending_weight.png"), eda_plots.plot_histograms, {
+        "bins": bins["end_weight"], "counts": {"female": histograms["end_weight"]["female"], "male": histograms["end_weight"]["male"]},
+        "xlabel": "ending weight (pounds)", "title": "Distribution of female and male r/progresspics users' ending weights"}))
+    time.sleep(pause)
 
-fig.savefig("plots/pp_weight_loss_duration.png")
-time.sleep(5)
+    # Analysis of weight loss and weight gain
+    logger.info("Analyzing changes in weight for r/progresspics users \n")
 
-# Analysis of rate of weight loss
-logger.info("Analyzing the rate of weight loss \n")
+    total_entries = summary.loc["weight_diff_count", "all"]
+    lost_weight = summary.loc["lost_count", "all"]
+    per_lost = round(summary.loc["lost_share", "all"] * 100, 1)
+    gain_weight = summary.loc["gained_count", "all"]
+    per_gain = round(summary.loc["gained_share", "all"] * 100, 1)
+    same_weight = summary.loc["same_count", "all"]
+    per_same = round(summary.loc["same_share", "all"] * 100, 1)
 
-loss_rate = round(dur_loss["rate"].mean(), 1)
-male_loss_rate = round(dur_male_loss["rate"].mean(), 1)
-female_loss_rate = round(dur_female_loss["rate"].mean(), 1)
+    logger.info("Of {0} users, {1} lost weight ({2}%), {3} gained weight ({4}%), and {5} stayed the same ({6}%). \n".format(total_entries, lost_weight, per_lost, gain_weight, per_gain, same_weight, per_same))
 
-logger.info("The mean rate of weight loss for all users is {0} lbs/month. Males lost weight at a mean rate of {1} lbs/month and females at a rate of {2} lbs/month. \n".format(loss_rate, male_loss_rate, female_loss_rate))
+    mean_loss_male = summary.loc["lost_mean", "male"]
+    mean_loss_female = summary.loc["lost_mean", "female"]
+    mean_gain_male = summary.loc["gained_mean", "male"]
+    mean_gain_female = summary.loc["gained_mean", "female"]
+    max_male_loss = summary.loc["lost_max", "male"]
+    max_female_loss = summary.loc["lost_max", "female"]
 
-logger.info("Generating a plot that shows the distributions of weight loss rates for all males and females.")
-logger.info("Saving plot as pp_weight_loss_duration.png \n")
+    logger.info('The mean female weight loss was {0} lbs while the mean male weight loss was {1} lbs.'.format(round(mean_loss_female, 1), round(mean_loss_male, 1)))
+    logger.info('The mean female weight gain was {0} lbs while the mean male weight gain was {1} lbs.'.format(round(mean_gain_female, 1), round(mean_gain_male, 1)))
+    logger.info('The largest amount of weight loss by a female and male respectively was {0} lbs {1} lbs. \n '.format(round(max_female_loss, 1), round(max_male_loss, 1)))
 
-fig, ax = plt.subplots(1, 1)
-ax.hist(dur_female_loss["rate"], bins = np.arange(0, 30, 1), label='females', alpha = 0.5)
-ax.hist(dur_male_loss["rate"], bins = np.arange(0, 30, 1), label='males', alpha = 0.5)
-ax.legend()
-ax.set(title="Distribution of female and male r/progresspics users' weight loss rates", xlabel="weight loss rates (pounds/month)", ylabel="number of users")
+    logger.info("Generating a plot that shows the distributions of weight loss and weight gain by male and females users.")
+    logger.info("Saving plot as pp_histogram_weight_diff.png \n")
+
+    plots.append((os.path.join(plots_dir, "pp_histogram_weight_diff.png"), eda_plots.plot_weight_change, {
+        "bins": bins["weight_lost"],
+        "lost_counts": {"females": histograms["weight_lost"]["female"], "males": histograms["weight_lost"]["male"]},
+        "gained_counts": {"females": histograms["weight_gained"]["female"], "males": histograms["weight_gained"]["male"]},
+        "title": "Distributions of weight change by r/progresspics users"}))
+    time.sleep(pause)
+
+    # Analysis of the duration of weight loss
+    logger.info("Analyzing the duration of weight loss using the smaller dataset ({} rows) which contains the users for which a weight change period could be determined. \n".format(summary.loc["duration_rows", "all"]))
+
+    max_duration = summary.loc["duration_max", "all"]
+    per_years_lt6 = round(summary.loc["duration_72_share", "all"] * 100, 1)
+    per_years_lt1 = round(summary.loc["duration_12_share", "all"] * 100, 1)
+
+    logger.info("The longest period of weight loss reported was {} years. \n".format(max_duration))
+    logger.info("The percentage of users whose weight loss took 6 or fewer years was {0}%, while the percentage who reported weight loss over one year or less was {1}%.\n".format(per_years_lt6, per_years_lt1))
+
+    logger.info("Generating a plot that shows a histogram of the duration of weight loss for all users.")
+    logger.info("Saving plot as pp_weight_loss_duration.png \n")
+
+    plots.append((os.path.join(plots_dir, "pp_weight_loss_duration.png"), eda_plots.plot_histograms, {
+        "bins": bins["period_months"], "counts": {None: histograms["period_months"]["all"]},
+        "tick_spacing": 3, "xlabel": "months", "title": "Duration of the weight loss"}))
+    time.sleep(pause)
+
+    # Analysis of rate of weight loss
+    logger.info("Analyzing the rate of weight loss \n")
 
-fig.savefig("plots/pp_raw_weight_loss_rates.png")
+    loss_rate = round(summary.loc["rate_mean", "all"], 1)
+    male_loss_rate = round(summary.loc["rate_mean", "male"], 1)
+    female_loss_rate = round(summary.loc["rate_mean", "female"], 1)
 
-logger.info("Preliminary data analysis is now complete.")
+    logger.info("The mean rate of weight loss for all users is {0} lbs/month. Males lost weight at a mean rate of {1} lbs/month and females at a rate of {2} lbs/month. \n".format(loss_rate, male_loss_rate, female_loss_rate))
+
+    logger.info("Generating a plot that shows the distributions of weight loss rates for all males and females.")
+    logger.info("Saving plot as pp_weight_loss_duration.png \n")
+
+    plots.append((os.path.join(plots_dir, "pp_raw_weight_loss_rates.png"), eda_plots.plot_histograms, {
+        "bins": bins["rate"], "counts": {"females": histograms["rate"]["female"], "males": histograms["rate"]["male"]},
+        "xlabel": "weight loss rates (pounds/month)", "title": "Distribution of female and male r/progresspics users' weight loss rates"}))
+
+    logger.info("Saving the plots in the '{}' directory. \n".format(plots_dir))
+    eda_plots.render_plots(plots, workers=workers)
+
+    logger.info("Preliminary data analysis is now complete.")
+
+
+def run_pipeline(config):
+    """Runs the whole r/progresspics pipeline without asking for input: cleaning, saving the processed datasets, and (optionally) the exploratory data analysis.
+
+    Arguments:
+    config -- dictionary of options; any keys missing from it are taken from DEFAULT_CONFIG
+        file -- path of the raw .csv file, or '2018' for the included 2018 r/progresspics data
+        file_name -- path of the processed dataset to write
+        file_name2 -- path of the processed duration dataset to write
+        chunksize -- number of rows to clean at a time, or None to clean the whole file at once
+        workers -- number of processes used to parse the titles
+        pause -- number of seconds to wait after each step; provide 0 for unattended runs
+        plots_dir -- directory where the plots are saved
+        plot_workers -- number of processes used to draw the plots
+        eda -- whether to run the exploratory data analysis
+        cache -- whether to keep parsed titles in memory so repeated titles are only parsed once
+        cache_file -- optional pickle file of parsed titles that is loaded before and saved after cleaning; turns on cache
+        cache_size -- maximum number of parsed titles, and of converted heights, to keep in the caches
+        author_store -- optional SQLite file of post counts per author that is updated with each run, so num_posts counts the posts of every batch ingested into it
+        batch_id -- id of the raw file in the author store; defaults to the hash of its contents
+        checkpoint_dir -- optional directory where the output of each cleaning stage is checkpointed, so reruns skip the stages whose inputs and code are unchanged; not used when chunksize is given
+        seen_ids -- optional .npy file of the ids of the posts ingested so far; posts that are in it are dropped before their titles are parsed, and the new ids are added to it
+
+    Returns:
+    pp_data -- Pandas dataframe of the larger processed dataset
+    pp_duration -- Pandas dataframe of the smaller dataset that includes the weight change duration features
+    """
+    config = dict(DEFAULT_CONFIG, **config)
+
+    logger.info("This script processes and extracts features from r/progresspics post titles, then generates summary visualizations. \n ")
+
+    pp_data, pp_duration = run_cleaning(config)
+
+    if config["eda"] and not pp_data.empty:
+        explore_data(pp_data, pp_duration, plots_dir=config["plots_dir"], pause=config["pause"], workers=config["plot_workers"])
+    return pp_data, pp_duration
+
+
+def parse_args(argv=None):
+    """Reads the pipeline options from the command line and returns them as a config dictionary for run_pipeline."""
+    parser = argparse.ArgumentParser(description="Processes and extracts features from r/progresspics post titles, then generates summary visualizations.")
+    parser.add_argument("file", nargs="?", default=DEFAULT_CONFIG["file"], help="path of the raw .csv file; '2018' uses the included 2018 r/progresspics data")
+    parser.add_argument("-o", "--output", dest="file_name", default=DEFAULT_CONFIG["file_name"], help="path of the processed dataset; use a .parquet or .feather extension for a typed binary file (needs pyarrow)")
+    parser.add_argument("-d", "--duration-output", dest="file_name2", default=DEFAULT_CONFIG["file_name2"], help="path of the processed duration dataset; .csv, .parquet, or .feather")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CONFIG["chunksize"], help="clean the file this many rows at a time so that it does not have to fit in memory")
+    parser.add_argument("--workers", type=int, default=DEFAULT_CONFIG["workers"], help="number of processes used to parse the titles")
+    parser.add_argument("--pause", type=float, default=DEFAULT_CONFIG["pause"], help="seconds to wait after each step so the status updates can be read; use 0 for unattended runs")
+    parser.add_argument("--plots-dir", dest="plots_dir", default=DEFAULT_CONFIG["plots_dir"], help="directory where the plots are saved")
+    parser.add_argument("--plot-workers", type=int, default=DEFAULT_CONFIG["plot_workers"], help="number of processes used to draw the plots")
+    parser.add_argument("--no-eda", dest="eda", action="store_false", help="skip the exploratory data analysis")
+    parser.add_argument("--cache", action="store_true", help="only parse each distinct title once")
+    parser.add_argument("--cache-file", default=DEFAULT_CONFIG["cache_file"], help="pickle file of parsed titles reused across runs; turns on --cache")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CONFIG["cache_size"], help="maximum number of parsed titles, and of converted heights, to keep in the caches")
+    parser.add_argument("--author-store", default=DEFAULT_CONFIG["author_store"], help="SQLite file of post counts per author, updated incrementally with each raw file so num_posts counts the posts of every file ingested into it")
+    parser.add_argument("--batch-id", default=DEFAULT_CONFIG["batch_id"], help="id of the raw file in the author store; defaults to the hash of its contents, so a file is only counted once")
+    parser.add_argument("--checkpoint-dir", default=DEFAULT_CONFIG["checkpoint_dir"], help="directory where the output of each cleaning stage is checkpointed so reruns skip the unchanged stages (not used with --chunksize)")
+    parser.add_argument("--seen-ids", default=DEFAULT_CONFIG["seen_ids"], help=".npy file of the ids of the posts ingested so far; only the posts that are not in it are cleaned and saved, then their ids are added to it")
+    parser.add_argument("--log-file", default='progresspics analysis.log', help="path of the log file")
+    return vars(parser.parse_args(argv))
+
+
+def main(argv=None):
+    config = parse_args(argv)
+    log_file = config.pop("log_file")
+    setup_logging(log_file)
+
+    logger.info("As this script runs, it will print status updates and key analysis points to the console as well as save them in a log file called {} for future reference. \n".format(log_file))
+    run_pipeline(config)
+
+
+if __name__ == "__main__":
+    main()
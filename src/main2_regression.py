@@ -2,8 +2,10 @@
 This script runs simple linear regressions and generates simple linear regression diagnostic plots. It also runs the forward stepwise and best subsets multiple linear regression model selection procedures.  Two default datasets that contain features related to r/progresspics are included though users can also provide their own .cvs file.
 '''
 
-import pandas as pd
 import src.regression.pp_regression_fxn as regr
+import src.regression.pp_regression_streaming as stream
+import src.data.pp_dataset_io as dataset_io
+import src.data.pp_checkpoints as checkpoints
 import logging
 
 
@@ -31,19 +33,37 @@ logger.addHandler(fh)
 logger.info("This script generates simple linear regression models, produces diagnostic plots for simple linear regression models, and identifies robust multiple linear regression models using best subsets or forward stepwise model finding procedures. \n ")
 
 # Importing data from .csv file
-file = input(str("Type a file path for .csv file that contains data for the independent and dependent variables.  If 'data' is entered, the program will run using the included large 2018 r/progresspics dataset.  If 'duration' is entered, the program will run using the smaller 2018 r/progresspics dataset (which includes the weight change time duration variables.) \n"))
+file = input(str("Type a file path for a .csv, .parquet, or .feather file that contains data for the independent and dependent variables.  If 'data' is entered, the program will run using the included large 2018 r/progresspics dataset.  If 'duration' is entered, the program will run using the smaller 2018 r/progresspics dataset (which includes the weight change time duration variables.)  If 'checkpoint' or 'checkpoint duration' is entered, the program will use the processed dataset or the processed duration dataset checkpointed by the last run of main.py with --checkpoint-dir. \n"))
+
+load_input = input("How would you like to load the dataset? Enter memory to load it into memory, mmap to load it as a memory-mapped array that is cached in a .mmap_cache directory next to the file and shared between runs, or stream to read it in chunks and keep only the sums of squares and cross-products, which works for datasets larger than memory but cannot make diagnostic plots.  ")
 
-logger.info("Importing raw data. \n")
 if file == "data":
-    data = pd.read_csv("data/pp_data_2018_processed.csv")
+    file = "data/pp_data_2018_processed.csv"
 elif file == "duration:":
-    data = pd.read_csv("data/pp_duration_2018_processed.csv")
+    file = "data/pp_duration_2018_processed.csv"
+elif file in ("checkpoint", "checkpoint duration"):
+    checkpoint_dir = input("Which checkpoint directory did you give main.py?  ")
+    file = checkpoints.CheckpointStore(checkpoint_dir).latest("processed_data" if file == "checkpoint" else "processed_duration")
+
+logger.info("Importing raw data. \n")
+if load_input == 'stream':
+    regr_mode = stream
+    data = stream.load_stats(dataset_io.iter_dataset(file))
+    logger.info("Your dataset contains the following numeric columns: {} \n".format(data.columns))
 else:
-    data = pd.read_csv(file)
+    regr_mode = regr
+    # Formula models fit by one procedure are reused by the later ones
+    model_cache = regr.ModelCache()
+    if load_input == 'mmap':
+        data = dataset_io.load_dataset_mmap(file)
+        # The cache metadata already holds a digest of the values, so the model cache does not hash them again
+        model_cache.register(data, dataset_io.mmap_digest(file))
+    else:
+        data = dataset_io.load_dataset(file)
 
-logger.info("{} rows, {} columns imported. \n".format(data.shape[0], data.shape[1]))
+    logger.info("{} rows, {} columns imported. \n".format(data.shape[0], data.shape[1]))
 
-logger.info("Your dataset contains the following columns: {} \n".format( data.columns))
+    logger.info("Your dataset contains the following columns: {} \n".format( data.columns))
 
 # Simple linear regression
 logger.info("Simple Linear Regression using your selected dataset. \n")
@@ -57,20 +77,35 @@ if exclude_input == 'none':
 else:
     exclude_cols = exclude_input.split(',')
 
-regr.linear_regression(dependent_var, data, exclude_cols)
+if regr_mode is stream:
+    stream.linear_regression(dependent_var, data, exclude_cols)
+else:
+    summaries_input = input("Would you like to print the statsmodels summary of every simple linear regression? Enter yes, or no to only print the results table, which is much faster for many columns.  ")
+    regr.linear_regression(dependent_var, data, exclude_cols, summaries=summaries_input != 'no', cache=model_cache)
 
 # Diagnostic plots
 
 logger.info("Diagnostic plots")
 
-plot_input = input("Would you like to run diagnostic plots for one of your independent variables? Enter yes or no.  ")
+if regr_mode is stream:
+    logger.info("Diagnostic plots need the rows of the dataset, so they are skipped when it is streamed. \n")
+    plot_input = 'no'
+else:
+    plot_input = input("Would you like to run diagnostic plots for one of your independent variables? Enter yes, all to save them for every independent variable, or no.  ")
 
 if plot_input == 'yes':
     independent_var = input("Which column do you want to use as the independent variable in your diagnostic plots?  ")
-    fig = regr.lin_regr_diagnostic_plots(dependent_var, independent_var, data)
+    fig = regr.lin_regr_diagnostic_plots(dependent_var, independent_var, data, cache=model_cache)
     plot_title = input("What do you want to call the diagnostic plot file? Make sure the file extension is .png  ")
     fig.savefig(plot_title)
     logger.info('\n')
+elif plot_input == 'all':
+    plot_dir = input("Which directory do you want to save the diagnostic plots in?  ")
+    plot_features = [col for col in data.columns if col not in [dependent_var] + exclude_cols]
+    workers_input = input("How many processes should draw the plots? Enter a number, or press enter to draw them in this process.  ")
+    plot_workers = int(workers_input) if workers_input.strip() else 1
+    regr.batch_diagnostic_plots(dependent_var, data, plot_features, plot_dir, workers=plot_workers)
+    logger.info('\n')
 
 # Multiple linear regression
 logger.info("Multiple Linear Regression using your selected dataset.\n")
@@ -87,11 +122,36 @@ else:
 logger.info("The scrip will now run two types of multiple linear regression variable selection procedures:  best subsets and forward stepwise. \n")
 
 
-stepwise = regr.stepwise_linear_regression(dependent_var, data, exclude_cols)
+collinear_input = input("Would you like forward stepwise to skip the independent variables that are collinear with the model, such as weight_diff next to start_weight and end_weight? Enter yes, or no to run the procedure unchanged.  Skipping them can change the models found on data with collinear columns.  ")
+if regr_mode is stream:
+    stepwise = stream.stepwise_linear_regression(dependent_var, data, exclude_cols, skip_collinear=collinear_input == 'yes')
+else:
+    stepwise = regr.stepwise_linear_regression(dependent_var, data, exclude_cols, skip_collinear=collinear_input == 'yes', cache=model_cache)
 logger.info("Results of stepwise multiple linear regression variable selection: \n")
 logger.info(stepwise)
 logger.info('\n')
 
-subset = regr.subset_linear_regression(dependent_var, data, exclude_cols)
+if regr_mode is stream:
+    subset_method = input("Which best subsets method would you like to use? Enter leaps for the branch-and-bound search, which skips most of the combinations, or gram to score every combination.  Press enter for leaps.  ").strip() or "leaps"
+    subset = stream.subset_linear_regression(dependent_var, data, exclude_cols, method=subset_method)
+else:
+    subset_method = input("Which best subsets method would you like to use? Enter gram to score every combination from the cross-products of the data, leaps for the branch-and-bound search, which skips most of the combinations and suits more than about 20 columns, or formula to fit a model for each combination.  Press enter for gram.  ").strip() or "gram"
+    subset_workers = 1
+    if subset_method == "gram":
+        workers_input = input("How many processes should score the combinations? Enter a number, or press enter to score them in this process.  ")
+        subset_workers = int(workers_input) if workers_input.strip() else 1
+    subset = regr.subset_linear_regression(dependent_var, data, exclude_cols, method=subset_method, workers=subset_workers, cache=model_cache)
 logger.info("Results of best subsets multiple linear regression variable selection: \n")
 logger.info(subset)
+
+if regr_mode is regr:
+    # The model columns hold compact records; the full statsmodels results are only fit again for the summaries
+    summary_input = input("Would you like to print the full summary of the final stepwise model and of the best subsets model with the highest R-squared adj? Enter yes or no.  ")
+    if summary_input == 'yes':
+        if len(stepwise):
+            logger.info("Final stepwise model: \n")
+            logger.info(stepwise["model"].iloc[-1].summary())
+        if len(subset):
+            logger.info("Best subsets model with the highest R-squared adj: \n")
+            logger.info(subset["model"].iloc[subset["rsquared_adj"].astype(float).to_numpy().argmax()].summary())
+    model_cache.log_stats()
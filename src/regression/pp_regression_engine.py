@@ -0,0 +1,598 @@
+import heapq
+import itertools
+import math
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+# Smallest squared pivot of the Cholesky factor of a unit-diagonal sub-block before the predictors are treated as collinear
+SINGULAR_PIVOT = 1e-10
+# Relative difference below which the p-values of two stepwise candidates are treated as a tie
+PVALUE_RTOL = 1e-6
+
+
+class CrossProducts:
+    """Centered cross-products of a set of candidate predictors and a dependent variable.  Every linear regression with an intercept on a subset of the predictors can be solved from these matrices alone, without going back to the rows of the data.
+
+    The predictor columns are scaled to unit length after centering, which keeps the sub-blocks well conditioned and does not change the RSS of any model.
+    """
+
+    def __init__(self, features, n, sxx, sxy, syy):
+        """Arguments:
+        features -- names of the predictor columns, in the order of the rows and columns of sxx
+        n -- number of observations
+        sxx -- centered X'X matrix of the predictors
+        sxy -- centered X'y vector
+        syy -- centered y'y, the total sum of squares
+        """
+        self.features = list(features)
+        self.n = n
+        self.syy = float(syy)
+        scale = np.sqrt(np.diag(sxx))
+        scale[scale == 0] = 1.0
+        self.sxx = sxx / np.outer(scale, scale)
+        self.sxy = sxy / scale
+
+    def rss(self, combos, lengths=None):
+        """Returns the residual sum of squares and the rank of the models with an intercept and the predictors in each row of combos.  The sub-blocks of X'X are factored with a batched Cholesky decomposition.  Sub-blocks of collinear predictors, which statsmodels fits with the pseudo-inverse, are solved the same way one model at a time.
+
+        Arguments:
+        combos -- integer array with one row of predictor positions per model
+        lengths -- optional number of predictors of each model, for models with fewer predictors than combos has columns; the rest of the row is ignored
+
+        Returns:
+        tuple of NumPy arrays with the RSS and the rank of each model
+        """
+        sub = self.sxx[combos[:, :, None], combos[:, None, :]]
+        rhs = self.sxy[combos]
+        k = combos.shape[1]
+        if lengths is None:
+            rank = np.full(combos.shape[0], k)
+        else:
+            # Padding columns get an identity block and no covariance with y, so they do not change the fit
+            used = np.arange(k) < lengths[:, None]
+            sub = np.where(used[:, :, None] & used[:, None, :], sub, np.eye(k))
+            rhs = np.where(used, rhs, 0.0)
+            rank = np.array(lengths)
+        try:
+            chol = np.linalg.cholesky(sub)
+        except np.linalg.LinAlgError:
+            # Factor the models one at a time so only the ones that fail are left for the pseudo-inverse
+            chol = np.zeros_like(sub)
+            for i in range(sub.shape[0]):
+                try:
+                    chol[i] = np.linalg.cholesky(sub[i])
+                except np.linalg.LinAlgError:
+                    pass
+        pivots = np.diagonal(chol, axis1=1, axis2=2) ** 2
+        singular = (pivots < SINGULAR_PIVOT).any(axis=1)
+        z = np.linalg.solve(np.where(singular[:, None, None], np.eye(k), chol), rhs[:, :, None])[:, :, 0]
+        explained = (z ** 2).sum(axis=1)
+        for i in np.flatnonzero(singular):
+            explained[i] = rhs[i] @ np.linalg.pinv(sub[i]) @ rhs[i]
+            rank[i] = np.linalg.matrix_rank(sub[i]) - (k - rank[i] if lengths is not None else 0)
+        return self.syy - explained, rank
+
+    def importance(self, predictors):
+        """Returns the increase in RSS when each of the predictors is dropped from the model that contains all of them."""
+        predictors = np.asarray(predictors, dtype=np.intp)
+        inverse = np.linalg.pinv(self.sxx[np.ix_(predictors, predictors)])
+        coefficients = inverse @ self.sxy[predictors]
+        diagonal = np.diag(inverse)
+        return np.where(diagonal > 0, coefficients ** 2 / np.where(diagonal > 0, diagonal, 1.0), 0.0)
+
+    def rsquared(self, rss):
+        """Returns the R-squared values for the given RSS values."""
+        return 1 - rss / self.syy
+
+    def rsquared_adj(self, rss, rank):
+        """Returns the R-squared-adjusted values for the given RSS values of models with an intercept and predictors of the given rank."""
+        return 1 - (rss / self.syy) * (self.n - 1) / (self.n - rank - 1)
+
+
+def cross_products(y, df, features):
+    """Computes the centered cross-products of the provided features and dependent variable in one pass over the data.
+
+    Arguments:
+    y -- column name of the dependent variable; provide a string
+    df -- Pandas dataframe with numeric columns and no missing values
+    features -- column names of the candidate independent variables; provide a list of strings
+
+    Returns:
+    CrossProducts object
+    """
+    x = df[features].to_numpy(dtype=np.float64)
+    x = x - x.mean(axis=0)
+    y_values = df[y].to_numpy(dtype=np.float64)
+    y_values = y_values - y_values.mean()
+    return CrossProducts(features, x.shape[0], x.T @ x, x.T @ y_values, y_values @ y_values)
+
+
+def combination_batches(p, k, batch_size=4096, start=0, stop=None):
+    """Yields the combinations of k out of p predictor positions, in the order of itertools.combinations, as integer arrays of up to batch_size rows.  Only the combinations from position start up to stop are produced."""
+    combos = itertools.islice(itertools.combinations(range(p), k), start, stop)
+    while True:
+        batch = list(itertools.islice(combos, batch_size))
+        if not batch:
+            return
+        yield np.array(batch, dtype=np.intp)
+
+
+def best_in_range(products, k, start, stop, top=2, batch_size=4096):
+    """Evaluates the models with k predictors at positions start to stop of itertools.combinations order and returns the best ones.  Only a heap of the top models is kept, so memory use does not depend on the number of combinations.
+
+    Arguments:
+    products -- CrossProducts object
+    k -- number of predictors in each model
+    start -- position of the first combination to evaluate
+    stop -- position after the last combination to evaluate
+    top -- number of models to return
+    batch_size -- number of models solved together
+
+    Returns:
+    list of (position, predictors, rsquared_adj) tuples in the format of best_subsets
+    """
+    # The heap holds (rsquared_adj, -position, predictors) so that its smallest entry is the worst model kept
+    heap = []
+    position = start
+    for combos in combination_batches(len(products.features), k, batch_size, start, stop):
+        adj = products.rsquared_adj(*products.rss(combos))
+        # A stable sort on the negated values keeps the earlier combination first among ties
+        for i in np.argsort(-adj, kind="stable")[:top]:
+            model = (float(adj[i]), -(position + int(i)), tuple(int(c) for c in combos[i]))
+            if len(heap) < top:
+                heapq.heappush(heap, model)
+            elif model > heap[0]:
+                heapq.heapreplace(heap, model)
+        position += combos.shape[0]
+    return [(-negative_position, combo, adj) for adj, negative_position, combo in sorted(heap, reverse=True)]
+
+
+def best_subsets(products, k, top=2, batch_size=4096, executor=None, workers=1):
+    """Evaluates every model with k of the predictors in products and returns the ones with the highest R-squared-adjusted values.  Ties are broken in favor of the combination that itertools.combinations produces first, as with DataFrame.nlargest.  With an executor, the combinations are split into ranges that are evaluated in separate processes, and only the best models of each range are sent back and merged.
+
+    Arguments:
+    products -- CrossProducts object
+    k -- number of predictors in each model
+    top -- number of models to return
+    batch_size -- number of models solved together
+    executor -- optional ProcessPoolExecutor used to evaluate the ranges
+    workers -- number of processes of the executor; the combinations are split into four ranges per process
+
+    Returns:
+    list of (position, predictors, rsquared_adj) tuples sorted from the best model down, where position is the index of the combination in itertools.combinations order and predictors is a tuple of predictor positions
+    """
+    total = math.comb(len(products.features), k)
+    if executor is None or total <= batch_size:
+        return best_in_range(products, k, 0, total, top, batch_size)
+    size = max(batch_size, -(-total // (workers * 4)))
+    starts = list(range(0, total, size))
+    stops = [min(start + size, total) for start in starts]
+    ranges = executor.map(best_in_range, itertools.repeat(products), itertools.repeat(k), starts, stops, itertools.repeat(top), itertools.repeat(batch_size))
+    models = [model for best in ranges for model in best]
+    return sorted(models, key=lambda model: (-model[2], model[0]))[:top]
+
+
+def combination_position(combo, p):
+    """Returns the index of a combination of predictor positions in the order that itertools.combinations(range(p), len(combo)) produces it."""
+    k = len(combo)
+    position = 0
+    previous = -1
+    for i, c in enumerate(combo):
+        for skipped in range(previous + 1, c):
+            position += math.comb(p - 1 - skipped, k - 1 - i)
+        previous = c
+    return position
+
+
+def leaps_and_bounds(products, sizes, top=2):
+    """Finds the models with the highest R-squared-adjusted values for every number of predictors in sizes with a branch-and-bound search, so that most of the combinations are never evaluated.
+
+    The search walks a tree in which each node adds one more predictor to the predictors of its parent, chosen from the predictors the node is still free to add.  Every model below a node is a subset of the model with the node's predictors and all of its free predictors, so its RSS is at least the RSS of that model, plus the increase from dropping the least important free predictor it leaves out.  A node is skipped when these bounds cannot beat the models already kept for any of the sizes below it.  At each node the free predictors are searched from the most important one down, so good models are found early and the later branches, which leave out the important predictors, are pruned.  Ties are broken as in best_subsets.
+
+    Arguments:
+    products -- CrossProducts object
+    sizes -- numbers of predictors to find models for
+    top -- number of models to keep for each size
+
+    Returns:
+    dictionary from each size to a list of (position, predictors, rsquared_adj) tuples in the format of best_subsets, and the number of models evaluated
+    """
+    p = len(products.features)
+    sizes = set(sizes)
+    max_size = max(sizes)
+    best = {k: [] for k in sizes}
+    evaluated = 0
+
+    def pruned(n_included, n_free, rank, bound_rss, drop_increase):
+        # rank is the rank of the node's model, or None when the bound model has full rank, so that every model
+        # below the node has full rank too.  drop_increase holds the RSS increases of the free predictors in
+        # ascending order, or None when they do not give a bound.
+        for k in sizes:
+            dropped = n_included + n_free - k
+            if dropped < 0 or k <= n_included:
+                continue
+            rss = bound_rss + (drop_increase[dropped - 1] if dropped > 0 and drop_increase is not None else 0.0)
+            if len(best[k]) < top or best[k][-1][2] <= float(products.rsquared_adj(rss, k if rank is None else rank)):
+                return False
+        return True
+
+    def visit(included, rank, free, free_importance):
+        nonlocal evaluated
+        free = [free[i] for i in np.argsort(-free_importance, kind="stable")]
+        n = len(free)
+        # Child j adds free[j] and may later add free[j + 1:]; its bound leaves out free[:j]
+        children = np.array([sorted(included + [c]) for c in free], dtype=np.intp)
+        child_rss, child_rank = products.rss(children)
+        bounds = np.array([sorted(included + free[j:]) + [0] * j for j in range(n)], dtype=np.intp)
+        bound_lengths = np.array([len(included) + n - j for j in range(n)])
+        bound_rss, bound_rank = products.rss(bounds, lengths=bound_lengths)
+        evaluated += 2 * n
+        k = len(included) + 1
+        if k in sizes:
+            for j in range(n):
+                combo = tuple(int(c) for c in children[j])
+                adj = float(products.rsquared_adj(child_rss[j], child_rank[j]))
+                best[k] = sorted(best[k] + [(combination_position(combo, p), combo, adj)], key=lambda model: (-model[2], model[0]))[:top]
+        if k >= max_size:
+            return
+        for j in range(n - 1):
+            child_free = free[j + 1:]
+            full_rank = bound_rank[j] == bound_lengths[j]
+            if pruned(k, len(child_free), None if full_rank else child_rank[j], bound_rss[j], None):
+                continue
+            child = included + [free[j]]
+            child_importance = products.importance(child + child_free)[k:]
+            # The drop-one increases only bound the RSS of smaller models when the bound model has full rank
+            if full_rank and pruned(k, len(child_free), None, bound_rss[j], np.sort(child_importance)):
+                continue
+            visit(child, int(child_rank[j]), child_free, child_importance)
+
+    visit([], 0, list(range(p)), products.importance(list(range(p))))
+    return best, evaluated
+
+
+class StepwiseData:
+    """Numeric copy of the candidate predictors and the dependent variable used by the QR stepwise engine."""
+
+    def __init__(self, y, df, features):
+        """Arguments:
+        y -- column name of the dependent variable; provide a string
+        df -- Pandas dataframe with numeric columns and no missing values
+        features -- column names of the candidate independent variables; provide a list of strings
+        """
+        self.features = list(features)
+        self.positions = {feature: i for i, feature in enumerate(self.features)}
+        self.x = df[self.features].to_numpy(dtype=np.float64)
+        self.y = df[y].to_numpy(dtype=np.float64)
+        self.n = self.x.shape[0]
+
+
+class QRModel:
+    """Least squares fit of a model with an intercept and some of the predictors of a StepwiseData object, kept as the Q factor of its design matrix so that candidate predictors can be tested against it without a refit.  The p-values are the two-sided t-test p-values that statsmodels reports, except that they are all 0 for a model that fits y exactly (see is_collinear)."""
+
+    def __init__(self, data, predictors):
+        """Arguments:
+        data -- StepwiseData object
+        predictors -- names of the predictors in the model
+        """
+        self.data = data
+        self.predictors = list(predictors)
+        design = np.column_stack([np.ones(data.n)] + [data.x[:, data.positions[p]] for p in predictors])
+        q, r = np.linalg.qr(design)
+        diagonal = np.abs(np.diag(r))
+        if (diagonal <= SINGULAR_PIVOT * diagonal.max()).any():
+            # Collinear predictors are fit with the pseudo-inverse, as statsmodels does
+            pinv = np.linalg.pinv(design)
+            coefficients = pinv @ data.y
+            rank = np.linalg.matrix_rank(design)
+            unscaled = (pinv ** 2).sum(axis=1)
+            q = np.linalg.qr(design[:, np.abs(np.diag(r)) > SINGULAR_PIVOT * diagonal.max()])[0]
+        else:
+            coefficients = np.linalg.solve(r, q.T @ data.y)
+            rank = design.shape[1]
+            unscaled = (np.linalg.inv(r) ** 2).sum(axis=1)
+        self.q = q
+        self.resid = data.y - design @ coefficients
+        self.rss = float(self.resid @ self.resid)
+        self.df_resid = data.n - rank
+        y = data.y
+        if is_collinear(self.rss, ((y - y.mean()) ** 2).sum(), (y ** 2).sum()):
+            # The model fits y exactly, so the t-tests are undefined; a p-value of 0 keeps every predictor in the model
+            self.pvalues = np.zeros(design.shape[1])
+        else:
+            self.pvalues = t_pvalues(coefficients / np.sqrt(self.rss / self.df_resid * unscaled), self.df_resid)
+
+    def candidate_pvalues(self, candidates):
+        """Returns the p-value that each candidate predictor would have if it were added to the model on its own.  By the Frisch-Waugh-Lovell theorem, the t-statistic only needs the part of the candidate that the model does not explain, which costs O(n p) per candidate instead of a refit.
+
+        Arguments:
+        candidates -- names of the candidate predictors
+
+        Returns:
+        NumPy array with one p-value per candidate; NaN for a candidate that is collinear with the model (see is_collinear) and for every candidate once the model fits y exactly
+        """
+        if not candidates:
+            return np.empty(0)
+        y = self.data.y
+        if is_collinear(self.rss, ((y - y.mean()) ** 2).sum(), (y ** 2).sum()):
+            # The model fits the dependent variable exactly, so the candidates have no t-test
+            return np.full(len(candidates), np.nan)
+        x = self.data.x[:, [self.data.positions[c] for c in candidates]]
+        residual = x - self.q @ (self.q.T @ x)
+        ss = (residual ** 2).sum(axis=0)
+        centered_ss = ((x - x.mean(axis=0)) ** 2).sum(axis=0)
+        cross = residual.T @ self.resid
+        collinear = is_collinear(ss, centered_ss, (x ** 2).sum(axis=0))
+        ss = np.where(collinear, 1.0, ss)
+        df_resid = self.df_resid - 1
+        rss = self.rss - cross ** 2 / ss
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pvalues = t_pvalues((cross / ss) / np.sqrt(rss / df_resid / ss), df_resid)
+        # A candidate that makes the fit exact explains all that is left of y; one that the model already explains
+        # would make the design singular, so it is not tested
+        pvalues[is_collinear(rss, ((y - y.mean()) ** 2).sum(), (y ** 2).sum())] = 0.0
+        pvalues[collinear] = np.nan
+        return pvalues
+
+
+def is_collinear(residual_ss, centered_ss, total_ss):
+    """Returns True where a candidate column is explained by the columns of a model with an intercept, so that adding it would make the model singular: the column is constant (its sum of squares about the mean is at most SINGULAR_PIVOT times its sum of squares), or its residual sum of squares after the regression on the model is at most SINGULAR_PIVOT times its sum of squares about the mean.  The stepwise engines skip the candidates it finds when they are run with skip_collinear, and otherwise fit them with a formula model, as statsmodels handles singular designs.
+
+    Arguments:
+    residual_ss -- residual sum of squares of each candidate after the regression on the model
+    centered_ss -- sum of squares of each candidate about its mean
+    total_ss -- sum of squares of each candidate
+
+    Returns:
+    NumPy array of booleans
+    """
+    residual_ss, centered_ss, total_ss = (np.asarray(values, dtype=np.float64) for values in (residual_ss, centered_ss, total_ss))
+    return (centered_ss <= SINGULAR_PIVOT * total_ss) | (residual_ss <= SINGULAR_PIVOT * centered_ss)
+
+
+def collinear_columns(design, columns):
+    """Applies is_collinear to the columns of a candidate matrix against a design matrix that includes an intercept column.
+
+    Arguments:
+    design -- NumPy array with the columns of the model
+    columns -- NumPy array with one column per candidate
+
+    Returns:
+    NumPy array of booleans, one per candidate
+    """
+    columns = np.asarray(columns, dtype=np.float64).reshape(design.shape[0], -1)
+    residual = columns - design @ np.linalg.lstsq(design, columns, rcond=None)[0]
+    return is_collinear((residual ** 2).sum(axis=0), ((columns - columns.mean(axis=0)) ** 2).sum(axis=0), (columns ** 2).sum(axis=0))
+
+
+def t_pvalues(tvalues, df_resid):
+    """Returns the two-sided p-values of t-statistics with df_resid degrees of freedom."""
+    return stats.t.sf(np.abs(tvalues), df_resid) * 2
+
+
+def simple_regressions(y, df, features):
+    """Computes the simple linear regression of y on each of the features in one pass with NumPy, using the closed forms for a single predictor: R-squared is the squared correlation, F = t^2 has (1, n - 2) degrees of freedom, and t is the slope over its standard error.  As in the formula fits, each regression only uses the rows where y and its feature are both present.
+
+    Arguments:
+    y -- column name of the dependent variable; provide a string
+    df -- Pandas dataframe with a numeric dependent variable and numeric features
+    features -- column names of the independent variables; provide a list of strings
+
+    Returns:
+    Pandas dataframe indexed by feature with the R-sqr, F-statistic, F-stat p-value, t-test, and t-test p-value columns of linear_regression, unrounded
+    """
+    x = df[features].to_numpy(dtype=np.float64, na_value=np.nan)
+    y_values = df[y].to_numpy(dtype=np.float64, na_value=np.nan)[:, None]
+    present = ~np.isnan(x) & ~np.isnan(y_values)
+    n = present.sum(axis=0)
+    x = np.where(present, x, 0.0)
+    y_values = np.where(present, y_values, 0.0)
+    x = np.where(present, x - x.sum(axis=0) / n, 0.0)
+    y_values = np.where(present, y_values - y_values.sum(axis=0) / n, 0.0)
+    return simple_regression_table(features, n, (x ** 2).sum(axis=0), (y_values ** 2).sum(axis=0), (x * y_values).sum(axis=0))
+
+
+def simple_regression_table(features, n, sxx, syy, sxy):
+    """Returns the results table of simple_regressions from the number of rows and the centered sums of squares and cross-products of each regression.
+
+    Arguments:
+    features -- column names of the independent variables
+    n -- NumPy array with the number of rows used by each regression
+    sxx -- NumPy array with the centered sum of squares of each feature
+    syy -- NumPy array with the centered sum of squares of y over the rows of each regression
+    sxy -- NumPy array with the centered cross-product of each feature and y
+
+    Returns:
+    Pandas dataframe in the format of simple_regressions
+    """
+    df_resid = n - 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rss = syy - sxy ** 2 / sxx
+        rsquared = 1 - rss / syy
+        tvalues = (sxy / sxx) / np.sqrt(rss / df_resid / sxx)
+        fvalues = (syy - rss) / (rss / df_resid)
+    return pd.DataFrame({
+        "R-sqr": rsquared,
+        "F-statistic": fvalues,
+        "F-stat p-value": stats.f.sf(fvalues, 1, df_resid),
+        "t-test": tvalues,
+        "t-test p-value": t_pvalues(tvalues, df_resid),
+    }, index=features)
+
+
+def simple_residuals(y, df, features):
+    """Yields the fitted values and internally studentized residuals of the simple linear regression of y on each of the features, one feature at a time, in closed form.  The leverage of row i in a simple regression is 1/n + (x_i - mean(x))^2 / Sxx, so the studentized residuals e_i / (s * sqrt(1 - h_i)) need neither a statsmodels fit nor its full influence computation.  As in the formula fits, each regression only uses the rows where y and its feature are both present.
+
+    Arguments:
+    y -- column name of the dependent variable; provide a string
+    df -- Pandas dataframe with a numeric dependent variable and numeric features
+    features -- column names of the independent variables; provide a list of strings
+
+    Returns:
+    generator of (feature, x, y, fitted values, studentized residuals) tuples of NumPy arrays over the rows used by each regression
+    """
+    y_all = df[y].to_numpy(dtype=np.float64, na_value=np.nan)
+    for feat in features:
+        x_all = df[feat].to_numpy(dtype=np.float64, na_value=np.nan)
+        present = ~np.isnan(x_all) & ~np.isnan(y_all)
+        x, y_values = x_all[present], y_all[present]
+        n = len(x)
+        x_centered = x - x.mean()
+        sxx = (x_centered ** 2).sum()
+        slope = (x_centered * (y_values - y_values.mean())).sum() / sxx
+        fitted = y_values.mean() + slope * x_centered
+        resid = y_values - fitted
+        scale = (resid ** 2).sum() / (n - 2)
+        leverage = 1 / n + x_centered ** 2 / sxx
+        with np.errstate(divide="ignore", invalid="ignore"):
+            studentized = resid / np.sqrt(scale * (1 - leverage))
+        yield feat, x, y_values, fitted, studentized
+
+
+class SufficientStats:
+    """Running count, sums, and cross-products of the numeric columns of a dataset, accumulated one chunk at a time.  They are all that ordinary least squares needs, so any linear regression on the columns can be fit without holding the rows in memory.  The values are shifted by the means of the first chunk before they are summed, which keeps the cross-products accurate for columns with large means.  The count, sums, and cross-products used for the models with several predictors skip the rows with a missing value in any of the columns.  The simple regressions instead use the rows where both of their columns are present, as the formula fits do, from counts, sums, and cross-products accumulated for every pair of columns."""
+
+    def __init__(self, columns):
+        """Arguments:
+        columns -- names of the numeric columns to accumulate
+        """
+        self.columns = list(columns)
+        self.positions = {column: i for i, column in enumerate(self.columns)}
+        self.n = 0
+        self.shift = None
+        self.sums = np.zeros(len(self.columns))
+        self.products = np.zeros((len(self.columns), len(self.columns)))
+        # Entry [i, j] of the pair statistics covers the rows where columns i and j are both present
+        self.pair_n = np.zeros((len(self.columns), len(self.columns)))
+        self.pair_sums = np.zeros((len(self.columns), len(self.columns)))
+        self.pair_squares = np.zeros((len(self.columns), len(self.columns)))
+        self.pair_products = np.zeros((len(self.columns), len(self.columns)))
+
+    def update(self, chunk):
+        """Adds the rows of a Pandas dataframe chunk to the statistics."""
+        values = chunk[self.columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        present = ~np.isnan(values)
+        if self.shift is None:
+            if not present.any():
+                return
+            count = present.sum(axis=0)
+            self.shift = np.where(present, values, 0.0).sum(axis=0) / np.maximum(count, 1)
+        values = np.where(present, values - self.shift, 0.0)
+        weights = present.astype(np.float64)
+        self.pair_n += weights.T @ weights
+        self.pair_sums += values.T @ weights
+        self.pair_squares += (values ** 2).T @ weights
+        self.pair_products += values.T @ values
+        values = values[present.all(axis=1)]
+        if values.shape[0] == 0:
+            return
+        self.n += values.shape[0]
+        self.sums += values.sum(axis=0)
+        self.products += values.T @ values
+
+    def means(self):
+        """Returns the mean of each column."""
+        return self.shift + self.sums / self.n
+
+    def centered(self):
+        """Returns the matrix of centered cross-products of the columns."""
+        offset = self.sums / self.n
+        return self.products - self.n * np.outer(offset, offset)
+
+    def simple_regressions(self, y, features):
+        """Returns the results table of the simple linear regression of y on each of the features, in the format of simple_regressions; each regression uses the rows where y and its feature are both present."""
+        x = [self.positions[f] for f in features]
+        j = self.positions[y]
+        n = self.pair_n[x, j]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sum_x = self.pair_sums[x, j]
+            sum_y = self.pair_sums[j, x]
+            sxx = self.pair_squares[x, j] - sum_x ** 2 / n
+            syy = self.pair_squares[j, x] - sum_y ** 2 / n
+            sxy = self.pair_products[x, j] - sum_x * sum_y / n
+        return simple_regression_table(list(features), n, sxx, syy, sxy)
+
+    def cross_products(self, y, features):
+        """Returns the CrossProducts object of the provided dependent variable and features, as cross_products would compute it from the full dataframe."""
+        centered = self.centered()
+        x = [self.positions[f] for f in features]
+        return CrossProducts(features, self.n, centered[np.ix_(x, x)], centered[x, self.positions[y]], centered[self.positions[y], self.positions[y]])
+
+    def collinear(self, predictors, candidates):
+        """Applies is_collinear to candidate columns against a model with an intercept and the provided predictors.  The residual sums of squares come from the centered cross-products, scaled to unit diagonal, so this is a rank check on the Gram matrix rather than on the rows.
+
+        Arguments:
+        predictors -- column names of the independent variables of the model
+        candidates -- column names of the candidate independent variables
+
+        Returns:
+        NumPy array of booleans, one per candidate
+        """
+        centered = self.centered()
+        scale = np.sqrt(np.maximum(np.diag(centered), 0))
+        scale[scale == 0] = 1.0
+        scaled = centered / np.outer(scale, scale)
+        x = [self.positions[p] for p in predictors]
+        c = [self.positions[p] for p in candidates]
+        centered_ss = np.diag(scaled)[c]
+        explained = np.zeros(len(c))
+        if x:
+            sxc = scaled[np.ix_(x, c)]
+            explained = (sxc * (np.linalg.pinv(scaled[np.ix_(x, x)]) @ sxc)).sum(axis=0)
+        total_ss = np.diag(centered)[c] + self.n * self.means()[c] ** 2
+        return is_collinear(centered_ss - explained, centered_ss, total_ss / scale[c] ** 2)
+
+
+def accumulate_stats(chunks):
+    """Accumulates the SufficientStats of the numeric columns of a dataset given as an iterable of dataframe chunks; the numeric columns are taken from the first chunk."""
+    sufficient = None
+    for chunk in chunks:
+        if sufficient is None:
+            sufficient = SufficientStats([col for col in chunk.columns if pd.api.types.is_numeric_dtype(chunk[col]) and not pd.api.types.is_bool_dtype(chunk[col])])
+        sufficient.update(chunk)
+    return sufficient
+
+
+class StatsFit:
+    """Ordinary least squares fit with an intercept computed from SufficientStats.  The attributes have the names and meaning of the statsmodels RegressionResults attributes of the same model, and the coefficients are indexed like those of a formula model."""
+
+    def __init__(self, sufficient, y, predictors):
+        """Arguments:
+        sufficient -- SufficientStats object
+        y -- column name of the dependent variable; provide a string
+        predictors -- column names of the independent variables; provide a list of strings
+        """
+        predictors = list(predictors)
+        centered = sufficient.centered()
+        means = sufficient.means()
+        x = [sufficient.positions[p] for p in predictors]
+        j = sufficient.positions[y]
+        sxx = centered[np.ix_(x, x)]
+        sxy = centered[x, j]
+        syy = centered[j, j]
+        scale = np.sqrt(np.diag(sxx))
+        scale[scale == 0] = 1.0
+        # The pseudo-inverse of the scaled matrix equals the inverse unless the predictors are collinear
+        scaled = sxx / np.outer(scale, scale)
+        inverse = np.linalg.pinv(scaled) / np.outer(scale, scale)
+        rank = np.linalg.matrix_rank(scaled) if predictors else 0
+        slopes = inverse @ sxy
+        intercept = means[j] - means[x] @ slopes
+        self.nobs = sufficient.n
+        self.ssr = float(syy - slopes @ sxy)
+        self.centered_tss = float(syy)
+        self.df_model = rank
+        self.df_resid = sufficient.n - rank - 1
+        scale2 = self.ssr / self.df_resid
+        intercept_var = scale2 * (1 / sufficient.n + means[x] @ inverse @ means[x])
+        names = ["Intercept"] + predictors
+        self.params = pd.Series(np.concatenate([[intercept], slopes]), index=names)
+        self.bse = pd.Series(np.sqrt(np.concatenate([[intercept_var], scale2 * np.diag(inverse)])), index=names)
+        self.tvalues = self.params / self.bse
+        self.pvalues = pd.Series(t_pvalues(self.tvalues.to_numpy(), self.df_resid), index=names)
+        self.rsquared = 1 - self.ssr / self.centered_tss
+        self.rsquared_adj = 1 - (self.ssr / self.centered_tss) * (sufficient.n - 1) / self.df_resid
+        self.fvalue = (self.centered_tss - self.ssr) / rank / scale2 if rank else np.nan
+        self.f_pvalue = stats.f.sf(self.fvalue, rank, self.df_resid) if rank else np.nan
@@ -4,18 +4,140 @@ import itertools
 import time
 import statsmodels.api as sm
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import seaborn as sns
 import scipy as sp
 import logging
+import os
+import hashlib
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import src.regression.pp_regression_engine as engine
+import src.data.pp_cache_stats as cache_stats
 
 
-def linear_regression(y, df, exclude):
-    """Generates a simple linear regression model for the provided dependent variable and each independent variable in the provided dataframe, but not included in the exclude list.  Prints the summary of each model and returns a dataframe containing model information.
+class ModelCache(cache_stats.CacheStats):
+    """Least recently used cache of fitted formula models that can be passed to the regression procedures, so that a model that is needed again in the same session (for example a stepwise winner that is also a best subsets winner, or the model behind a diagnostic plot) is only fit once.  Models are keyed on a fingerprint of the dataframe contents, the dependent variable, and the independent variables in the requested order, so a cached model is the same as a new fit; a model with the predictors in another order is fit separately, since the p-values of a singular model depend on the order of its columns.  The fingerprint of a dataframe is computed once, so dataframes should not be changed in place between calls.
+
+    Arguments:
+    maxsize -- maximum number of models to keep; each one holds its own copy of the design matrix
+    """
+
+    CACHE_NAME = "Model"
+
+    def __init__(self, maxsize=64):
+        super().__init__()
+        self.maxsize = maxsize
+        self.models = OrderedDict()
+        self.fingerprints = {}
+
+    def __len__(self):
+        return len(self.models)
+
+    def fingerprint(self, df):
+        """Returns a hash of the contents and column names of a dataframe, computed once per dataframe object."""
+        entry = self.fingerprints.get(id(df))
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+        digest = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+        digest.update(repr(list(df.columns)).encode())
+        self.register(df, digest.hexdigest())
+        return digest.hexdigest()
+
+    def register(self, df, digest):
+        """Records a known digest of a dataframe's contents as its fingerprint, so it is not hashed again (for example the digest that dataset_io.build_mmap_cache stores with a memory-mapped dataset).  The digest must change whenever the contents or column names do."""
+        self.fingerprints = {key: value for key, value in self.fingerprints.items() if value[0]() is not None}
+        self.fingerprints[id(df)] = (weakref.ref(df), digest)
+
+    def fit(self, y, feature_set, df):
+        """Returns the fitted formula model of y on the provided independent variables, fitting it only if it is not cached."""
+        key = (self.fingerprint(df), y, tuple(feature_set))
+        if key in self.models:
+            self.hits += 1
+            self.models.move_to_end(key)
+            return self.models[key]
+        self.misses += 1
+        model = fit_model(y, feature_set, df)
+        self.models[key] = model
+        if len(self.models) > self.maxsize:
+            self.models.popitem(last=False)
+        return model
+
+    def clear(self):
+        """Drops every cached model."""
+        self.models.clear()
+
+
+def fit_model(y, feature_set, df, cache=None):
+    """Returns the fitted formula model of y on the provided independent variables, from the provided ModelCache if there is one."""
+    if cache is not None:
+        return cache.fit(y, feature_set, df)
+    return sm.OLS.from_formula(str(y) + ' ~ ' + ' + '.join(list(feature_set)), df).fit()
+
+
+class ModelRecord:
+    """Compact record of a fitted formula model that is stored in the result tables instead of the statsmodels results, which hold the residuals, fitted values, and design matrix of the model.  The full results are fit again on demand (through the ModelCache the record was made with, if any) by the model attribute.  The results attributes listed in RESULTS_ATTRIBUTES, such as summary() or pvalues, are looked up on the refit results, so the record can be used like the results object for them; any other missing attribute raises an AttributeError without fitting the model.
+
+    Arguments:
+    y -- column name of the dependent variable
+    feature_set -- column names of the independent variables
+    df -- Pandas dataframe the model was fit on; the record keeps a reference to it, not a copy, so the dataframe stays in memory as long as a result table holding the record does
+    results -- fitted statsmodels results of the model
+    rss -- residual sum of squares of the model
+    cache -- optional ModelCache that the full results are fit through
+    """
+    __slots__ = ("y", "predictors", "df", "cache", "names", "coefficients", "standard_errors", "rss", "rsquared", "rsquared_adj")
+
+    # Attributes of the statsmodels results that are looked up on the refit model
+    RESULTS_ATTRIBUTES = frozenset(["summary", "pvalues", "tvalues", "conf_int", "fittedvalues", "resid", "predict", "get_influence",
+                                    "fvalue", "f_pvalue", "aic", "bic", "llf", "nobs", "df_model", "df_resid", "ssr", "mse_resid"])
+
+    def __init__(self, y, feature_set, df, results, rss, cache=None):
+        self.y = y
+        self.predictors = tuple(feature_set)
+        self.df = df
+        self.cache = cache
+        self.names = tuple(results.params.index)
+        self.coefficients = results.params.to_numpy()
+        self.standard_errors = results.bse.to_numpy()
+        self.rss = rss
+        self.rsquared = results.rsquared
+        self.rsquared_adj = results.rsquared_adj
+
+    @property
+    def params(self):
+        return pd.Series(self.coefficients, index=self.names)
+
+    @property
+    def bse(self):
+        return pd.Series(self.standard_errors, index=self.names)
+
+    @property
+    def model(self):
+        """Fitted statsmodels results of the model."""
+        return fit_model(self.y, self.predictors, self.df, self.cache)
+
+    def __getattr__(self, name):
+        # Only reached for attributes that are not stored in the record; probes such as hasattr or _repr_html_ must not fit the model
+        if name not in ModelRecord.RESULTS_ATTRIBUTES:
+            raise AttributeError("'ModelRecord' object has no attribute '{}'; use .model for the full statsmodels results".format(name))
+        return getattr(self.model, name)
+
+    def __repr__(self):
+        return "<ModelRecord {} ~ {}>".format(self.y, " + ".join(self.predictors))
+
+
+def linear_regression(y, df, exclude, summaries=True, cache=None):
+    """Generates a simple linear regression model for the provided dependent variable and each independent variable in the provided dataframe, but not included in the exclude list.  Prints the summary of each model and returns a dataframe containing model information.  The results of numeric independent variables are computed for all of them at once in closed form (see engine.simple_regressions), so statsmodels models are only fit for the summaries and for non-numeric variables.
 
     Arguments:
     y -- column name of the dependent variable; provide a string
     df -- Pandas dataframe that contains the data for the dependent and independent variables; provide a df
     exclude --  column name(s) to be excluded from the analysis; provide a list of strings or an empty list if there are no columns to exclude
+    summaries -- whether to print the statsmodels summary of each model; provide False to screen many columns quickly
+    cache -- optional ModelCache that stores the fitted formula models, so they are reused by later calls
 
     Returns:
     results_df -- Pandas dataframe that contains information about each model generated including the F-statistic, F-statistic p-value, t-test, t-test p-value, and R-squared value.
@@ -29,11 +151,17 @@ def linear_regression(y, df, exclude):
     logger.info("excluded features: {}".format(exclude_cols))
     logger.info("df shape: {}".format(df.shape))
     features = [col for col in df.columns if col not in exclude_cols]
+    numeric = [feat for feat in features if is_numeric_column(df[feat])] if is_numeric_column(df[y]) else []
+    screened = engine.simple_regressions(y, df, numeric)
     for feat in features:
+        if feat in screened.index:
+            results[feat] = [round(value, digits) for value, digits in zip(screened.loc[feat], [3, 1, 4, 2, 4])]
+            if not summaries:
+                continue
         logger.info("F is".format(feat))
-        str1 = "{0} ~ {1}".format(y, feat)
-        reg_model = sm.OLS.from_formula(str1, df).fit()
-        results[feat] = [round(reg_model.rsquared, 3), round(reg_model.fvalue, 1), round(reg_model.f_pvalue, 4), round(reg_model.tvalues[1], 2), round(reg_model.pvalues[1], 4)]
+        reg_model = fit_model(y, [feat], df, cache)
+        if feat not in screened.index:
+            results[feat] = [round(reg_model.rsquared, 3), round(reg_model.fvalue, 1), round(reg_model.f_pvalue, 4), round(reg_model.tvalues[1], 2), round(reg_model.pvalues[1], 4)]
         logger.info('X = {}'.format(feat.upper()))
         logger.info(reg_model.summary())
     results_df = pd.DataFrame.from_dict(results, columns=["R-sqr", "F-statistic", "F-stat p-value", 't-test', 't-test p-value'], orient='index')
@@ -41,7 +169,7 @@ def linear_regression(y, df, exclude):
     return results_df
 
 
-def lin_regr_diagnostic_plots(y, x, df):
+def lin_regr_diagnostic_plots(y, x, df, cache=None):
     """Generates diagnostic plots used to evaluate a simple linear regression model. The plots include a scatter plot
     of the independent variable vs the dependent variable to evaluate linearity, a scatter plot of the standardized
     residuals vs fitted values to evaluate error variance, and a probability plot to evaluate error normality.
@@ -50,54 +178,126 @@ def lin_regr_diagnostic_plots(y, x, df):
     y -- column name of the dependent variable; provide a string
     x -- column name of the independent variable; provide a string
     df -- Pandas dataframe that contains the data for the dependent and independent variables; provide a df
+    cache -- optional ModelCache that stores the fitted formula models, so they are reused by later calls
 
     Returns:
     None
     """
-    str1 = "{0} ~ {1}".format(y, x)
-    reg_model = sm.OLS.from_formula(str1, df).fit()
+    reg_model = fit_model(y, [x], df, cache)
     fit_values = pd.Series(reg_model.fittedvalues, name="fitted_values")
-    residuals = pd.Series(reg_model.resid, name="residuals")
     norm_residuals = pd.Series(reg_model.get_influence().resid_studentized_internal, name="Standardized Residual")
 
     fig = plt.figure(constrained_layout=True, figsize=(8,8))
+    draw_diagnostic_plots(fig, y, x, df[x], df[y], fit_values, norm_residuals)
+    return fig
+
+
+def draw_diagnostic_plots(fig, y, x, x_values, y_values, fit_values, norm_residuals):
+    """Draws the plots of lin_regr_diagnostic_plots on the provided figure.
+
+    Arguments:
+    fig -- matplotlib figure to draw on
+    y -- column name of the dependent variable; provide a string
+    x -- column name of the independent variable; provide a string
+    x_values -- values of the independent variable
+    y_values -- values of the dependent variable
+    fit_values -- fitted values of the model
+    norm_residuals -- internally studentized residuals of the model
+
+    Returns:
+    None
+    """
     gs = fig.add_gridspec(2, 2)
     ax1 = fig.add_subplot(gs[0, 0])
     ax1.set_title("Regression plot")
-    sns.regplot(x, y, df, line_kws={'color':'r'}, ci=None, ax=ax1)
+    sns.regplot(x=np.asarray(x_values), y=np.asarray(y_values), line_kws={'color':'r'}, ci=None, ax=ax1)
+    ax1.set_xlabel(x)
+    ax1.set_ylabel(y)
     ax2 = fig.add_subplot(gs[1, 0])
     ax2.set_title("Standardized residuals vs Fit plot")
-    sns.regplot(fit_values, norm_residuals, line_kws={'color':'r'}, ci=None, ax=ax2)
+    sns.regplot(x=np.asarray(fit_values), y=np.asarray(norm_residuals), line_kws={'color':'r'}, ci=None, ax=ax2)
+    ax2.set_xlabel("fitted_values")
+    ax2.set_ylabel("Standardized Residual")
     ax3 = fig.add_subplot(gs[0:, -1])
     sp.stats.probplot(norm_residuals, plot=ax3, fit=True)
-    fig.suptitle('y = {}, x = {}'.format(y, x, df), fontsize=14)
+    fig.suptitle('y = {}, x = {}'.format(y, x), fontsize=14)
 
-    return fig
+
+def save_diagnostic_plots(task):
+    """Draws the diagnostic plots of one simple linear regression on an Agg figure that is not registered with pyplot, saves it, and returns the path of the file.  The figure is freed when the function returns, so batches of plots do not accumulate in memory.
+
+    Arguments:
+    task -- (y, x, x values, y values, fitted values, studentized residuals, path of the .png file) tuple
+
+    Returns:
+    path of the saved file
+    """
+    y, x, x_values, y_values, fit_values, norm_residuals, path = task
+    fig = Figure(constrained_layout=True, figsize=(8,8))
+    FigureCanvasAgg(fig)
+    draw_diagnostic_plots(fig, y, x, x_values, y_values, fit_values, norm_residuals)
+    fig.savefig(path)
+    fig.clear()
+    return path
+
+
+def batch_diagnostic_plots(y, df, features, directory, workers=1):
+    """Saves the diagnostic plots of lin_regr_diagnostic_plots for the simple linear regression of y on each of the provided features, one .png file per feature named <y>_<x>_diagnostics.png.  The fitted values and studentized residuals are computed in closed form (see engine.simple_residuals) instead of fitting a model per feature, and the figures are drawn with the Agg backend, in a process pool when workers > 1.  The tasks are built one feature at a time and at most two per worker are queued, so only a few features' arrays are in memory at once however wide the dataframe is.  Features that are not numeric are skipped.
+
+    Arguments:
+    y -- column name of the dependent variable; provide a string
+    df -- Pandas dataframe that contains the data for the dependent and independent variables; provide a df
+    features -- column names of the independent variables; provide a list of strings
+    directory -- directory the plots are saved in; it is created if it does not exist
+    workers -- number of processes used to draw the plots
+
+    Returns:
+    list of the paths of the saved files
+    """
+    logger = logging.getLogger("thelogger")
+    numeric = [feat for feat in features if is_numeric_column(df[feat])]
+    skipped = [feat for feat in features if feat not in numeric]
+    if skipped:
+        logger.info("Skipped the diagnostic plots of non-numeric columns: {}".format(skipped))
+    os.makedirs(directory, exist_ok=True)
+    tasks = ((y, feat, x_values, y_values, fit_values, norm_residuals, os.path.join(directory, "{}_{}_diagnostics.png".format(y, feat)))
+             for feat, x_values, y_values, fit_values, norm_residuals in engine.simple_residuals(y, df, numeric))
+    if workers > 1:
+        paths = []
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for task in tasks:
+                if len(pending) >= 2 * workers:
+                    paths.append(pending.popleft().result())
+                pending.append(pool.submit(save_diagnostic_plots, task))
+            paths.extend(future.result() for future in pending)
+    else:
+        paths = [save_diagnostic_plots(task) for task in tasks]
+    logger.info("Saved {} diagnostic plots in {}. \n".format(len(paths), directory))
+    return paths
 
 
 # These functions implement the "best subsets" regression procedure
-def process_subset(y, feature_set, df):
+def process_subset(y, feature_set, df, cache=None):
     """Generates a linear regression model and returns the number of independent variables it contains, the
-    names of the independent variables, the model, and the model's RSS value, R-squared value, and R-squared-adjusted
-    value.
+    names of the independent variables, a ModelRecord of the model, and the model's RSS value, R-squared value, and
+    R-squared-adjusted value.
     """
-    str1 = str(y) + ' ~ ' + ' + '.join(list(feature_set))
-    model = sm.OLS.from_formula(str1, df)
-    regr = model.fit()
+    regr = fit_model(y, feature_set, df, cache)
     RSS = ((regr.predict(df[list(feature_set)]) - df[y]) ** 2).sum()
     R_squared = regr.rsquared
     R_squared_adj = regr.rsquared_adj
-    return {"num_predictors": len(feature_set), "predictors": feature_set, "RSS": RSS, "rsquared": R_squared, "rsquared_adj": R_squared_adj, "model":regr}
+    return {"num_predictors": len(feature_set), "predictors": feature_set, "RSS": RSS, "rsquared": R_squared, "rsquared_adj": R_squared_adj, "model": ModelRecord(y, feature_set, df, regr, RSS, cache)}
 
 
-def get_best(y, df, features, k):
+def get_best(y, df, features, k, cache=None):
     """Generates all possible combinations of independent variables, generates linear regression models using the
     variable combinations and returns those with the highest R-squared-adjusted values.
     """
     results = []
     for combo in itertools.combinations(features, k):
         #print("combo:", combo)
-        inv_results = process_subset(y, combo, df)
+        inv_results = process_subset(y, combo, df, cache)
         #print("results:", inv_results["rsquared_adj"])
         results.append(inv_results)
     models = pd.DataFrame(results)
@@ -106,7 +306,56 @@ def get_best(y, df, features, k):
     return best_model
 
 
-def subset_linear_regression(y, df, exclude):
+def get_best_gram(y, df, features, k, products=None, executor=None, workers=1, cache=None):
+    """Same as get_best, but scores every combination of independent variables from the cross-products of the data instead of fitting a formula model for each one.  Only the two models that are returned are fit with statsmodels.
+
+    Arguments:
+    y -- column name of the dependent variable; provide a string
+    df -- Pandas dataframe with numeric columns and no missing values
+    features -- column names of the candidate independent variables; provide a list of strings
+    k -- number of independent variables in each model
+    products -- optional CrossProducts object for y and features, so it can be shared between calls
+    executor -- optional ProcessPoolExecutor that evaluates the combinations in parallel (see engine.best_subsets)
+    workers -- number of processes of the executor
+    cache -- optional ModelCache that stores the fitted formula models, so they are reused by later calls
+
+    Returns:
+    best_model -- Pandas dataframe with the same rows, index, and columns as the one returned by get_best
+    """
+    if products is None:
+        products = engine.cross_products(y, df, features)
+    return best_models_frame(y, df, features, engine.best_subsets(products, k, top=2, executor=executor, workers=workers), cache)
+
+
+def best_models_frame(y, df, features, best, cache=None):
+    """Fits the models chosen by the cross-products engine with statsmodels and returns them in the format of get_best.
+
+    Arguments:
+    y -- column name of the dependent variable; provide a string
+    df -- Pandas dataframe that contains the data for the dependent and independent variables; provide a df
+    features -- column names of the candidate independent variables, in the order used by the engine
+    best -- list of (position, predictors, rsquared_adj) tuples as returned by engine.best_subsets
+    cache -- optional ModelCache that stores the fitted formula models, so they are reused by later calls
+
+    Returns:
+    Pandas dataframe indexed by the position of each combination
+    """
+    results = [process_subset(y, tuple(features[i] for i in combo), df, cache) for _, combo, _ in best]
+    return pd.DataFrame(results, index=[position for position, _, _ in best])
+
+
+def is_numeric_column(values):
+    """Returns True if a column enters a formula model as a single numeric variable rather than as categories."""
+    return pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+
+
+def can_use_gram(y, df, features):
+    """Returns True if the cross-products engine gives the same models as the formula fits: every column is numeric and there are no missing values, so every model is fit on the same rows."""
+    data = df[[y] + list(features)]
+    return all(is_numeric_column(data[col]) for col in data.columns) and not data.isna().any().any()
+
+
+def subset_linear_regression(y, df, exclude, method="gram", workers=1, cache=None):
     """Generates regression models using all possible combinations of independent variables, then chooses the models with the highest R-squared-adj values.
 
     Arguments:
@@ -114,6 +363,14 @@ def subset_linear_regression(y, df, exclude):
     df -- Pandas dataframe that contains the data for the dependent and independent variables; provide a df
     exclude --  column name(s) to be excluded from the analysis; provide a list of strings or an empty list if
         there are no columns to exclude
+    method -- "gram" scores the combinations from the cross-products of the data (see get_best_gram), "leaps" finds the
+        same models with a branch-and-bound search that skips most of the combinations (see
+        engine.leaps_and_bounds), and "formula" fits a formula model for each one (see get_best).  The formula fits
+        are used when the data has missing values or non-numeric columns, since the models could then be fit on
+        different rows.  Use "leaps" for more than about 20 independent variables.
+    workers -- number of processes that evaluate the combinations with the "gram" method; provide 1 to evaluate them in
+        the current process
+    cache -- optional ModelCache that stores the fitted formula models, so they are reused by later calls
 
     Returns:
     models -- Pandas dataframe that contains information about the two (or one) model(s) with the highest R-squared adj
@@ -128,39 +385,59 @@ def subset_linear_regression(y, df, exclude):
     exclude_cols.append(y)
     exclude_cols.extend(exclude)
     features = [f for f in df.columns if f not in exclude_cols]
-    for i in range(1, len(features)):
-        #print("i:", i)
-        models = pd.concat([models, get_best(y, df, features, i)], sort=True)
+    if method not in ("gram", "leaps", "formula"):
+        raise ValueError("Unknown best subsets method: {}".format(method))
+    logger = logging.getLogger("thelogger")
+    if method != "formula" and not can_use_gram(y, df, features):
+        logger.info("The data has missing values or non-numeric columns, so every subset will be fit with a formula model. \n")
+        method = "formula"
+    products = engine.cross_products(y, df, features) if method != "formula" else None
+    if method == "leaps":
+        sizes = range(1, len(features))
+        if len(sizes) == 0:
+            return models
+        best, evaluated = engine.leaps_and_bounds(products, sizes, top=2)
+        logger.info("The branch-and-bound search evaluated {} of the {} possible models. \n".format(evaluated, 2 ** len(features) - 2))
+        for i in sizes:
+            models = pd.concat([models, best_models_frame(y, df, features, best[i], cache)], sort=True)
+        return models
+    executor = ProcessPoolExecutor(max_workers=workers) if method == "gram" and workers > 1 else None
+    try:
+        for i in range(1, len(features)):
+            #print("i:", i)
+            if method == "gram":
+                best = get_best_gram(y, df, features, i, products, executor, workers, cache)
+            else:
+                best = get_best(y, df, features, i, cache)
+            models = pd.concat([models, best], sort=True)
+    finally:
+        if executor is not None:
+            executor.shutdown()
     return models
 
 
 # These functions implement the "forward stepwise" regression procedure
-def process_subset_ttest(y, feature_set, df):
+def process_subset_ttest(y, feature_set, df, cache=None):
     """Generates a linear regression model and returns the t-test p-values for all the included independent variables.
     """
-    str1 = str(y) + ' ~ ' + ' + '.join(list(feature_set))
-    model = sm.OLS.from_formula(str1, df)
-    regr = model.fit()
-    summary = regr.summary().tables[1]
+    regr = fit_model(y, feature_set, df, cache)
     pvals = regr.pvalues
     results_series = pd.Series(pvals)
     #print(results_series)
     return results_series
 
 
-def process_best_model(y, feature_set, df):
-    """Generates a linear regression model and returns the number of independent variables it contains, the names of the independent variables, the model, and the model's RSS value, R-squared value, and R-squared-adjusted value.
+def process_best_model(y, feature_set, df, cache=None):
+    """Generates a linear regression model and returns the number of independent variables it contains, the names of the independent variables, a ModelRecord of the model, and the model's RSS value, R-squared value, and R-squared-adjusted value.
     """
-    str1 = str(y) + ' ~ ' + ' + '.join(list(feature_set))
-    model = sm.OLS.from_formula(str1, df)
-    regr = model.fit()
+    regr = fit_model(y, feature_set, df, cache)
     RSS = ((regr.predict(df[list(feature_set)]) - df[y]) ** 2).sum()
     R_squared = regr.rsquared
     R_squared_adj = regr.rsquared_adj
-    return {"num_predictors": len(feature_set), "predictors": feature_set, "RSS": RSS, "rsquared": R_squared, "rsquared_adj": R_squared_adj, "model":regr}
+    return {"num_predictors": len(feature_set), "predictors": feature_set, "RSS": RSS, "rsquared": R_squared, "rsquared_adj": R_squared_adj, "model": ModelRecord(y, feature_set, df, regr, RSS, cache)}
 
 
-def forward_stepwise(y, predictors, y_and_exclude, df):
+def forward_stepwise(y, predictors, y_and_exclude, df, cache=None):
     """Takes the existing regression model and adds each remaining independent variable to it one at a time.  Compares the t-test p-values of new models and identifies the lowest t-test p-value.  If all variables are below the
     0.15 signficance level, the included predictors are returned.  If the t-test p-values any of the previously included variables now fall below the 0.15 level, they are removed and the remaining predictors are returned.
     """
@@ -169,7 +446,7 @@ def forward_stepwise(y, predictors, y_and_exclude, df):
     results = []
     for p in remaining_predictors:
         #print("p:", p)
-        results.append(process_subset_ttest(y, (predictors + [p]), df))
+        results.append(process_subset_ttest(y, (predictors + [p]), df, cache))
         # results is a list of pd Series
     #print("results:", results)
     low_pvalue = 0.15
@@ -199,13 +476,112 @@ def forward_stepwise(y, predictors, y_and_exclude, df):
     return(new_predictors)
 
 
-def stepwise_linear_regression(y, df, exclude):
+def forward_stepwise_skip_collinear(y, predictors, y_and_exclude, df, cache=None):
+    """Same as forward_stepwise, with the rules of stepwise_linear_regression(skip_collinear=True): candidates that the model already explains are skipped, p-values that only differ by rounding are ties (see best_candidate), and a new model that fits y exactly keeps every predictor and ends the search, since its t-tests are undefined.
+    """
+    remaining_predictors = [p for p in df.columns if p not in predictors and p not in y_and_exclude]
+    exact_fit = bool(predictors) and fits_exactly(fit_model(y, predictors, df, cache))
+    candidate_pvalues = []
+    for p in remaining_predictors:
+        candidate = fit_model(y, predictors + [p], df, cache)
+        if exact_fit or adds_collinear_column(candidate, p):
+            candidate_pvalues.append(np.nan)
+        elif fits_exactly(candidate):
+            candidate_pvalues.append(0.0)
+        else:
+            candidate_pvalues.append(process_subset_ttest(y, (predictors + [p]), df, cache).iloc[-1])
+    index_best = best_candidate(candidate_pvalues, skip_collinear=True)
+    if index_best is None:
+        return list(predictors)
+    new_model = predictors + [remaining_predictors[index_best]]
+    if fits_exactly(fit_model(y, new_model, df, cache)):
+        return new_model
+    return [index for index, value in process_subset_ttest(y, new_model, df, cache).iteritems() if index != "Intercept" and value < 0.15]
+
+
+def forward_stepwise_qr(y, predictors, y_and_exclude, df, data, skip_collinear=False, cache=None):
+    """Same as forward_stepwise, but tests the remaining independent variables against a QR factorization of the current model (see engine.QRModel) instead of fitting a formula model for each one.  Only the model with the chosen variable is fit again, to check the p-values of the variables already included.  The candidates whose QR p-values cannot be told apart from rounding noise, the ones that are collinear with the model and the ones within engine.PVALUE_RTOL of the lowest p-value, are fit with a formula model as in forward_stepwise, so both engines choose the same variable.
+
+    Arguments:
+    y -- column name of the dependent variable; provide a string
+    predictors -- independent variables in the current model; provide a list of strings
+    y_and_exclude -- column names that are not candidates; provide a list of strings
+    df -- Pandas dataframe that contains the data for the dependent and independent variables; provide a df
+    data -- engine.StepwiseData object for df
+    skip_collinear -- True applies the rules of forward_stepwise_skip_collinear instead of those of forward_stepwise
+    cache -- optional ModelCache that stores the fitted formula models, so they are reused by later calls
+
+    Returns:
+    list of the independent variables of the new model
+    """
+    remaining_predictors = [p for p in df.columns if p not in predictors and p not in y_and_exclude]
+    candidate_pvalues = engine.QRModel(data, predictors).candidate_pvalues(remaining_predictors)
+    if skip_collinear:
+        return choose_predictors(predictors, remaining_predictors, candidate_pvalues, lambda model: engine.QRModel(data, model).pvalues[1:], skip_collinear=True)
+    refit = np.isnan(candidate_pvalues)
+    for i in np.flatnonzero(refit):
+        candidate_pvalues[i] = process_subset_ttest(y, (predictors + [remaining_predictors[i]]), df, cache).iloc[-1]
+    if len(candidate_pvalues):
+        near_ties = ~refit & (candidate_pvalues <= candidate_pvalues.min() * (1 + engine.PVALUE_RTOL))
+        for i in np.flatnonzero(near_ties):
+            candidate_pvalues[i] = process_subset_ttest(y, (predictors + [remaining_predictors[i]]), df, cache).iloc[-1]
+    return choose_predictors(predictors, remaining_predictors, candidate_pvalues, lambda model: process_subset_ttest(y, model, df, cache).to_numpy()[1:])
+
+
+def adds_collinear_column(results, feature):
+    """Returns True if the design matrix columns of feature in a fitted formula model are explained by its other columns (see engine.is_collinear), so the model is singular."""
+    names = results.model.exog_names
+    new = [i for i, name in enumerate(names) if name == feature or name.startswith(feature + "[")]
+    others = [i for i in range(len(names)) if i not in new]
+    return bool(engine.collinear_columns(results.model.exog[:, others], results.model.exog[:, new]).any())
+
+
+def fits_exactly(results):
+    """Returns True if a fitted formula model explains its dependent variable exactly (see engine.is_collinear), so t-tests of further predictors are meaningless."""
+    return bool(engine.collinear_columns(results.model.exog, results.model.endog)[0])
+
+
+def best_candidate(candidate_pvalues, skip_collinear=False):
+    """Returns the position of the candidate with the lowest p-value below 0.15, or None if there is none.  The first candidate in column order wins ties, as in forward_stepwise; with skip_collinear, p-values within a relative difference of engine.PVALUE_RTOL of the lowest one are also ties, so models that fit equally well (for example end_weight with start_weight or with weight_diff) are chosen the same way by every stepwise engine.  Missing p-values, which mark skipped candidates, are never chosen."""
+    pvalues = np.asarray(candidate_pvalues, dtype=np.float64)
+    eligible = pvalues < 0.15
+    if not eligible.any():
+        return None
+    lowest = pvalues[eligible].min()
+    tolerance = engine.PVALUE_RTOL if skip_collinear else 0.0
+    return int(np.flatnonzero(eligible & (pvalues <= lowest * (1 + tolerance)))[0])
+
+
+def choose_predictors(predictors, remaining_predictors, candidate_pvalues, model_pvalues, skip_collinear=False):
+    """Applies the forward_stepwise rules to the p-values of the remaining independent variables: the one with the lowest p-value below 0.15 is added (see best_candidate), then the variables of the new model with a p-value of 0.15 or more are removed.  If no remaining variable is below 0.15, the current predictors are returned.
+
+    Arguments:
+    predictors -- independent variables in the current model; provide a list of strings
+    remaining_predictors -- candidate independent variables; provide a list of strings
+    candidate_pvalues -- p-value of each candidate when it is added to the current model, or NaN for a skipped candidate
+    model_pvalues -- function that returns the p-values of the independent variables of a model, without the intercept; with skip_collinear they must be 0 for a model that fits y exactly, so that every predictor is kept
+    skip_collinear -- True breaks near ties between p-values as forward_stepwise_skip_collinear does (see best_candidate)
+
+    Returns:
+    list of the independent variables of the new model
+    """
+    index_best = best_candidate(candidate_pvalues, skip_collinear)
+    if index_best is None:
+        return list(predictors)
+    new_model = predictors + [remaining_predictors[index_best]]
+    return [p for p, value in zip(new_model, model_pvalues(new_model)) if value < 0.15]
+
+
+def stepwise_linear_regression(y, df, exclude, method="qr", skip_collinear=False, cache=None):
     """First, individually evaluates independent variables in a linear regression model. The independent variable with the lowest t-test p-value becomes the starting model.  Then the remainder of the independent variables are individually added to the starting model.  If none have a significant t-test p-value then the process ends, but if one or many do, the one with the lowest t-test p-value is retained and a new starting model is established (after it is determined that the original independent variable still has a significant t-test p-value).  This process is repeated until no newly added independent variablies have a significant t-test p-value.  The best model from each step is returned.
 
     Arguments:
     y -- column name of the dependent variable; provide a string
     df -- Pandas dataframe that contains the data for the dependent and independent variables; provide a df
     exclude --  column name(s) to be excluded from the analysis; provide a list of strings or an empty list if there are no columns to exclude
+    method -- "qr" tests the candidates against a QR factorization of the current model (see forward_stepwise_qr) and "formula" fits a formula model for each one (see forward_stepwise).  The formula fits are used when the data has missing values or non-numeric columns.  Both methods return the same models.
+    skip_collinear -- True skips the candidates that are collinear with the model, treats p-values that only differ by rounding as ties (see best_candidate), and keeps every predictor of a model that fits y exactly (see forward_stepwise_skip_collinear).  This changes the models found on data with exactly collinear columns, such as start_weight, end_weight, and weight_diff; by default the procedure is unchanged and statsmodels fits such models with the pseudo-inverse.
+    cache -- optional ModelCache that stores the fitted formula models, so they are reused by later calls
 
     Returns:
     models_step -- Pandas dataframe that contains information about best model identified at each step of the process. The returned information includes the number of independent variables, the names of the independent variables, the model, and the model's RSS value, R-squared value, and R-squared-adjusted value.
@@ -215,10 +591,44 @@ def stepwise_linear_regression(y, df, exclude):
     y_and_exclude.extend(exclude)
     dep_var = df.shape[1] - len(y_and_exclude)
     #print(dep_var)
+    if method not in ("qr", "formula"):
+        raise ValueError("Unknown stepwise method: {}".format(method))
+    features = [p for p in df.columns if p not in y_and_exclude]
+    if method == "qr" and not can_use_gram(y, df, features):
+        logger = logging.getLogger("thelogger")
+        logger.info("The data has missing values or non-numeric columns, so every candidate will be fit with a formula model. \n")
+        method = "formula"
+    if method == "qr":
+        data = engine.StepwiseData(y, df, features)
+        forward = lambda predictors: forward_stepwise_qr(y, predictors, y_and_exclude, df, data, skip_collinear, cache)
+    elif skip_collinear:
+        forward = lambda predictors: forward_stepwise_skip_collinear(y, predictors, y_and_exclude, df, cache)
+    else:
+        forward = lambda predictors: forward_stepwise(y, predictors, y_and_exclude, df, cache)
+    best_models = []
+    for predictor_list in stepwise_steps(forward, dep_var):
+        #print("predictor_list:", predictor_list)
+        if predictor_list[-1] == None:
+            pass
+        else:
+            best_models.append(process_best_model(y, predictor_list, df, cache))
+    models_step = pd.DataFrame(best_models)
+    return models_step
+
+
+def stepwise_steps(forward, dep_var):
+    """Repeats a forward step until the predictors stop changing or all the independent variables are included.
+
+    Arguments:
+    forward -- function that takes the current list of predictors and returns the predictors of the next model
+    dep_var -- number of candidate independent variables
+
+    Returns:
+    list with the predictors of the best model from each step
+    """
     old_predictors = []
     step = 0
-    best_models = []
-    new_predictors = forward_stepwise(y, old_predictors, y_and_exclude, df)
+    new_predictors = forward(old_predictors)
     best_predictors = [new_predictors]
     #print("1st comparision:", old_predictors, new_predictors)
     while old_predictors != new_predictors:
@@ -228,15 +638,8 @@ def stepwise_linear_regression(y, df, exclude):
         #print('old_predictors:', old_predictors)
         if len(old_predictors) == dep_var:
             break
-        new_predictors = forward_stepwise(y, old_predictors, y_and_exclude, df)
+        new_predictors = forward(old_predictors)
         #print('new_predictors:', new_predictors)
         best_predictors.append(new_predictors)
     #print("best_predictors:", best_predictors)
-    for predictor_list in best_predictors[:-1]:
-        #print("predictor_list:", predictor_list)
-        if predictor_list[-1] == None:
-            pass
-        else:
-            best_models.append(process_best_model(y, predictor_list, df))
-    models_step = pd.DataFrame(best_models)
-    return models_step
+    return best_predictors[:-1]
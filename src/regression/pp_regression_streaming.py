@@ -0,0 +1,128 @@
+import logging
+import numpy as np
+import pandas as pd
+import src.regression.pp_regression_engine as engine
+import src.regression.pp_regression_fxn as regr
+
+
+# These functions run the regression procedures of pp_regression_fxn on SufficientStats instead of a dataframe, so the
+# dataset is only read once, in chunks, and never has to fit in memory.  The models are StatsFit objects.  The models with
+# several predictors are fit on the rows without missing values in any numeric column, while the in-memory formula
+# fits only drop the rows with missing values in the columns of each model, so on data with missing values the best
+# subsets and stepwise results can differ from those of pp_regression_fxn.
+def load_stats(chunks):
+    """Accumulates the SufficientStats of a dataset from an iterable of dataframe chunks, such as pp_dataset_io.iter_dataset returns.
+
+    Arguments:
+    chunks -- iterable of Pandas dataframes with the same columns
+
+    Returns:
+    SufficientStats object of the numeric columns
+    """
+    logger = logging.getLogger("thelogger")
+    stats = engine.accumulate_stats(chunks)
+    logger.info("Accumulated the cross-products of {} columns over {} complete rows. \n".format(len(stats.columns), stats.n))
+    return stats
+
+
+def linear_regression(y, stats, exclude):
+    """Same as pp_regression_fxn.linear_regression, computed from the sufficient statistics of the dataset.  As in the in-memory results, each regression uses the rows where y and its independent variable are both present (see engine.SufficientStats.simple_regressions).
+
+    Arguments:
+    y -- column name of the dependent variable; provide a string
+    stats -- SufficientStats object of the dataset
+    exclude --  column name(s) to be excluded from the analysis; provide a list of strings or an empty list if there are no columns to exclude
+
+    Returns:
+    results_df -- Pandas dataframe with the same columns as the one returned by pp_regression_fxn.linear_regression
+    """
+    logger = logging.getLogger("thelogger")
+    exclude_cols = [y] + list(exclude)
+    logger.info('y = {}'.format(y))
+    logger.info("excluded features: {}".format(exclude_cols))
+    screened = stats.simple_regressions(y, [col for col in stats.columns if col not in exclude_cols])
+    results = {feat: [round(value, digits) for value, digits in zip(screened.loc[feat], [3, 1, 4, 2, 4])] for feat in screened.index}
+    results_df = pd.DataFrame.from_dict(results, columns=["R-sqr", "F-statistic", "F-stat p-value", 't-test', 't-test p-value'], orient='index')
+    logger.info('Results: {}'.format(results_df))
+    return results_df
+
+
+def process_subset(y, feature_set, stats):
+    """Same as pp_regression_fxn.process_subset, with the model fit from the sufficient statistics."""
+    fit = engine.StatsFit(stats, y, list(feature_set))
+    return {"num_predictors": len(feature_set), "predictors": feature_set, "RSS": fit.ssr, "rsquared": fit.rsquared, "rsquared_adj": fit.rsquared_adj, "model": fit}
+
+
+def subset_linear_regression(y, stats, exclude, method="leaps"):
+    """Same as pp_regression_fxn.subset_linear_regression, computed from the sufficient statistics of the dataset.
+
+    Arguments:
+    y -- column name of the dependent variable; provide a string
+    stats -- SufficientStats object of the dataset
+    exclude --  column name(s) to be excluded from the analysis; provide a list of strings or an empty list if
+        there are no columns to exclude
+    method -- "leaps" for the branch-and-bound search or "gram" to score every combination
+
+    Returns:
+    models -- Pandas dataframe in the format of pp_regression_fxn.subset_linear_regression
+    """
+    if method not in ("gram", "leaps"):
+        raise ValueError("Unknown best subsets method: {}".format(method))
+    models = pd.DataFrame(columns=["num_predictors", "predictors", "RSS", "rsquared", "rsquared_adj", "model"])
+    exclude_cols = [y] + list(exclude)
+    features = [f for f in stats.columns if f not in exclude_cols]
+    sizes = range(1, len(features))
+    if len(sizes) == 0:
+        return models
+    products = stats.cross_products(y, features)
+    if method == "leaps":
+        best, _ = engine.leaps_and_bounds(products, sizes, top=2)
+    else:
+        best = {k: engine.best_subsets(products, k, top=2) for k in sizes}
+    for k in sizes:
+        results = [process_subset(y, tuple(features[i] for i in combo), stats) for _, combo, _ in best[k]]
+        models = pd.concat([models, pd.DataFrame(results, index=[position for position, _, _ in best[k]])], sort=True)
+    return models
+
+
+def stepwise_linear_regression(y, stats, exclude, skip_collinear=False):
+    """Same as pp_regression_fxn.stepwise_linear_regression, computed from the sufficient statistics of the dataset.  Collinear models are fit with the pseudo-inverse, as statsmodels does, but without skip_collinear their p-values are rounding noise that can lead to another choice than the formula fits.
+
+    Arguments:
+    y -- column name of the dependent variable; provide a string
+    stats -- SufficientStats object of the dataset
+    exclude --  column name(s) to be excluded from the analysis; provide a list of strings or an empty list if there are no columns to exclude
+    skip_collinear -- True applies the collinearity, tie, and exact fit rules of pp_regression_fxn.forward_stepwise_skip_collinear
+
+    Returns:
+    models_step -- Pandas dataframe in the format of pp_regression_fxn.stepwise_linear_regression
+    """
+    y_and_exclude = [y] + list(exclude)
+    features = [p for p in stats.columns if p not in y_and_exclude]
+
+    def candidate_pvalue(predictors, p):
+        # The same rules as the in-memory engines: collinear candidates are skipped and a candidate that makes the fit
+        # exact gets a p-value of 0 (see engine.is_collinear)
+        if skip_collinear and stats.collinear(predictors, [p])[0]:
+            return np.nan
+        if skip_collinear and stats.collinear(predictors + [p], [y])[0]:
+            return 0.0
+        return engine.StatsFit(stats, y, predictors + [p]).pvalues.iloc[-1]
+
+    def model_pvalues(model):
+        if skip_collinear and stats.collinear(model, [y])[0]:
+            # The model fits y exactly, so every predictor is kept, as in the in-memory engines
+            return np.zeros(len(model))
+        return engine.StatsFit(stats, y, model).pvalues.iloc[1:]
+
+    def forward(predictors):
+        remaining_predictors = [p for p in features if p not in predictors]
+        if skip_collinear and stats.collinear(predictors, [y])[0]:
+            # The model fits y exactly, so the candidates have no t-test
+            candidate_pvalues = [np.nan] * len(remaining_predictors)
+        else:
+            candidate_pvalues = [candidate_pvalue(predictors, p) for p in remaining_predictors]
+        return regr.choose_predictors(predictors, remaining_predictors, candidate_pvalues, model_pvalues, skip_collinear)
+
+    best_models = [process_subset(y, predictor_list, stats) for predictor_list in regr.stepwise_steps(forward, len(features)) if predictor_list]
+    return pd.DataFrame(best_models)
@@ -0,0 +1,140 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.ticker import MultipleLocator
+
+
+# Style and size of every exploratory data analysis figure
+EDA_STYLE = "ggplot"
+FIGURE_SIZE = (10, 5)
+
+
+def plot_population_comparison(fig, categories, populations, title, ylabel="frequency", xlabel=None):
+    """Draws a grouped bar chart that compares the frequency of each category in several populations.
+
+    Arguments:
+    fig -- matplotlib figure to draw on
+    categories -- names of the categories; provide a list of strings
+    populations -- dictionary of population name: list of the frequencies of the categories
+    title -- title of the plot
+    ylabel -- label of the y axis
+    xlabel -- label of the x axis, or None for no label
+
+    Returns:
+    None
+    """
+    ind = np.arange(len(categories))
+    width = 0.30
+
+    ax = fig.subplots()
+    for i, (label, frequencies) in enumerate(populations.items()):
+        ax.bar(ind + i*width, list(frequencies), width, align="center", label=label)
+    ax.set_xticks(ind + width)
+    ax.set_xticklabels(categories)
+    ax.set_ylim(0, 1)
+    ax.legend()
+    if xlabel is None:
+        ax.set(title=title, ylabel=ylabel)
+    else:
+        ax.set(title=title, xlabel=xlabel, ylabel=ylabel)
+
+
+def plot_histograms(fig, bins, counts, title, xlabel, ylabel="number of users", overlay=True, alpha=0.5, tick_spacing=None):
+    """Draws histograms from bin counts, such as the ones pp_eda_stats.grouped_histogram computes.
+
+    Arguments:
+    fig -- matplotlib figure to draw on
+    bins -- edges of the bins; provide an array
+    counts -- dictionary of group label: bin counts; a single group without a label can be given with None as its label
+    title -- title of the plot
+    xlabel -- label of the x axis
+    ylabel -- label of the y axis
+    overlay -- True to draw the histograms of the groups on top of each other, False to draw their bars side by side
+    alpha -- transparency of overlaid histograms
+    tick_spacing -- distance between the major ticks of the x axis, or None for the default ticks
+
+    Returns:
+    None
+    """
+    centers = bins[:-1]
+    labels = list(counts.keys())
+    ax = fig.subplots()
+    if labels == [None]:
+        ax.hist(centers, bins=bins, weights=counts[None])
+    elif overlay:
+        for label in labels:
+            ax.hist(centers, bins=bins, weights=counts[label], label=label, alpha=alpha)
+    else:
+        ax.hist([centers] * len(labels), bins=bins, weights=[counts[label] for label in labels], label=labels)
+    if tick_spacing is not None:
+        ax.xaxis.set_major_locator(MultipleLocator(tick_spacing))
+    ax.set(xlabel=xlabel, ylabel=ylabel, title=title)
+    if labels != [None]:
+        ax.legend()
+
+
+def plot_weight_change(fig, bins, lost_counts, gained_counts, title):
+    """Draws the histograms of pounds lost and pounds gained side by side with a shared y axis.
+
+    Arguments:
+    fig -- matplotlib figure to draw on
+    bins -- edges of the bins; provide an array
+    lost_counts -- dictionary of group label: bin counts of the pounds lost
+    gained_counts -- dictionary of group label: bin counts of the pounds gained
+    title -- title of the figure
+
+    Returns:
+    None
+    """
+    centers = bins[:-1]
+    ax1, ax2 = fig.subplots(1, 2, sharey=True)
+    for label, group_counts in lost_counts.items():
+        ax1.hist(centers, bins=bins, weights=group_counts, label=label, alpha=0.5)
+    ax1.set(xlabel="pounds lost", ylabel="number of users")
+    for label, group_counts in gained_counts.items():
+        ax2.hist(centers, bins=bins, weights=group_counts, label=label, alpha=0.5)
+    ax2.set(xlabel="pounds gained")
+    fig.suptitle(title)
+    ax2.legend()
+
+
+def render_plot(task):
+    """Draws one plot on an Agg figure that is not registered with pyplot, saves it, and frees it.  Works without a display, so it can run in worker processes.
+
+    Arguments:
+    task -- (path of the image file, plot function, dictionary of keyword arguments of the plot function) tuple
+
+    Returns:
+    path of the saved file
+    """
+    path, plot_function, kwargs = task
+    with plt.style.context(EDA_STYLE), plt.rc_context({"figure.figsize": FIGURE_SIZE}):
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        plot_function(fig, **kwargs)
+        fig.savefig(path)
+    fig.clear()
+    return path
+
+
+def render_plots(tasks, workers=1):
+    """Renders a list of plot tasks (see render_plot), in a process pool when workers > 1.  The tasks only hold aggregates such as bin counts, so sending them to the workers is cheap.
+
+    Arguments:
+    tasks -- list of (path, plot function, keyword arguments) tuples
+    workers -- number of processes used to draw the plots
+
+    Returns:
+    list of the paths of the saved files
+    """
+    logger = logging.getLogger("thelogger")
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            paths = list(pool.map(render_plot, tasks))
+    else:
+        paths = [render_plot(task) for task in tasks]
+    logger.info("Rendered {} plots.".format(len(paths)))
+    return paths
@@ -0,0 +1,35 @@
+import pandas as pd
+import src.main as main
+import src.data.pp_author_store as author_store
+import src.data.pp_synthetic_titles as synthetic
+
+
+def ingest(tmp_path, posts, name, **options):
+    """Writes a raw export to a .csv file and cleans it with run_cleaning; returns the larger dataset with its num_posts."""
+    raw_file = str(tmp_path / (name + ".csv"))
+    posts.to_csv(raw_file, index=False)
+    config = dict(main.DEFAULT_CONFIG, file=raw_file, file_name=str(tmp_path / (name + "_data.csv")), file_name2=str(tmp_path / (name + "_duration.csv")), pause=0, **options)
+    pp_data, _ = main.run_cleaning(config)
+    return pp_data
+
+
+def test_overlapping_dumps_count_each_post_once(tmp_path):
+    posts = synthetic.synthetic_posts(900, seed=11, num_authors=150)
+    options = {"author_store": str(tmp_path / "authors.sqlite"), "seen_ids": str(tmp_path / "seen_ids.npy")}
+    ingest(tmp_path, posts.iloc[:600], "first", **options)
+    # The second dump repeats the last 300 posts of the first one
+    second = ingest(tmp_path, posts.iloc[300:], "second", **options)
+    whole = ingest(tmp_path, posts, "whole")
+    expected = whole.set_index("id").loc[second["id"], "num_posts"]
+    assert len(second) == len(whole[whole["id"].isin(posts["id"].iloc[600:])])
+    assert second["num_posts"].tolist() == expected.tolist()
+
+
+def test_same_batch_is_not_counted_twice(tmp_path):
+    counts = pd.Series({"user_1": 2, "user_2": 1})
+    with author_store.AuthorCountStore(str(tmp_path / "authors.sqlite")) as store:
+        assert store.add_counts(counts, "batch")
+        assert not store.add_counts(counts, "batch")
+        assert store.add_counts(pd.Series({"user_2": 3}), "other batch")
+        assert store.lookup(["user_1", "user_2", "user_3"]).to_dict() == {"user_1": 2, "user_2": 4}
+        assert store.batch_ids() == ["batch", "other batch"]
@@ -0,0 +1,54 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pytest
+import src.regression.pp_regression_engine as engine
+import src.regression.pp_regression_fxn as regr
+
+
+DURATION_FILE = os.path.join(os.path.dirname(__file__), os.pardir, "data", "pp_duration_2018_processed.csv")
+# weight_diff is start_weight - end_weight and rate and norm_rate are derived from it, so models with them fit exactly
+# and tie with each other; month and dayofweek are dropped to keep the formula fits fast
+EXCLUDE = ["end_weight", "rate", "norm_rate", "month", "dayofweek"]
+
+
+@pytest.fixture(scope="module")
+def duration_data():
+    return pd.read_csv(DURATION_FILE)
+
+
+@pytest.fixture(scope="module")
+def formula_models(duration_data):
+    return regr.subset_linear_regression("weight_diff", duration_data, EXCLUDE, method="formula")
+
+
+@pytest.mark.parametrize("method", ["gram", "leaps"])
+def test_subset_methods_match_formula_fits(duration_data, formula_models, method):
+    features = [col for col in duration_data.columns if col not in EXCLUDE + ["weight_diff"]]
+    assert regr.can_use_gram("weight_diff", duration_data, features)
+    models = regr.subset_linear_regression("weight_diff", duration_data, EXCLUDE, method=method)
+    assert list(models["num_predictors"]) == list(formula_models["num_predictors"])
+    assert [sorted(p) for p in models["predictors"]] == [sorted(p) for p in formula_models["predictors"]]
+    for col in ["RSS", "rsquared", "rsquared_adj"]:
+        assert np.allclose(models[col].astype(float), formula_models[col].astype(float), rtol=1e-9, atol=0), col
+
+
+@pytest.mark.parametrize("k", [3, 6])
+def test_parallel_ranges_match_serial_search(duration_data, k):
+    features = [col for col in duration_data.columns if col != "score"]
+    products = engine.cross_products("score", duration_data, features)
+    serial = engine.best_subsets(products, k, top=2, batch_size=64)
+    # A small batch size splits the combinations into many ranges, so the executor is used
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        parallel = engine.best_subsets(products, k, top=2, batch_size=64, executor=executor, workers=2)
+    assert [(position, combo) for position, combo, _ in parallel] == [(position, combo) for position, combo, _ in serial]
+    assert np.allclose([value for _, _, value in parallel], [value for _, _, value in serial], rtol=1e-12, atol=0)
+
+
+def test_parallel_subset_regression_matches_serial(duration_data):
+    serial = regr.subset_linear_regression("weight_diff", duration_data, EXCLUDE, method="gram")
+    parallel = regr.subset_linear_regression("weight_diff", duration_data, EXCLUDE, method="gram", workers=2)
+    assert list(parallel.index) == list(serial.index)
+    assert list(parallel["predictors"]) == list(serial["predictors"])
+    assert np.allclose(parallel["rsquared_adj"].astype(float), serial["rsquared_adj"].astype(float), rtol=1e-12, atol=0)
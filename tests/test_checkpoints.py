@@ -0,0 +1,40 @@
+import logging
+import pandas as pd
+import src.main as main
+import src.data.pp_checkpoints as checkpoints
+import src.data.pp_synthetic_titles as synthetic
+
+
+def test_rerun_loads_every_stage(tmp_path, caplog):
+    raw_file = str(tmp_path / "raw.csv")
+    synthetic.synthetic_posts(600, seed=7).to_csv(raw_file, index=False)
+    config = dict(main.DEFAULT_CONFIG, file=raw_file, file_name=str(tmp_path / "data.csv"), file_name2=str(tmp_path / "duration.csv"), pause=0, checkpoint_dir=str(tmp_path / "checkpoints"))
+    with caplog.at_level(logging.INFO, logger="thelogger"):
+        pp_data, pp_duration = main.run_cleaning(config)
+    assert "Checkpoint cache: 0 hits, 5 misses (0.0% hit rate), 5 entries stored." in caplog.text
+    first_outputs = [pd.read_csv(config["file_name"]), pd.read_csv(config["file_name2"])]
+
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger="thelogger"):
+        rerun_data, rerun_duration = main.run_cleaning(config)
+    assert "Checkpoint cache: 5 hits, 0 misses (100.0% hit rate), 5 entries stored." in caplog.text
+    pd.testing.assert_frame_equal(rerun_data, pp_data)
+    pd.testing.assert_frame_equal(rerun_duration, pp_duration)
+    pd.testing.assert_frame_equal(pd.read_csv(config["file_name"]), first_outputs[0])
+    pd.testing.assert_frame_equal(pd.read_csv(config["file_name2"]), first_outputs[1])
+
+
+def test_changed_parameters_run_the_stage_again(tmp_path):
+    store = checkpoints.CheckpointStore(str(tmp_path))
+    calls = []
+
+    def stage():
+        calls.append(1)
+        return pd.DataFrame({"a": [1, 2, 3]})
+
+    value, digest = store.run("stage", stage, ["input"], {"n": 1})
+    assert store.run("stage", stage, ["input"], {"n": 1})[1] == digest
+    store.run("stage", stage, ["input"], {"n": 2})
+    assert (len(calls), store.hits, store.misses, len(store)) == (2, 1, 2, 2)
+    # The latest checkpoint of the stage is the one of the last run
+    pd.testing.assert_frame_equal(pd.read_pickle(store.latest("stage")), value)
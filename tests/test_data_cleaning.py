@@ -0,0 +1,73 @@
+import warnings
+import pandas as pd
+import pytest
+import src.features.pp_data_cleaning as clean
+import src.data.pp_dataset_io as dataset_io
+import src.data.pp_synthetic_titles as synthetic
+import src.features.pp_feature_building as feat
+
+
+def clean_in_memory(raw_file):
+    """Returns the two processed datasets of a raw .csv file cleaned in one piece, the way run_cleaning does without a chunk size."""
+    pp_data, features = clean.clean_data(pd.read_csv(raw_file), pause=0)
+    pp_data = clean.add_num_posts(pp_data, pause=0)
+    pp_duration = clean.get_duration_data(pp_data, features, pause=0)
+    return clean.format_processed(pp_data, clean.PROCESSED_DATA_COLUMNS), clean.format_processed(pp_duration, clean.PROCESSED_DURATION_COLUMNS)
+
+
+@pytest.mark.parametrize("extension", [".csv", ".parquet"])
+def test_chunked_cleaning_matches_in_memory(tmp_path, extension):
+    if extension != ".csv":
+        pytest.importorskip("pyarrow")
+    raw_file = str(tmp_path / "raw.csv")
+    # Few authors, so most of them have posts in several chunks
+    synthetic.synthetic_posts(1000, seed=3, num_authors=80).to_csv(raw_file, index=False)
+    file_name, file_name2 = str(tmp_path / ("data" + extension)), str(tmp_path / ("duration" + extension))
+    assert clean.clean_csv_chunked(raw_file, file_name, file_name2, chunksize=170)
+    for out_file, expected in zip([file_name, file_name2], clean_in_memory(raw_file)):
+        expected = expected.reset_index(drop=True)
+        # Binary files are written with the declared column types
+        if extension != ".csv":
+            expected = dataset_io.apply_schema(expected)
+        pd.testing.assert_frame_equal(dataset_io.load_dataset(out_file), expected, check_dtype=False)
+
+
+def test_file_without_durations_writes_an_empty_duration_dataset(tmp_path):
+    posts = synthetic.synthetic_posts(300, seed=4)
+    # Titles without a duration unit never reach the duration dataset
+    posts["title"] = posts["title"].str.replace(r"day|week|month|year|mos", "", case=False, regex=True)
+    raw_file = str(tmp_path / "raw.csv")
+    posts.to_csv(raw_file, index=False)
+    file_name, file_name2 = str(tmp_path / "data.csv"), str(tmp_path / "duration.csv")
+    with open(file_name2, "w") as f:
+        f.write("left over from an earlier run\n")
+    assert clean.clean_csv_chunked(raw_file, file_name, file_name2, chunksize=100)
+    assert len(dataset_io.load_dataset(file_name)) > 0
+    pp_duration = dataset_io.load_dataset(file_name2)
+    assert list(pp_duration.columns) == clean.PROCESSED_DURATION_COLUMNS
+    assert len(pp_duration) == 0
+
+
+def test_cached_cleaning_matches_uncached(tmp_path):
+    raw_data = synthetic.synthetic_posts(300, seed=5)
+    expected, _ = clean.clean_data(raw_data.copy(), pause=0)
+    cache = feat.ParseCache(feat.extract_title_features, maxsize=50)
+    height_cache = feat.ParseCache(feat.height_inches, maxsize=5)
+    pp_data, _ = clean.clean_data(raw_data.copy(), pause=0, cache=cache, height_cache=height_cache)
+    pd.testing.assert_frame_equal(pp_data, expected, check_dtype=False)
+    assert len(height_cache) <= 5
+    assert height_cache.hits > 0
+
+
+def test_cleaning_sets_deleted_authors_without_copy_warnings():
+    raw_data = synthetic.synthetic_posts(300, seed=6)
+    raw_data.loc[raw_data.index % 5 == 0, "author"] = "[deleted]"
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", pd.errors.SettingWithCopyWarning)
+        pp_data, _ = clean.clean_data(raw_data, pause=0)
+        pp_data = clean.add_num_posts(pp_data, pause=0)
+    deleted = pp_data["author"] == "[deleted]"
+    assert deleted.any()
+    assert (pp_data.loc[deleted, "num_posts"] == 1).all()
+    others = pp_data[~deleted]
+    assert (others["num_posts"] == others.groupby("author")["author"].transform("count")).all()
@@ -0,0 +1,132 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import src.data.pp_dataset_io as dataset_io
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "data")
+
+
+@pytest.fixture(scope="module")
+def duration_data():
+    return pd.read_csv(os.path.join(DATA_DIR, "pp_duration_2018_processed.csv"))
+
+
+def test_validate_schema_accepts_processed_data_and_extra_columns(duration_data):
+    dataset_io.validate_schema(duration_data.assign(title="x"))
+
+
+@pytest.mark.parametrize("column, values, message", [
+    ("age", ["a", "b", "c"], "'age' is not numeric"),
+    ("score", [1.0, np.nan, 3.0], "'score' has 1 missing values"),
+    ("num_posts", [1.0, 2.5, 3.0], "'num_posts' contains values that are not whole numbers"),
+    ("dayofweek", [0, 200, 3], "'dayofweek' has values outside the int8 range"),
+    ("month", [0, 5, 12], "'month' has values outside 1 to 12"),
+    ("sex", [0, 1, 2], "'sex' has values outside 0 to 1"),
+])
+def test_validate_schema_reports_each_problem(column, values, message):
+    with pytest.raises(ValueError, match=message):
+        dataset_io.validate_schema(pd.DataFrame({column: values}))
+
+
+def test_validate_schema_lists_every_problem():
+    with pytest.raises(ValueError) as error:
+        dataset_io.validate_schema(pd.DataFrame({"sex": [0, 3], "NSFW": [0, -1], "age": [20, 30]}))
+    assert "'sex' has values outside 0 to 1" in str(error.value)
+    assert "'NSFW' has values outside 0 to 1" in str(error.value)
+    assert "'age'" not in str(error.value)
+
+
+def test_validate_schema_allows_missing_num_posts():
+    dataset_io.validate_schema(pd.DataFrame({"num_posts": [1.0, np.nan, 3.0]}))
+
+
+def test_load_dataset_only_validates_when_asked(tmp_path):
+    csv_file = str(tmp_path / "data.csv")
+    pd.DataFrame({"score": [1.0, np.nan, 3.0], "x": [1.0, 2.0, 3.0]}).to_csv(csv_file, index=False)
+    assert dataset_io.load_dataset(csv_file)["score"].isna().sum() == 1
+    with pytest.raises(ValueError, match="'score' has 1 missing values"):
+        dataset_io.load_dataset(csv_file, validate=True)
+
+
+def test_apply_schema_rejects_invalid_data_and_converts_types(duration_data):
+    with pytest.raises(ValueError):
+        dataset_io.apply_schema(duration_data.assign(month=13))
+    typed = dataset_io.apply_schema(duration_data)
+    assert {col: str(dtype) for col, dtype in typed.dtypes.items()} == dataset_io.PROCESSED_SCHEMA
+
+
+@pytest.mark.parametrize("extension", [".parquet", ".feather"])
+def test_binary_round_trip_keeps_values_and_schema(tmp_path, duration_data, extension):
+    pytest.importorskip("pyarrow")
+    csv_file = str(tmp_path / "duration.csv")
+    dataset_io.save_dataset(duration_data, csv_file)
+    binary_file = str(tmp_path / ("duration" + extension))
+    # Several chunks become several row groups or record batches of one file
+    df = dataset_io.load_dataset(csv_file)
+    dataset_io.write_dataset([df.iloc[:5000], df.iloc[5000:]], binary_file)
+    loaded = dataset_io.load_dataset(binary_file)
+    assert list(loaded.columns) == list(duration_data.columns)
+    assert {col: str(dtype) for col, dtype in loaded.dtypes.items()} == dataset_io.PROCESSED_SCHEMA
+    pd.testing.assert_frame_equal(loaded, dataset_io.apply_schema(duration_data))
+    assert np.allclose(loaded.to_numpy(dtype=np.float64), duration_data.to_numpy(dtype=np.float64), rtol=1e-6)
+
+
+def test_binary_write_rejects_invalid_data(tmp_path, duration_data):
+    pytest.importorskip("pyarrow")
+    with pytest.raises(ValueError, match="'sex' has values outside 0 to 1"):
+        dataset_io.save_dataset(duration_data.assign(sex=2), str(tmp_path / "bad.parquet"))
+
+
+def test_binary_round_trip_keeps_missing_num_posts(tmp_path, duration_data):
+    pytest.importorskip("pyarrow")
+    binary_file = str(tmp_path / "duration.parquet")
+    df = duration_data.assign(num_posts=duration_data["num_posts"].where(duration_data.index % 7 != 0))
+    dataset_io.save_dataset(df, binary_file)
+    loaded = dataset_io.load_dataset(binary_file, validate=True)
+    assert str(loaded["num_posts"].dtype) == "Int32"
+    assert loaded["num_posts"].isna().sum() == df["num_posts"].isna().sum()
+
+
+def test_mmap_cache_is_built_in_chunks_and_reused(tmp_path, duration_data):
+    csv_file = str(tmp_path / "duration.csv")
+    duration_data.to_csv(csv_file, index=False)
+    dataset_io.build_mmap_cache(csv_file, chunksize=50)
+    npy_file, meta_file = dataset_io.mmap_cache_paths(csv_file)
+    assert os.path.dirname(npy_file) == str(tmp_path / dataset_io.MMAP_CACHE_DIR)
+    built = os.stat(npy_file).st_mtime_ns
+
+    loaded = dataset_io.load_dataset_mmap(csv_file)
+    assert os.stat(npy_file).st_mtime_ns == built
+    # The values are a read-only view of the memory-mapped array, not a copy
+    assert not loaded.values.flags.writeable
+    pd.testing.assert_frame_equal(loaded, duration_data.astype(np.float64))
+    digest = dataset_io.mmap_digest(csv_file)
+    assert digest is not None
+
+    dataset_io.build_mmap_cache(csv_file, chunksize=1000)
+    assert dataset_io.mmap_digest(csv_file) == digest
+
+
+def test_mmap_cache_is_rebuilt_when_the_source_changes(tmp_path, duration_data):
+    csv_file = str(tmp_path / "duration.csv")
+    duration_data.to_csv(csv_file, index=False)
+    dataset_io.load_dataset_mmap(csv_file)
+    digest = dataset_io.mmap_digest(csv_file)
+
+    duration_data.assign(sex=1 - duration_data["sex"]).to_csv(csv_file, index=False)
+    stat = os.stat(csv_file)
+    os.utime(csv_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert dataset_io.mmap_digest(csv_file) is None
+    loaded = dataset_io.load_dataset_mmap(csv_file)
+    assert (loaded["sex"] == 1 - duration_data["sex"]).all()
+    assert dataset_io.mmap_digest(csv_file) not in (None, digest)
+
+
+def test_mmap_cache_rejects_non_numeric_columns(tmp_path):
+    csv_file = str(tmp_path / "titles.csv")
+    pd.DataFrame({"score": [1, 2, 3], "title": ["a", "b", "c"]}).to_csv(csv_file, index=False)
+    with pytest.raises(ValueError, match="not numeric: \\['title'\\]"):
+        dataset_io.load_dataset_mmap(csv_file)
+    assert not os.path.exists(dataset_io.mmap_cache_paths(csv_file)[0])
@@ -0,0 +1,63 @@
+import os
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.image as mpimg
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+import src.main as main
+import src.visualization.pp_eda_plots as eda_plots
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "data")
+PLOT_FILES = ["pp_sex_compare.png", "pp_m_f_age_comparision.png", "pp_age_comparison.png", "pp_height_range.png", "pp_starting_weight.png",
+              "pp_ending_weight.png", "pp_histogram_weight_diff.png", "pp_weight_loss_duration.png", "pp_raw_weight_loss_rates.png"]
+
+
+def plot_tasks(directory):
+    bins = np.arange(0, 30, 1)
+    counts = np.arange(len(bins) - 1)
+    return [
+        (os.path.join(directory, "overlay.png"), eda_plots.plot_histograms, {"bins": bins, "counts": {"a": counts, "b": counts[::-1]}, "title": "overlay", "xlabel": "x"}),
+        (os.path.join(directory, "single.png"), eda_plots.plot_histograms, {"bins": bins, "counts": {None: counts}, "title": "single", "xlabel": "x", "tick_spacing": 3}),
+        (os.path.join(directory, "change.png"), eda_plots.plot_weight_change, {"bins": bins, "lost_counts": {"a": counts}, "gained_counts": {"a": counts[::-1]}, "title": "change"}),
+        (os.path.join(directory, "compare.png"), eda_plots.plot_population_comparison, {"categories": ["x", "y"], "populations": {"a": [0.4, 0.6], "b": [0.5, 0.5]}, "title": "compare"}),
+    ]
+
+
+def assert_png_files(paths):
+    for path in paths:
+        with open(path, "rb") as f:
+            assert f.read(8) == b"\x89PNG\r\n\x1a\n", path
+
+
+def test_render_plot_draws_off_pyplot(tmp_path):
+    path = eda_plots.render_plot(plot_tasks(str(tmp_path))[0])
+    assert path == str(tmp_path / "overlay.png")
+    width, height = eda_plots.FIGURE_SIZE
+    assert mpimg.imread(path).shape[:2] == (height * 100, width * 100)
+    assert plt.get_fignums() == []
+    assert matplotlib.get_backend().lower() == "agg"
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_render_plots_saves_every_task(tmp_path, workers):
+    tasks = plot_tasks(str(tmp_path))
+    for _ in range(2):
+        paths = eda_plots.render_plots(tasks, workers=workers)
+        assert paths == [task[0] for task in tasks]
+        assert_png_files(paths)
+    assert plt.get_fignums() == []
+
+
+def test_explore_data_renders_into_an_existing_directory(tmp_path):
+    pp_data = pd.read_csv(os.path.join(DATA_DIR, "pp_data_2018_processed.csv"))
+    pp_duration = pd.read_csv(os.path.join(DATA_DIR, "pp_duration_2018_processed.csv"))
+    plots_dir = tmp_path / "plots"
+    # The second run finds the directory and the files of the first one
+    for workers in [1, 2]:
+        main.explore_data(pp_data, pp_duration, plots_dir=str(plots_dir), pause=0, workers=workers)
+        assert sorted(os.listdir(plots_dir)) == sorted(PLOT_FILES)
+        assert_png_files([str(plots_dir / name) for name in PLOT_FILES])
+        assert plt.get_fignums() == []
@@ -0,0 +1,149 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import src.features.pp_eda_stats as eda_stats
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "data")
+
+
+def synthetic_posts(n, seed, gained=True):
+    """Returns processed posts with whole-year ages, some missing values, and weight gains only if gained is True."""
+    rng = np.random.default_rng(seed)
+    start = rng.integers(100, 400, n).astype(float)
+    change = rng.integers(-30 if gained else 0, 120, n).astype(float)
+    df = pd.DataFrame({"age": rng.integers(14, 80, n).astype(float), "sex": rng.integers(0, 2, n).astype(float), "height_in": rng.integers(50, 80, n).astype(float),
+                       "start_weight": start, "end_weight": start - change, "weight_diff": change, "period_months": rng.integers(0, 80, n).astype(float)})
+    df["rate"] = df["weight_diff"] / df["period_months"].clip(lower=1)
+    for column in ["age", "sex", "height_in", "weight_diff"]:
+        df.loc[rng.random(n) < 0.05, column] = np.nan
+    return df
+
+
+def histogram(values, bins):
+    return np.histogram(values.dropna(), bins)[0]
+
+
+def filtered_copy_statistics(pp_data, pp_duration):
+    """Computes the statistics of summarize_eda from filtered copies of the datasets, as main.explore_data did before it."""
+    bins = eda_stats.HISTOGRAM_BINS
+    males = pp_data[pp_data["sex"] == 0]
+    females = pp_data[pp_data["sex"] == 1]
+    sexes = pp_data["sex"].count()
+    adults = pp_data[pp_data["age"] >= 18]
+    total_entries = pp_data["weight_diff"].count()
+    lost = pp_data[pp_data["weight_diff"] > 0]
+    gain = pp_data[pp_data["weight_diff"] < 0]
+    same = pp_data[pp_data["weight_diff"] == 0]
+    male_lost, female_lost = lost[lost["sex"] == 0], lost[lost["sex"] == 1]
+    male_gain, female_gain = -gain[gain["sex"] == 0]["weight_diff"], -gain[gain["sex"] == 1]["weight_diff"]
+    dur_loss = pp_duration[pp_duration["weight_diff"] > 0]
+    dur_male_loss, dur_female_loss = dur_loss[dur_loss["sex"] == 0], dur_loss[dur_loss["sex"] == 1]
+
+    rows = {
+        "rows": [pp_data.shape[0], None, None],
+        "sex_count": [sexes, males.shape[0], females.shape[0]],
+        "sex_share": [None, males.shape[0] / sexes, females.shape[0] / sexes],
+        "age_mean": [pp_data["age"].mean(), males["age"].mean(), females["age"].mean()],
+        "age_min": [pp_data["age"].min(), None, None],
+        "age_max": [pp_data["age"].max(), None, None],
+        "age_20s_share": [pp_data[(pp_data["age"] >= 20) & (pp_data["age"] < 30)].shape[0] / pp_data.shape[0], None, None],
+        "adults_count": [adults.shape[0], None, None],
+        "adults_18_29_share": [adults[adults["age"] <= 29].shape[0] / adults.shape[0], None, None],
+        "adults_30_49_share": [adults[(adults["age"] >= 30) & (adults["age"] <= 49)].shape[0] / adults.shape[0], None, None],
+        "adults_50_64_share": [adults[(adults["age"] >= 50) & (adults["age"] <= 64)].shape[0] / adults.shape[0], None, None],
+        "adults_65_plus_share": [adults[adults["age"] >= 65].shape[0] / adults.shape[0], None, None],
+        "weight_diff_count": [total_entries, None, None],
+        "lost_mean": [lost["weight_diff"].mean(), male_lost["weight_diff"].mean(), female_lost["weight_diff"].mean()],
+        "gained_mean": [-gain["weight_diff"].mean(), male_gain.mean(), female_gain.mean()],
+        "lost_max": [lost["weight_diff"].max(), male_lost["weight_diff"].max(), female_lost["weight_diff"].max()],
+        "duration_rows": [pp_duration.shape[0], None, None],
+        "duration_lost_count": [dur_loss["weight_diff"].count(), dur_male_loss.shape[0], dur_female_loss.shape[0]],
+        "duration_max": [dur_loss["period_months"].max(), None, None],
+        "duration_72_share": [dur_loss[dur_loss["period_months"] <= 72].shape[0] / dur_loss.shape[0], None, None],
+        "duration_12_share": [dur_loss[dur_loss["period_months"] <= 12].shape[0] / dur_loss.shape[0], None, None],
+        "rate_mean": [dur_loss["rate"].mean(), dur_male_loss["rate"].mean(), dur_female_loss["rate"].mean()],
+    }
+    for column in ["height_in", "start_weight", "end_weight"]:
+        rows[column + "_mean"] = [pp_data[column].mean(), males[column].mean(), females[column].mean()]
+    for name, group in [("lost", lost), ("gained", gain), ("same", same)]:
+        rows[name + "_count"] = [group.shape[0], group[group["sex"] == 0].shape[0], group[group["sex"] == 1].shape[0]]
+        rows[name + "_share"] = [group.shape[0] / total_entries, None, None]
+
+    histograms = {column: {"male": histogram(males[column], bins[column]), "female": histogram(females[column], bins[column])} for column in ["age", "height_in", "start_weight", "end_weight"]}
+    histograms["weight_lost"] = {"male": histogram(male_lost["weight_diff"], bins["weight_lost"]), "female": histogram(female_lost["weight_diff"], bins["weight_lost"])}
+    histograms["weight_gained"] = {"male": histogram(male_gain, bins["weight_gained"]), "female": histogram(female_gain, bins["weight_gained"])}
+    histograms["period_months"] = {"all": histogram(dur_loss[dur_loss["period_months"] <= 72]["period_months"], bins["period_months"])}
+    histograms["rate"] = {"male": histogram(dur_male_loss["rate"], bins["rate"]), "female": histogram(dur_female_loss["rate"], bins["rate"])}
+    return rows, histograms
+
+
+def assert_same_statistics(pp_data, pp_duration):
+    summary, histograms = eda_stats.summarize_eda(pp_data, pp_duration)
+    rows, expected_histograms = filtered_copy_statistics(pp_data, pp_duration)
+    assert set(summary.index) == set(rows)
+    assert list(summary.columns) == ["all"] + eda_stats.SEX_LABELS
+    for name, expected in rows.items():
+        for value, expected_value in zip(summary.loc[name], expected):
+            if expected_value is None:
+                assert value is None, name
+            else:
+                assert value == pytest.approx(expected_value, rel=1e-12, nan_ok=True), name
+    assert set(histograms) == set(expected_histograms)
+    for name, counts in expected_histograms.items():
+        assert set(histograms[name]) == set(counts)
+        for label in counts:
+            np.testing.assert_array_equal(histograms[name][label], counts[label], err_msg="{} {}".format(name, label))
+    return summary
+
+
+def test_summary_matches_filtered_copies_on_bundled_data():
+    pp_data = pd.read_csv(os.path.join(DATA_DIR, "pp_data_2018_processed.csv"))
+    pp_duration = pd.read_csv(os.path.join(DATA_DIR, "pp_duration_2018_processed.csv"))
+    assert_same_statistics(pp_data, pp_duration)
+
+
+def test_summary_matches_filtered_copies_on_synthetic_posts():
+    assert_same_statistics(synthetic_posts(5000, 0), synthetic_posts(2000, 1))
+
+
+def test_summary_of_empty_groups():
+    pp_data = synthetic_posts(2000, 2, gained=False)
+    pp_duration = synthetic_posts(1000, 3)
+    # No woman of the duration dataset lost weight
+    pp_duration.loc[pp_duration["sex"] == 1, "weight_diff"] = -5.0
+    summary = assert_same_statistics(pp_data, pp_duration)
+    assert list(summary.loc["gained_count"]) == [0, 0, 0]
+    assert np.isnan(summary.loc["gained_mean"].astype(float)).all()
+    assert summary.loc["duration_lost_count", "female"] == 0
+    assert np.isnan(summary.loc["rate_mean", "female"])
+
+
+def test_grouped_histogram_matches_np_histogram():
+    bins = eda_stats.HISTOGRAM_BINS["rate"]
+    edges = np.concatenate([bins, np.nextafter(bins, -np.inf), np.nextafter(bins, np.inf)])
+    values = np.concatenate([edges, np.random.default_rng(4).uniform(-5, 35, 2000), [np.nan, np.inf, -np.inf]])
+    groups = np.arange(len(values)) % 3 - 1
+    counts = eda_stats.grouped_histogram(values, groups, 2, bins)
+    assert counts.shape == (2, len(bins) - 1)
+    for group in range(2):
+        expected = np.histogram(values[(groups == group) & np.isfinite(values)], bins)[0]
+        np.testing.assert_array_equal(counts[group], expected)
+
+
+def test_group_totals_add_up_selected_groups():
+    df = pd.DataFrame({"sex": [0, 0, 1, 1, np.nan, 0], "weight_diff": [10, -4, 6, 0, 3, np.nan], "age": [20, 30, 40, 50, 60, 70]})
+    sex_codes, directions = eda_stats.group_codes(df)
+    assert list(sex_codes) == [0, 0, 1, 1, 2, 0]
+    assert list(directions) == [eda_stats.LOST, eda_stats.GAINED, eda_stats.LOST, eda_stats.SAME, eda_stats.LOST, eda_stats.MISSING]
+    totals = eda_stats.GroupTotals(df, {"age": ["count", "sum", "min", "max"]}, sex_codes, directions)
+    assert totals.count("age") == 6
+    assert totals.mean("age", sexes=(0,)) == pytest.approx(40)
+    assert totals.max("age", directions=(eda_stats.LOST,)) == 60
+    assert totals.min("age", sexes=(1,), directions=(eda_stats.LOST, eda_stats.SAME)) == 40
+    # A group without rows
+    assert totals.count("age", sexes=(1,), directions=(eda_stats.GAINED,)) == 0
+    assert np.isnan(totals.mean("age", sexes=(1,), directions=(eda_stats.GAINED,)))
+    assert np.isnan(totals.max("age", sexes=(2,), directions=(eda_stats.SAME,)))
+    assert eda_stats.by_sex(totals.count, "age", directions=(eda_stats.LOST,)) == [3, 1, 1]
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+import src.features.pp_feature_building as feat
+import src.data.pp_synthetic_titles as synthetic
+
+
+# Real r/progresspics title formats, including ones that hit the fallback branches of the parsers, with the fields
+# that the original row-by-row cleaning code computed for them: raw_sex, raw_age, raw_height, raw_weights,
+# start_weight, end_weight, kg_total, kg, NSFW, has_duration, period_weeks, and period_months
+GOLDEN = {
+    "M/22/6'3\" [290lbs &gt; 185lbs = 105lbs] (2 years) Long time lurker, first post":
+        ("M", "22", "6'3\"", "290LBS &GT; 185LBS = 105LBS] (2 YEARS) LONG TIME LURKER, FIRST POST", "290", "185", False, False, 0, True, 104.0, 24.0),
+    "F/27/5'10\" [355lbs &gt; 340lbs = 15lbs] (&gt;1 month) Only the beginning":
+        ("F", "27", "5'10\"", "355LBS &GT; 340LBS = 15LBS] (&GT;1 MONTH) ONLY THE BEGINNING", "355", "340", False, False, 0, False, 4.0, 1.0),
+    "F/23/5’0” [260 &gt; 218 = 42lbs] (12 months) Friend was getting married":
+        ("F", "23", "5’0”", "260 &GT; 218 = 42LBS] (12 MONTHS) FRIEND WAS GETTING MARRIED", "260", "218", False, False, 0, True, 48.0, 12.0),
+    "F/24/5’3” (160 SW &gt; 135 CW &gt; 125 GW) 25lbs lost so far":
+        ("F", "24", "5’3”", "160 SW &GT; 135 CW &GT; 125 GW) 25LBS LOST SO FAR", "160", "135", False, False, 0, False, "unknown", "unknown"),
+    "F/48/5’6” [326 lbs &gt; 180lbs= 146 lbs lost] (101 months) NSFW":
+        ("F", "48", "5’6”", "326 LBS &GT; 180LBS= 146 LBS LOST] (101 MONTHS) NSFW", "326", "180", False, False, 1, True, 404.0, 101.0),
+    "27/M/6’4” [292lbs-265lbs = 27lbs] (2 months) a little bit of progress":
+        ("27", "M", "6’4”", "292LBS-265LBS = 27LBS] (2 MONTHS) A LITTLE BIT OF PROGRESS", "292", "265", False, False, 0, True, 8.0, 2.0),
+    "M/30/180cm [120kg &gt; 95kg = 25kg] 1.5 years":
+        ("M", "30", "180CM", "120KG &GT; 95KG = 25KG] 1.5 YEARS", "120", "95", True, True, 0, True, 78.0, 18.0),
+    "f/19/5'5 [200 &gt; 150] nsfw 6 weeks":
+        ("F", "19", "5'5", "200 &GT; 150] NSFW 6 WEEKS", "200", "150", False, False, 1, True, 6.0, 24.0),
+    "M/25/5'9\"/[230 &gt; 180]":
+        ("M", "25", "5'9\"", "[230 &GT; 180]", "230", "180", False, False, 0, False, "unknown", "unknown"),
+    "Just a picture of my progress!":
+        ("unknown", "unknown", "unknown", "unknown", "unknown", "unknown", False, False, 0, False, "unknown", "unknown"),
+    "":
+        ("unknown", "unknown", "unknown", "unknown", "unknown", "unknown", False, False, 0, False, "unknown", "unknown"),
+}
+REAL_TITLES = list(GOLDEN)
+FIELDS = ["raw_sex", "raw_age", "raw_height", "raw_weights", "start_weight", "end_weight", "kg_total", "kg", "NSFW", "has_duration", "period_weeks", "period_months"]
+
+
+def expected_features(title):
+    """Returns the fields of a title computed with the separate parsing functions, in the order of FIELDS."""
+    sex, age, height, weights = feat.get_stats_ver6(title)
+    start_weight, end_weight = feat.get_weights_ver2(weights)
+    return {
+        "raw_sex": sex,
+        "raw_age": age,
+        "raw_height": height,
+        "raw_weights": weights,
+        "start_weight": start_weight,
+        "end_weight": end_weight,
+        "kg_total": feat.KG_TOTAL_REGEX.search(title) is not None,
+        "kg": feat.KG_REGEX.search(title) is not None,
+        "NSFW": feat.nsfw(title),
+        "has_duration": any(word in title for word in feat.UNITS_OF_MEASURE),
+        "period_weeks": feat.get_duration_weeks(title),
+        "period_months": feat.get_duration_months(title),
+    }
+
+
+def synthetic_title_set():
+    return pd.Series(synthetic.synthetic_titles(5000, np.random.default_rng(2018)))
+
+
+def assert_matches(features, titles, expected):
+    """Checks the fields of extract_features_batch against expected field values, one title at a time."""
+    weeks = feat.duration_in_weeks_batch(features["duration"], features["duration_unit"])
+    months = feat.duration_in_months_batch(features["duration"], features["duration_unit"])
+    for i, title in titles.items():
+        row = dict(features.loc[i, FIELDS[:10]], period_weeks=weeks[i], period_months=months[i])
+        for column, value in zip(FIELDS, expected(title)):
+            if column in ("period_weeks", "period_months") and value == "unknown":
+                assert np.isnan(row[column]), (title, column)
+            elif column in ("period_weeks", "period_months"):
+                assert row[column] == pytest.approx(value), (title, column)
+            else:
+                assert row[column] == value, (title, column)
+
+
+def test_extract_features_batch_matches_golden_outputs():
+    titles = pd.Series(REAL_TITLES)
+    assert_matches(feat.extract_features_batch(titles), titles, GOLDEN.get)
+
+
+def test_extract_features_batch_matches_separate_parsers():
+    titles = synthetic_title_set()
+    assert_matches(feat.extract_features_batch(titles), titles, lambda title: list(expected_features(title).values()))
+
+
+@pytest.mark.parametrize("titles", [pd.Series(REAL_TITLES), synthetic_title_set()])
+def test_vectorized_parser_matches_row_by_row_parser(titles):
+    records = pd.DataFrame.from_records(feat.parse_titles(titles.tolist()), columns=feat.TITLE_FEATURES, index=titles.index)
+    records["duration"] = pd.to_numeric(records["duration"], errors='coerce')
+    pd.testing.assert_frame_equal(feat.extract_features_vectorized(titles), records)
+
+
+def test_vectorized_parser_accepts_no_titles():
+    features = feat.extract_features_batch(pd.Series([], dtype=object))
+    assert list(features.columns) == feat.TITLE_FEATURES
+    assert len(features) == 0
+
+
+def test_parallel_and_cached_parsing_match_serial():
+    titles = synthetic_title_set()
+    serial = feat.extract_features_batch(titles)
+    pd.testing.assert_frame_equal(feat.extract_features_batch(titles, workers=2), serial)
+    cache = feat.ParseCache(feat.extract_title_features, maxsize=100)
+    pd.testing.assert_frame_equal(feat.extract_features_batch(titles, cache=cache), serial)
+    pd.testing.assert_frame_equal(feat.extract_features_batch(titles, cache=cache), serial)
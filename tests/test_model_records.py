@@ -0,0 +1,121 @@
+import logging
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.api as sm
+import src.regression.pp_regression_fxn as regr
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "data")
+PREDICTORS = ("num_comments", "sex", "weight_diff")
+
+
+@pytest.fixture(scope="module")
+def duration_data():
+    return pd.read_csv(os.path.join(DATA_DIR, "pp_duration_2018_processed.csv"))
+
+
+@pytest.fixture()
+def cache():
+    return regr.ModelCache()
+
+
+@pytest.fixture()
+def record_and_results(duration_data, cache):
+    record = regr.process_best_model("score", PREDICTORS, duration_data, cache)["model"]
+    # The eager statsmodels results that the record replaces
+    results = sm.OLS.from_formula("score ~ " + " + ".join(PREDICTORS), duration_data).fit()
+    cache.clear()
+    return record, results
+
+
+def forwarded_value(name, attribute, data):
+    """Returns a comparable value of a results attribute, calling the methods with the same arguments."""
+    if name == "summary":
+        # The header of the summary holds the date and time of the call
+        return attribute().tables[1].as_text()
+    if name == "conf_int":
+        return attribute().to_numpy()
+    if name == "predict":
+        return np.asarray(attribute(data.head(50)))
+    if name == "get_influence":
+        return attribute().resid_studentized_internal
+    return np.asarray(attribute)
+
+
+@pytest.mark.parametrize("name", sorted(regr.ModelRecord.RESULTS_ATTRIBUTES))
+def test_record_forwards_results_attributes(record_and_results, duration_data, name):
+    record, results = record_and_results
+    expected = forwarded_value(name, getattr(results, name), duration_data)
+    value = forwarded_value(name, getattr(record, name), duration_data)
+    if isinstance(expected, str):
+        assert value == expected
+    else:
+        assert np.allclose(value, expected, rtol=1e-10, atol=0)
+
+
+def test_record_stores_the_fit_summary(record_and_results):
+    record, results = record_and_results
+    pd.testing.assert_series_equal(record.params, results.params)
+    pd.testing.assert_series_equal(record.bse, results.bse)
+    assert record.rsquared == pytest.approx(results.rsquared)
+    assert record.rsquared_adj == pytest.approx(results.rsquared_adj)
+    assert record.rss == pytest.approx(results.ssr)
+
+
+def test_other_attributes_raise_without_fitting(record_and_results, cache):
+    record, _ = record_and_results
+    misses = cache.misses
+    for name in ["_repr_html_", "__array__", "resid_pearson", "params_unknown"]:
+        assert not hasattr(record, name)
+    assert cache.misses == misses
+    assert len(cache) == 0
+
+
+def test_record_is_fit_again_through_its_cache(record_and_results, cache):
+    record, _ = record_and_results
+    misses = cache.misses
+    assert record.model is record.model
+    assert (cache.hits, cache.misses) == (1, misses + 1)
+
+
+def test_least_recently_used_model_is_evicted(duration_data):
+    cache = regr.ModelCache(maxsize=2)
+    first = cache.fit("score", ["sex"], duration_data)
+    cache.fit("score", ["age"], duration_data)
+    assert cache.fit("score", ["sex"], duration_data) is first
+    cache.fit("score", ["num_comments"], duration_data)
+    # "age" was the least recently used model when "num_comments" was stored, so it is fit again
+    assert [key[2] for key in cache.models] == [("sex",), ("num_comments",)]
+    cache.fit("score", ["age"], duration_data)
+    assert (cache.hits, cache.misses) == (1, 4)
+    assert len(cache) == 2
+
+
+def test_hits_and_misses_are_counted(duration_data, caplog):
+    cache = regr.ModelCache()
+    regr.process_best_model("score", PREDICTORS, duration_data, cache)
+    regr.process_best_model("score", PREDICTORS, duration_data, cache)
+    # The model is keyed on the contents of the dataframe, not on the object
+    regr.process_best_model("score", PREDICTORS, duration_data.copy(), cache)
+    regr.process_best_model("score", PREDICTORS, duration_data.assign(sex=1 - duration_data["sex"]), cache)
+    assert (cache.hits, cache.misses) == (2, 2)
+    with caplog.at_level(logging.INFO, logger="thelogger"):
+        cache.log_stats()
+    assert "Model cache: 2 hits, 2 misses (50.0% hit rate), 2 entries stored." in caplog.text
+
+
+def test_reordered_predictors_give_the_requested_order(duration_data, cache):
+    reordered = tuple(reversed(PREDICTORS))
+    cache.fit("score", PREDICTORS, duration_data)
+    results = cache.fit("score", reordered, duration_data)
+    expected = sm.OLS.from_formula("score ~ " + " + ".join(reordered), duration_data).fit()
+    assert list(results.params.index) == ["Intercept"] + list(reordered)
+    pd.testing.assert_series_equal(results.pvalues, expected.pvalues)
+    assert list(regr.process_subset_ttest("score", reordered, duration_data, cache).index) == ["Intercept"] + list(reordered)
+
+
+def test_linear_regression_without_summaries_gives_the_same_table(duration_data):
+    exclude = ["rate", "norm_rate"]
+    pd.testing.assert_frame_equal(regr.linear_regression("score", duration_data, exclude, summaries=False), regr.linear_regression("score", duration_data, exclude))
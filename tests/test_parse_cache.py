@@ -0,0 +1,82 @@
+import logging
+import pickle
+import src.features.pp_feature_building as feat
+
+
+class CountingParser:
+    """Parsing function that records the inputs it is called with."""
+    __name__ = "count_parser"
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, s):
+        self.calls.append(s)
+        return s.upper()
+
+
+def test_least_recently_used_entry_is_evicted():
+    parse = CountingParser()
+    cache = feat.ParseCache(parse, maxsize=2)
+    assert [cache(s) for s in ["a", "b", "a", "c", "a", "b"]] == ["A", "B", "A", "C", "A", "B"]
+    # "b" was the least recently used entry when "c" was stored, so it was parsed again
+    assert parse.calls == ["a", "b", "c", "b"]
+    assert len(cache) == 2
+    assert list(cache.results) == ["a", "b"]
+
+
+def test_hits_and_misses_are_counted(caplog):
+    parse = CountingParser()
+    cache = feat.ParseCache(parse, normalize=str.lower)
+    cache("Title")
+    cache("TITLE")
+    assert cache.map(["title", "other", "other", "new"]) == ["TITLE", "OTHER", "OTHER", "NEW"]
+    # Keys are normalized, and each distinct uncached key is parsed once
+    assert parse.calls == ["Title", "other", "new"]
+    assert (cache.hits, cache.misses) == (3, 3)
+    with caplog.at_level(logging.INFO, logger="thelogger"):
+        cache.log_stats("Title")
+    assert "Title cache: 3 hits, 3 misses (50.0% hit rate), 3 entries stored." in caplog.text
+
+
+def test_map_parses_the_uncached_inputs_in_one_call():
+    cache = feat.ParseCache(CountingParser())
+    batches = []
+
+    def parse(inputs):
+        batches.append(inputs)
+        return [s * 2 for s in inputs]
+
+    assert cache.map(["a", "b", "a"], parse=parse) == ["aa", "bb", "aa"]
+    assert cache.map(["b", "c"], parse=parse) == ["bb", "cc"]
+    assert batches == [["a", "b"], ["c"]]
+
+
+def test_saved_results_are_loaded_by_a_later_run(tmp_path):
+    path = str(tmp_path / "cache.pkl")
+    cache = feat.ParseCache(feat.extract_title_features)
+    cache.map(["M/22/6'0\" [250 > 200]", "F/30/5'5\" [180 > 150] (3 months)"])
+    cache.save(path)
+    loaded = feat.ParseCache(feat.extract_title_features)
+    assert loaded.load(path) == 2
+    assert loaded.results == cache.results
+    assert feat.ParseCache(feat.extract_title_features).load(str(tmp_path / "missing.pkl")) == 0
+
+
+def test_load_ignores_other_functions_and_versions(tmp_path):
+    path = str(tmp_path / "cache.pkl")
+    cache = feat.ParseCache(feat.extract_title_features)
+    cache("M/22/6'0\" [250 > 200]")
+    cache.save(path)
+    other = feat.ParseCache(feat.get_stats_ver6)
+    assert other.load(path) == 0
+    assert len(other) == 0
+
+    with open(path, "rb") as f:
+        saved = pickle.load(f)
+    saved["version"] = feat.PARSE_CACHE_VERSION - 1
+    with open(path, "wb") as f:
+        pickle.dump(saved, f)
+    stale = feat.ParseCache(feat.extract_title_features)
+    assert stale.load(path) == 0
+    assert len(stale) == 0
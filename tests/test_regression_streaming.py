@@ -0,0 +1,62 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import src.data.pp_dataset_io as dataset_io
+import src.regression.pp_regression_engine as engine
+import src.regression.pp_regression_fxn as regr
+import src.regression.pp_regression_streaming as streaming
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "data")
+DATASETS = ["pp_data_2018_processed.csv", "pp_duration_2018_processed.csv"]
+
+
+@pytest.fixture(scope="module", params=DATASETS)
+def dataset(request):
+    path = os.path.join(DATA_DIR, request.param)
+    return pd.read_csv(path), streaming.load_stats(dataset_io.iter_dataset(path, chunksize=3000))
+
+
+def assert_same_stepwise(df, y, expected, result):
+    assert [list(p) for p in result["predictors"]] == [list(p) for p in expected["predictors"]]
+    tss = ((df[y] - df[y].mean()) ** 2).sum()
+    assert np.allclose(result["RSS"].astype(float), expected["RSS"].astype(float), rtol=1e-9, atol=1e-9 * tss)
+    assert np.allclose(result["rsquared_adj"].astype(float), expected["rsquared_adj"].astype(float), rtol=0, atol=1e-9)
+
+
+def test_streaming_stepwise_matches_in_memory_stepwise(dataset):
+    df, stats = dataset
+    expected = regr.stepwise_linear_regression("score", df, ["weight_diff"], method="formula")
+    assert_same_stepwise(df, "score", expected, streaming.stepwise_linear_regression("score", stats, ["weight_diff"]))
+
+
+# start_weight, end_weight, and weight_diff are exactly collinear, so score has singular candidates and weight_diff
+# is fit exactly once the other two are in the model
+@pytest.mark.parametrize("y", ["score", "weight_diff"])
+def test_streaming_stepwise_matches_in_memory_stepwise_skip_collinear(dataset, y):
+    df, stats = dataset
+    expected = regr.stepwise_linear_regression(y, df, [], method="formula", skip_collinear=True)
+    assert_same_stepwise(df, y, expected, streaming.stepwise_linear_regression(y, stats, [], skip_collinear=True))
+
+
+def test_streaming_collinear_check(dataset):
+    df, stats = dataset
+    collinear = stats.collinear(["end_weight", "weight_diff"], ["start_weight", "score"])
+    assert list(collinear) == [True, False]
+
+
+def test_streaming_simple_regressions_drop_missing_values_per_pair(tmp_path):
+    df = pd.read_csv(os.path.join(DATA_DIR, "pp_duration_2018_processed.csv"))
+    rng = np.random.default_rng(0)
+    # Missing values in different rows of y and of the features, including a first chunk with no complete rows
+    for col in ["score", "age", "num_posts", "rate"]:
+        df.loc[rng.random(len(df)) < 0.1, col] = np.nan
+    df.loc[:99, "age"] = np.nan
+    path = str(tmp_path / "missing.csv")
+    df.to_csv(path, index=False)
+    stats = streaming.load_stats(dataset_io.iter_dataset(path, chunksize=100))
+    features = [col for col in df.columns if col != "score"]
+    expected = engine.simple_regressions("score", df, features)
+    pd.testing.assert_frame_equal(stats.simple_regressions("score", features), expected, check_exact=False, rtol=1e-7, atol=1e-12)
+    assert list(streaming.linear_regression("score", stats, []).index) == features
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+import src.main as main
+import src.data.pp_seen_ids as seen_id_index
+import src.data.pp_synthetic_titles as synthetic
+
+
+def test_decode_ids_matches_int():
+    ids = pd.Series(["7n2k3f", "t3_7n2k3f", "ZZ", "0", None, "not an id!", "1234567890abc"])
+    expected = [int("7n2k3f", 36), int("7n2k3f", 36), int("zz", 36), 0, -1, -1, -1]
+    assert seen_id_index.decode_ids(ids).tolist() == expected
+
+
+def test_filter_new_drops_seen_and_repeated_rows(tmp_path):
+    path = str(tmp_path / "seen_ids.npy")
+    index = seen_id_index.SeenIdIndex(path)
+    df = pd.DataFrame({"id": ["a1", "b2", "a1", None, None]})
+    assert index.filter_new(df).index.tolist() == [0, 1, 3, 4]
+    index.save()
+    assert seen_id_index.SeenIdIndex(path).filter_new(pd.DataFrame({"id": ["b2", "c3"]}))["id"].tolist() == ["c3"]
+
+
+@pytest.mark.parametrize("chunksize", [None, 200])
+def test_reingesting_seen_posts_adds_no_rows(tmp_path, chunksize):
+    posts = synthetic.synthetic_posts(600, seed=5)
+    raw_file = str(tmp_path / "raw.csv")
+    posts.to_csv(raw_file, index=False)
+    config = dict(main.DEFAULT_CONFIG, file=raw_file, file_name=str(tmp_path / "data.csv"), file_name2=str(tmp_path / "duration.csv"), pause=0, chunksize=chunksize, seen_ids=str(tmp_path / "seen_ids.npy"))
+    pp_data, pp_duration = main.run_cleaning(config)
+    assert len(pp_data) > 0 and len(pp_duration) > 0
+    saved = np.load(config["seen_ids"])
+    assert len(saved) == len(posts)
+
+    # A dump of posts that were all ingested before is dropped before cleaning
+    posts.iloc[100:400].to_csv(raw_file, index=False)
+    pp_data, pp_duration = main.run_cleaning(config)
+    assert (len(pp_data), len(pp_duration)) == (0, 0)
+    assert np.array_equal(np.load(config["seen_ids"]), saved)
@@ -0,0 +1,93 @@
+import os
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.api as sm
+import src.regression.pp_regression_engine as engine
+import src.regression.pp_regression_fxn as regr
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "data")
+DATASETS = ["pp_data_2018_processed.csv", "pp_duration_2018_processed.csv"]
+
+
+@pytest.fixture(scope="module", params=DATASETS)
+def dataset(request):
+    df = pd.read_csv(os.path.join(DATA_DIR, request.param))
+    # A column with missing values, so each regression is fit on its own rows
+    return df.assign(age=df["age"].where(df.index % 5 != 0))
+
+
+def formula_fit(y, feat, df):
+    return sm.OLS.from_formula("{} ~ {}".format(y, feat), df).fit()
+
+
+def test_simple_residuals_match_the_formula_fits(dataset):
+    features = ["age", "sex", "height_in", "weight_diff", "num_comments"]
+    results = list(engine.simple_residuals("score", dataset, features))
+    assert [feat for feat, *_ in results] == features
+    for feat, x, y_values, fitted, studentized in results:
+        fit = formula_fit("score", feat, dataset)
+        rows = fit.fittedvalues.index
+        np.testing.assert_array_equal(x, dataset.loc[rows, feat].to_numpy())
+        np.testing.assert_array_equal(y_values, dataset.loc[rows, "score"].to_numpy())
+        np.testing.assert_allclose(fitted, fit.fittedvalues.to_numpy(), rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(y_values - fitted, fit.resid.to_numpy(), rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(studentized, fit.get_influence().resid_studentized_internal, rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_batch_diagnostic_plots_saves_one_file_per_numeric_feature(tmp_path, workers):
+    df = pd.read_csv(os.path.join(DATA_DIR, "pp_duration_2018_processed.csv")).head(500)
+    df = df.assign(label=np.where(df["sex"] == 0, "male", "female"))
+    directory = str(tmp_path / "diagnostics")
+    paths = regr.batch_diagnostic_plots("score", df, ["age", "label", "weight_diff", "rate"], directory, workers=workers)
+    assert paths == [os.path.join(directory, "score_{}_diagnostics.png".format(feat)) for feat in ["age", "weight_diff", "rate"]]
+    assert sorted(os.listdir(directory)) == sorted(os.path.basename(path) for path in paths)
+    for path in paths:
+        with open(path, "rb") as f:
+            assert f.read(8) == b"\x89PNG\r\n\x1a\n"
+    assert plt.get_fignums() == []
+
+
+def test_simple_regressions_match_the_formula_fits(dataset):
+    features = [col for col in dataset.columns if col != "score"]
+    table = engine.simple_regressions("score", dataset, features)
+    assert list(table.index) == features
+    for feat in features:
+        fit = formula_fit("score", feat, dataset)
+        row = table.loc[feat]
+        assert row["R-sqr"] == pytest.approx(fit.rsquared, rel=1e-7, abs=1e-12)
+        assert row["F-statistic"] == pytest.approx(fit.fvalue, rel=1e-7, abs=1e-12)
+        assert row["F-stat p-value"] == pytest.approx(fit.f_pvalue, rel=1e-6, abs=1e-300)
+        assert row["t-test"] == pytest.approx(fit.tvalues[feat], rel=1e-7, abs=1e-12)
+        assert row["t-test p-value"] == pytest.approx(fit.pvalues[feat], rel=1e-6, abs=1e-300)
+        n = fit.nobs
+        assert 1 - (1 - row["R-sqr"]) * (n - 1) / (n - 2) == pytest.approx(fit.rsquared_adj, rel=1e-7, abs=1e-12)
+
+
+def test_simple_regression_table_gives_the_coefficients_of_the_formula_fits(dataset):
+    features = ["age", "height_in", "start_weight", "num_comments"]
+    n, sxx, syy, sxy, slopes, intercepts = [], [], [], [], [], []
+    for feat in features:
+        rows = dataset[[feat, "score"]].dropna()
+        x = rows[feat] - rows[feat].mean()
+        y_values = rows["score"] - rows["score"].mean()
+        n.append(len(rows))
+        sxx.append((x ** 2).sum())
+        syy.append((y_values ** 2).sum())
+        sxy.append((x * y_values).sum())
+        slopes.append(sxy[-1] / sxx[-1])
+        intercepts.append(rows["score"].mean() - slopes[-1] * rows[feat].mean())
+    table = engine.simple_regression_table(features, np.array(n), np.array(sxx), np.array(syy), np.array(sxy))
+    for feat, slope, intercept in zip(features, slopes, intercepts):
+        fit = formula_fit("score", feat, dataset)
+        assert slope == pytest.approx(fit.params[feat], rel=1e-7, abs=1e-12)
+        assert intercept == pytest.approx(fit.params["Intercept"], rel=1e-7, abs=1e-12)
+        # The standard error of the slope is the slope over its t statistic
+        assert slope / table.loc[feat, "t-test"] == pytest.approx(fit.bse[feat], rel=1e-7, abs=1e-12)
+        assert table.loc[feat, "t-test p-value"] == pytest.approx(fit.pvalues[feat], rel=1e-6, abs=1e-300)
+        assert table.loc[feat, "R-sqr"] == pytest.approx(fit.rsquared, rel=1e-7, abs=1e-12)
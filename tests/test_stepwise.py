@@ -0,0 +1,55 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import src.regression.pp_regression_fxn as regr
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "data")
+DATASETS = ["pp_data_2018_processed.csv", "pp_duration_2018_processed.csv"]
+
+
+@pytest.fixture(scope="module", params=DATASETS)
+def dataset(request):
+    return pd.read_csv(os.path.join(DATA_DIR, request.param))
+
+
+def assert_same_steps(expected, result):
+    assert [list(p) for p in result["predictors"]] == [list(p) for p in expected["predictors"]]
+    for col in ["RSS", "rsquared", "rsquared_adj"]:
+        assert np.allclose(result[col].astype(float), expected[col].astype(float), rtol=1e-9, atol=1e-12), col
+
+
+@pytest.mark.parametrize("y, exclude", [("score", ["weight_diff"]), ("num_comments", ["weight_diff"]), ("score", [])])
+def test_qr_stepwise_matches_formula_stepwise(dataset, y, exclude):
+    expected = regr.stepwise_linear_regression(y, dataset, exclude, method="formula")
+    result = regr.stepwise_linear_regression(y, dataset, exclude, method="qr")
+    assert_same_steps(expected, result)
+
+
+# start_weight, end_weight, and weight_diff are exactly collinear, so score has tied and singular candidates and
+# weight_diff is fit exactly once the other two are in the model
+@pytest.mark.parametrize("y", ["score", "weight_diff"])
+def test_qr_stepwise_matches_formula_stepwise_skip_collinear(dataset, y):
+    expected = regr.stepwise_linear_regression(y, dataset, [], method="formula", skip_collinear=True)
+    result = regr.stepwise_linear_regression(y, dataset, [], method="qr", skip_collinear=True)
+    assert_same_steps(expected, result)
+
+
+@pytest.mark.parametrize("method", ["qr", "formula"])
+@pytest.mark.parametrize("skip_collinear", [False, True])
+def test_model_cache_does_not_change_the_steps(dataset, method, skip_collinear):
+    expected = regr.stepwise_linear_regression("score", dataset, [], method=method, skip_collinear=skip_collinear)
+    assert_same_steps(expected, regr.stepwise_linear_regression("score", dataset, [], method=method, skip_collinear=skip_collinear, cache=regr.ModelCache()))
+    cache = regr.ModelCache()
+    # Models cached by a run with the other rules hold the same predictors in other orders
+    regr.stepwise_linear_regression("score", dataset, [], method=method, skip_collinear=not skip_collinear, cache=cache)
+    assert_same_steps(expected, regr.stepwise_linear_regression("score", dataset, [], method=method, skip_collinear=skip_collinear, cache=cache))
+    assert cache.hits > 0
+
+
+def test_stepwise_skips_collinear_candidates(dataset):
+    models = regr.stepwise_linear_regression("score", dataset, [], method="qr", skip_collinear=True)
+    assert len(models) > 0
+    for predictors in models["predictors"]:
+        assert not {"start_weight", "end_weight", "weight_diff"} <= set(predictors)